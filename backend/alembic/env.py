@@ -7,8 +7,11 @@ from alembic import context
 from app.db import Base  # noqa: F401
 from app.models.note import Note  # noqa: F401
 from app.models.note_tags import note_tags  # noqa: F401
+from app.models.summary_cache import SummaryCacheEntry  # noqa: F401
+from app.models.summary_job import SummaryJob  # noqa: F401
 from app.models.tag import Tag  # noqa: F401
 from app.models.user import User  # noqa: F401
+from app.models.user_stats import UserStats  # noqa: F401
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
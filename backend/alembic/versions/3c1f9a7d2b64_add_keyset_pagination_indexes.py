@@ -0,0 +1,32 @@
+"""add keyset pagination indexes
+
+Revision ID: 3c1f9a7d2b64
+Revises: 98fb78b80f45
+Create Date: 2026-10-18 20:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a7d2b64'
+down_revision: Union[str, Sequence[str], None] = '98fb78b80f45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 笔记列表：WHERE user_id = ? AND (updated_at, id) < (?, ?)
+    # ORDER BY updated_at DESC, id DESC
+    op.create_index("ix_notes_user_updated_id", "notes",
+                    ["user_id", "updated_at", "id"])
+    # 收藏列表：WHERE user_id = ? AND (created_at, id) < (?, ?)
+    # ORDER BY created_at DESC, id DESC
+    op.create_index("ix_favorites_user_created_id", "favorites",
+                    ["user_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_favorites_user_created_id", table_name="favorites")
+    op.drop_index("ix_notes_user_updated_id", table_name="notes")
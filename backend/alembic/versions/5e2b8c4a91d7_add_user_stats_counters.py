@@ -0,0 +1,106 @@
+"""add user_stats counters
+
+Revision ID: 5e2b8c4a91d7
+Revises: 3c1f9a7d2b64
+Create Date: 2026-10-18 20:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b8c4a91d7'
+down_revision: Union[str, Sequence[str], None] = '3c1f9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_stats",
+        sa.Column("user_id",
+                  sa.Integer,
+                  sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("note_count",
+                  sa.Integer,
+                  nullable=False,
+                  server_default="0"),
+        sa.Column("favorite_count",
+                  sa.Integer,
+                  nullable=False,
+                  server_default="0"),
+    )
+
+    # 初始化已有数据的计数
+    op.execute("""
+    INSERT INTO user_stats (user_id, note_count, favorite_count)
+    SELECT u.id,
+           (SELECT count(*) FROM notes n WHERE n.user_id = u.id),
+           (SELECT count(*) FROM favorites f WHERE f.user_id = u.id)
+    FROM users u
+    """)
+
+    # 触发器：语句级 + 转换表，批量写入时每条语句每个用户只更新一次计数行
+    op.execute("""
+    CREATE FUNCTION user_stats_notes_trigger() RETURNS trigger AS $$
+    begin
+      IF TG_OP = 'INSERT' THEN
+        INSERT INTO user_stats (user_id, note_count)
+        SELECT user_id, count(*) FROM new_rows GROUP BY user_id
+        ON CONFLICT (user_id)
+        DO UPDATE SET note_count = user_stats.note_count + EXCLUDED.note_count;
+      ELSE
+        UPDATE user_stats s SET note_count = s.note_count - d.cnt
+        FROM (SELECT user_id, count(*) AS cnt FROM old_rows GROUP BY user_id) d
+        WHERE s.user_id = d.user_id;
+      END IF;
+      RETURN NULL;
+    end
+    $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+    CREATE FUNCTION user_stats_favorites_trigger() RETURNS trigger AS $$
+    begin
+      IF TG_OP = 'INSERT' THEN
+        INSERT INTO user_stats (user_id, favorite_count)
+        SELECT user_id, count(*) FROM new_rows GROUP BY user_id
+        ON CONFLICT (user_id)
+        DO UPDATE SET favorite_count =
+          user_stats.favorite_count + EXCLUDED.favorite_count;
+      ELSE
+        UPDATE user_stats s SET favorite_count = s.favorite_count - d.cnt
+        FROM (SELECT user_id, count(*) AS cnt FROM old_rows GROUP BY user_id) d
+        WHERE s.user_id = d.user_id;
+      END IF;
+      RETURN NULL;
+    end
+    $$ LANGUAGE plpgsql;
+    """)
+
+    # 转换表不支持单个触发器监听多个事件，INSERT / DELETE 分开建
+    for table in ("notes", "favorites"):
+        op.execute(f"""
+        CREATE TRIGGER user_stats_{table}_insert
+        AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION user_stats_{table}_trigger();
+        """)
+        op.execute(f"""
+        CREATE TRIGGER user_stats_{table}_delete
+        AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION user_stats_{table}_trigger();
+        """)
+
+
+def downgrade() -> None:
+    for table in ("notes", "favorites"):
+        op.execute(
+            f"DROP TRIGGER IF EXISTS user_stats_{table}_insert ON {table}")
+        op.execute(
+            f"DROP TRIGGER IF EXISTS user_stats_{table}_delete ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS user_stats_favorites_trigger")
+    op.execute("DROP FUNCTION IF EXISTS user_stats_notes_trigger")
+    op.drop_table("user_stats")
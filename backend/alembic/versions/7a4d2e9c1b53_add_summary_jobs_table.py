@@ -0,0 +1,56 @@
+"""add summary_jobs table
+
+Revision ID: 7a4d2e9c1b53
+Revises: 5e2b8c4a91d7
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4d2e9c1b53'
+down_revision: Union[str, Sequence[str], None] = '5e2b8c4a91d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "summary_jobs", sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id",
+                  sa.Integer,
+                  sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  nullable=False),
+        sa.Column("note_id",
+                  sa.Integer,
+                  sa.ForeignKey("notes.id", ondelete="CASCADE"),
+                  nullable=False),
+        sa.Column("status",
+                  sa.String(16),
+                  nullable=False,
+                  server_default="pending"),
+        sa.Column("summary", sa.Text, nullable=True),
+        sa.Column("error", sa.Text, nullable=True),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("created_at",
+                  sa.DateTime(timezone=True),
+                  server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f("ix_summary_jobs_id"), "summary_jobs", ["id"])
+
+    # 领取任务只扫描未完成的行
+    op.execute("""
+    CREATE INDEX ix_summary_jobs_queue ON summary_jobs (created_at)
+    WHERE status IN ('pending', 'running')
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_summary_jobs_queue", table_name="summary_jobs")
+    op.drop_index(op.f("ix_summary_jobs_id"), table_name="summary_jobs")
+    op.drop_table("summary_jobs")
@@ -0,0 +1,35 @@
+"""add summary_cache table
+
+Revision ID: 8b5e3f0d2c64
+Revises: 7a4d2e9c1b53
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8b5e3f0d2c64'
+down_revision: Union[str, Sequence[str], None] = '7a4d2e9c1b53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "summary_cache", sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("summary", sa.Text, nullable=False),
+        sa.Column("created_at",
+                  sa.DateTime(timezone=True),
+                  server_default=sa.func.now()))
+    op.create_index(op.f("ix_summary_cache_created_at"), "summary_cache",
+                    ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_summary_cache_created_at"),
+                  table_name="summary_cache")
+    op.drop_table("summary_cache")
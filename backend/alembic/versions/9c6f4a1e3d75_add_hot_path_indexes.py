@@ -0,0 +1,47 @@
+"""add hot path indexes
+
+Revision ID: 9c6f4a1e3d75
+Revises: 8b5e3f0d2c64
+Create Date: 2026-10-18 22:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9c6f4a1e3d75'
+down_revision: Union[str, Sequence[str], None] = '8b5e3f0d2c64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# notes (user_id, updated_at, id) 与 favorites (user_id, created_at, id)
+# 已由 3c1f9a7d2b64 建立，B-tree 可反向扫描满足 DESC 排序，这里不再重复创建
+
+
+def upgrade() -> None:
+    # CONCURRENTLY 不能在事务中执行；IF NOT EXISTS 便于中断后重跑
+    with op.get_context().autocommit_block():
+        # 按标签筛选：EXISTS (SELECT 1 FROM note_tags WHERE tag_id IN (...)
+        # AND note_id = notes.id)，主键 (note_id, tag_id) 无法按 tag_id 查找
+        op.create_index("ix_note_tags_tag_note",
+                        "note_tags", ["tag_id", "note_id"],
+                        postgresql_concurrently=True,
+                        if_not_exists=True)
+        # 删除笔记时 ON DELETE CASCADE 需要按 note_id 查找收藏
+        op.create_index("ix_favorites_note_id",
+                        "favorites", ["note_id"],
+                        postgresql_concurrently=True,
+                        if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_favorites_note_id",
+                      table_name="favorites",
+                      postgresql_concurrently=True,
+                      if_exists=True)
+        op.drop_index("ix_note_tags_tag_note",
+                      table_name="note_tags",
+                      postgresql_concurrently=True,
+                      if_exists=True)
@@ -0,0 +1,97 @@
+"""add user collection version
+
+Revision ID: a1d7e5c3f286
+Revises: 9c6f4a1e3d75
+Create Date: 2026-10-18 22:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1d7e5c3f286'
+down_revision: Union[str, Sequence[str], None] = '9c6f4a1e3d75'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 会改变用户可见数据的写操作：(表, 事件)
+VERSIONED_EVENTS = (
+    ("notes", "INSERT"),
+    ("notes", "UPDATE"),
+    ("notes", "DELETE"),
+    ("tags", "INSERT"),
+    ("tags", "UPDATE"),
+    ("tags", "DELETE"),
+    ("favorites", "INSERT"),
+    ("favorites", "DELETE"),
+    ("note_tags", "INSERT"),
+    ("note_tags", "DELETE"),
+)
+
+
+def upgrade() -> None:
+    # 每个用户的数据集合版本号，任何相关写入都会 +1，用于生成 ETag
+    op.add_column(
+        "user_stats",
+        sa.Column("version",
+                  sa.BigInteger,
+                  nullable=False,
+                  server_default="0"))
+
+    # 语句级触发器：一条语句无论影响多少行，每个用户只 +1 一次
+    # note_tags 没有 user_id，通过 notes 找到所属用户
+    op.execute("""
+    CREATE FUNCTION user_stats_bump_version() RETURNS trigger AS $$
+    begin
+      IF TG_TABLE_NAME = 'note_tags' THEN
+        IF TG_OP = 'DELETE' THEN
+          INSERT INTO user_stats (user_id, version)
+          SELECT DISTINCT n.user_id, 1
+          FROM old_rows r JOIN notes n ON n.id = r.note_id
+          ON CONFLICT (user_id)
+          DO UPDATE SET version = user_stats.version + 1;
+        ELSE
+          INSERT INTO user_stats (user_id, version)
+          SELECT DISTINCT n.user_id, 1
+          FROM new_rows r JOIN notes n ON n.id = r.note_id
+          ON CONFLICT (user_id)
+          DO UPDATE SET version = user_stats.version + 1;
+        END IF;
+      ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO user_stats (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM old_rows
+        WHERE user_id IS NOT NULL
+          AND EXISTS (SELECT 1 FROM users u WHERE u.id = old_rows.user_id)
+        ON CONFLICT (user_id)
+        DO UPDATE SET version = user_stats.version + 1;
+      ELSE
+        INSERT INTO user_stats (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM new_rows
+        WHERE user_id IS NOT NULL
+        ON CONFLICT (user_id)
+        DO UPDATE SET version = user_stats.version + 1;
+      END IF;
+      RETURN NULL;
+    end
+    $$ LANGUAGE plpgsql;
+    """)
+
+    for table, event in VERSIONED_EVENTS:
+        rows = "OLD TABLE AS old_rows" if event == "DELETE" else (
+            "NEW TABLE AS new_rows")
+        op.execute(f"""
+        CREATE TRIGGER user_stats_version_{table}_{event.lower()}
+        AFTER {event} ON {table} REFERENCING {rows}
+        FOR EACH STATEMENT EXECUTE FUNCTION user_stats_bump_version();
+        """)
+
+
+def downgrade() -> None:
+    for table, event in VERSIONED_EVENTS:
+        op.execute(f"DROP TRIGGER IF EXISTS "
+                   f"user_stats_version_{table}_{event.lower()} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS user_stats_bump_version")
+    op.drop_column("user_stats", "version")
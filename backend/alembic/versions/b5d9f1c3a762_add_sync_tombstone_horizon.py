@@ -0,0 +1,37 @@
+"""add sync tombstone horizon
+
+Revision ID: b5d9f1c3a762
+Revises: f2a6c8e0b517
+Create Date: 2026-10-21 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d9f1c3a762'
+down_revision: Union[str, Sequence[str], None] = 'f2a6c8e0b517'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 清理删除墓碑后记录的下限，更早的同步令牌不再接受
+    op.add_column(
+        "user_stats",
+        sa.Column("sync_min_seq",
+                  sa.BigInteger,
+                  nullable=False,
+                  server_default="0"))
+    # 只有墓碑会被清理，部分索引让定期清理不必扫描整张变更表
+    op.create_index("ix_sync_changes_tombstones",
+                    "sync_changes", ["changed_at"],
+                    postgresql_where=sa.text("deleted"))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sync_changes_tombstones", table_name="sync_changes")
+    op.drop_column("user_stats", "sync_min_seq")
@@ -0,0 +1,196 @@
+"""add sync changes table
+
+Revision ID: c4f8a2d6e913
+Revises: a1d7e5c3f286
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f8a2d6e913'
+down_revision: Union[str, Sequence[str], None] = 'a1d7e5c3f286'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 每个 (表, 事件) 产生的变更：(user_id, entity, entity_id, deleted)
+# 删除时用户本身可能正被级联删除，此时 user_stats 无法写入，跳过
+_USER_EXISTS = "EXISTS (SELECT 1 FROM users u WHERE u.id = r.user_id)"
+SYNC_EVENTS = {
+    ("notes", "INSERT"):
+    "SELECT r.user_id, 'note', r.id, false FROM new_rows r",
+    ("notes", "UPDATE"):
+    "SELECT r.user_id, 'note', r.id, false FROM new_rows r",
+    ("notes", "DELETE"):
+    f"SELECT r.user_id, 'note', r.id, true FROM old_rows r "
+    f"WHERE {_USER_EXISTS}",
+    ("tags", "INSERT"):
+    "SELECT r.user_id, 'tag', r.id, false FROM new_rows r",
+    # 笔记内嵌了标签名，重命名标签时带上这些笔记
+    ("tags", "UPDATE"):
+    "SELECT r.user_id, 'tag', r.id, false FROM new_rows r "
+    "UNION ALL "
+    "SELECT n.user_id, 'note', n.id, false FROM new_rows r "
+    "JOIN note_tags nt ON nt.tag_id = r.id JOIN notes n ON n.id = nt.note_id",
+    ("tags", "DELETE"):
+    f"SELECT r.user_id, 'tag', r.id, true FROM old_rows r "
+    f"WHERE {_USER_EXISTS}",
+    ("favorites", "INSERT"):
+    "SELECT r.user_id, 'favorite', r.note_id, false FROM new_rows r "
+    "WHERE r.user_id IS NOT NULL",
+    ("favorites", "DELETE"):
+    f"SELECT r.user_id, 'favorite', r.note_id, true FROM old_rows r "
+    f"WHERE r.user_id IS NOT NULL AND {_USER_EXISTS}",
+    # 标签关联变化视为笔记本身的变化
+    ("note_tags", "INSERT"):
+    "SELECT n.user_id, 'note', n.id, false FROM new_rows r "
+    "JOIN notes n ON n.id = r.note_id",
+    ("note_tags", "DELETE"):
+    "SELECT n.user_id, 'note', n.id, false FROM old_rows r "
+    "JOIN notes n ON n.id = r.note_id",
+}
+
+# a1d7e5c3f286 中的版本号函数，downgrade 时恢复
+BUMP_VERSION_FUNCTION = """
+CREATE FUNCTION user_stats_bump_version() RETURNS trigger AS $$
+begin
+  IF TG_TABLE_NAME = 'note_tags' THEN
+    IF TG_OP = 'DELETE' THEN
+      INSERT INTO user_stats (user_id, version)
+      SELECT DISTINCT n.user_id, 1
+      FROM old_rows r JOIN notes n ON n.id = r.note_id
+      ON CONFLICT (user_id)
+      DO UPDATE SET version = user_stats.version + 1;
+    ELSE
+      INSERT INTO user_stats (user_id, version)
+      SELECT DISTINCT n.user_id, 1
+      FROM new_rows r JOIN notes n ON n.id = r.note_id
+      ON CONFLICT (user_id)
+      DO UPDATE SET version = user_stats.version + 1;
+    END IF;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO user_stats (user_id, version)
+    SELECT DISTINCT user_id, 1 FROM old_rows
+    WHERE user_id IS NOT NULL
+      AND EXISTS (SELECT 1 FROM users u WHERE u.id = old_rows.user_id)
+    ON CONFLICT (user_id)
+    DO UPDATE SET version = user_stats.version + 1;
+  ELSE
+    INSERT INTO user_stats (user_id, version)
+    SELECT DISTINCT user_id, 1 FROM new_rows
+    WHERE user_id IS NOT NULL
+    ON CONFLICT (user_id)
+    DO UPDATE SET version = user_stats.version + 1;
+  END IF;
+  RETURN NULL;
+end
+$$ LANGUAGE plpgsql;
+"""
+
+
+def _transition(event: str) -> str:
+    return ("OLD TABLE AS old_rows"
+            if event == "DELETE" else "NEW TABLE AS new_rows")
+
+
+def upgrade() -> None:
+    # 每个实体只保留最后一次变更（含删除墓碑），seq 为该用户的版本号
+    op.create_table(
+        "sync_changes",
+        sa.Column("user_id",
+                  sa.Integer,
+                  sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("entity", sa.String(16), primary_key=True),
+        sa.Column("entity_id", sa.Integer, primary_key=True),
+        sa.Column("seq", sa.BigInteger, nullable=False),
+        sa.Column("deleted",
+                  sa.Boolean,
+                  nullable=False,
+                  server_default=sa.false()),
+        sa.Column("changed_at",
+                  sa.DateTime(timezone=True),
+                  nullable=False,
+                  server_default=sa.func.now()),
+    )
+    op.create_index("ix_sync_changes_user_seq", "sync_changes",
+                    ["user_id", "seq", "entity", "entity_id"])
+
+    # 原版本号触发器并入同步触发器：同一条语句里先把用户版本号 +1，
+    # 再以新版本号作为本次变更的 seq。user_stats 行锁持有到事务提交，
+    # 同一用户的写入按提交顺序得到递增的 seq
+    for table, event in SYNC_EVENTS:
+        op.execute(f"DROP TRIGGER IF EXISTS "
+                   f"user_stats_version_{table}_{event.lower()} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS user_stats_bump_version")
+
+    for (table, event), changes in SYNC_EVENTS.items():
+        name = f"sync_changes_{table}_{event.lower()}"
+        op.execute(f"""
+        CREATE FUNCTION {name}() RETURNS trigger AS $$
+        begin
+          WITH changes (user_id, entity, entity_id, deleted) AS (
+            {changes}
+          ), bumped AS (
+            INSERT INTO user_stats (user_id, version)
+            SELECT DISTINCT user_id, 1 FROM changes
+            ON CONFLICT (user_id)
+            DO UPDATE SET version = user_stats.version + 1
+            RETURNING user_id, version
+          )
+          INSERT INTO sync_changes (user_id, entity, entity_id, seq, deleted)
+          SELECT DISTINCT ON (c.user_id, c.entity, c.entity_id)
+                 c.user_id, c.entity, c.entity_id, b.version, c.deleted
+          FROM changes c JOIN bumped b ON b.user_id = c.user_id
+          ON CONFLICT (user_id, entity, entity_id)
+          DO UPDATE SET seq = EXCLUDED.seq, deleted = EXCLUDED.deleted,
+                        changed_at = now();
+          RETURN NULL;
+        end
+        $$ LANGUAGE plpgsql;
+        """)
+        op.execute(f"""
+        CREATE TRIGGER {name}
+        AFTER {event} ON {table} REFERENCING {_transition(event)}
+        FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+        """)
+
+    # 已有数据：版本号 +1 后作为这些实体的 seq，since 为空的首次同步即可取到全部
+    op.execute("""
+    INSERT INTO user_stats (user_id, version)
+    SELECT id, 1 FROM users
+    ON CONFLICT (user_id) DO UPDATE SET version = user_stats.version + 1
+    """)
+    op.execute("""
+    INSERT INTO sync_changes (user_id, entity, entity_id, seq)
+    SELECT n.user_id, 'note', n.id, s.version
+    FROM notes n JOIN user_stats s ON s.user_id = n.user_id
+    UNION ALL
+    SELECT t.user_id, 'tag', t.id, s.version
+    FROM tags t JOIN user_stats s ON s.user_id = t.user_id
+    UNION ALL
+    SELECT f.user_id, 'favorite', f.note_id, s.version
+    FROM favorites f JOIN user_stats s ON s.user_id = f.user_id
+    """)
+
+
+def downgrade() -> None:
+    for table, event in SYNC_EVENTS:
+        name = f"sync_changes_{table}_{event.lower()}"
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS {name}")
+
+    op.execute(BUMP_VERSION_FUNCTION)
+    for table, event in SYNC_EVENTS:
+        op.execute(f"""
+        CREATE TRIGGER user_stats_version_{table}_{event.lower()}
+        AFTER {event} ON {table} REFERENCING {_transition(event)}
+        FOR EACH STATEMENT EXECUTE FUNCTION user_stats_bump_version();
+        """)
+
+    op.drop_index("ix_sync_changes_user_seq", table_name="sync_changes")
+    op.drop_table("sync_changes")
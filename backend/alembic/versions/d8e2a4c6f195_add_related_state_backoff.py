@@ -0,0 +1,35 @@
+"""add related state backoff
+
+Revision ID: d8e2a4c6f195
+Revises: b5d9f1c3a762
+Create Date: 2026-10-21 14:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e2a4c6f195'
+down_revision: Union[str, Sequence[str], None] = 'b5d9f1c3a762'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 处理失败的用户按连续失败次数退避，retry_at 之前不再被 worker 选中
+    op.add_column("related_note_state",
+                  sa.Column("retry_at", sa.DateTime(timezone=True)))
+    op.add_column(
+        "related_note_state",
+        sa.Column("failures",
+                  sa.SmallInteger,
+                  nullable=False,
+                  server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("related_note_state", "failures")
+    op.drop_column("related_note_state", "retry_at")
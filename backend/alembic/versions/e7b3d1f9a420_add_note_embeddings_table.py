@@ -0,0 +1,47 @@
+"""add note embeddings table
+
+Revision ID: e7b3d1f9a420
+Revises: c4f8a2d6e913
+Create Date: 2026-10-19 15:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3d1f9a420'
+down_revision: Union[str, Sequence[str], None] = 'c4f8a2d6e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 已有笔记不在迁移中计算向量，首次语义搜索时按需补齐
+    op.create_table(
+        "note_embeddings",
+        sa.Column("note_id",
+                  sa.Integer,
+                  sa.ForeignKey("notes.id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("user_id",
+                  sa.Integer,
+                  sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  nullable=False),
+        sa.Column("model", sa.String(32), nullable=False),
+        sa.Column("vector", sa.LargeBinary, nullable=False),
+        sa.Column("updated_at",
+                  sa.DateTime(timezone=True),
+                  nullable=False,
+                  server_default=sa.func.now()),
+    )
+    op.create_index("ix_note_embeddings_user_model", "note_embeddings",
+                    ["user_id", "model"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_note_embeddings_user_model",
+                  table_name="note_embeddings")
+    op.drop_table("note_embeddings")
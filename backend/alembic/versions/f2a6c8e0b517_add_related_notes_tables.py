@@ -0,0 +1,57 @@
+"""add related notes tables
+
+Revision ID: f2a6c8e0b517
+Revises: e7b3d1f9a420
+Create Date: 2026-10-19 18:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6c8e0b517'
+down_revision: Union[str, Sequence[str], None] = 'e7b3d1f9a420'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "related_notes",
+        sa.Column("note_id",
+                  sa.Integer,
+                  sa.ForeignKey("notes.id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("neighbor_id", sa.Integer, primary_key=True),
+        sa.Column("score", sa.Float, nullable=False),
+        sa.Column("shared_tags",
+                  sa.SmallInteger,
+                  nullable=False,
+                  server_default="0"),
+    )
+    op.create_index(op.f("ix_related_notes_neighbor_id"), "related_notes",
+                    ["neighbor_id"])
+    # 没有进度行的用户从 seq 0 开始处理，sync_changes 中已有的笔记都会被计算
+    op.create_table(
+        "related_note_state",
+        sa.Column("user_id",
+                  sa.Integer,
+                  sa.ForeignKey("users.id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("seq", sa.BigInteger, nullable=False, server_default="0"),
+        sa.Column("note_id", sa.Integer),
+        sa.Column("updated_at",
+                  sa.DateTime(timezone=True),
+                  nullable=False,
+                  server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("related_note_state")
+    op.drop_index(op.f("ix_related_notes_neighbor_id"),
+                  table_name="related_notes")
+    op.drop_table("related_notes")
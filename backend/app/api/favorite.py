@@ -1,14 +1,14 @@
-from typing import List
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request
 
-from app import crud, models
-from app.auth import get_current_user
-from app.db import get_db
-from app.schemas import (NoteOut, ResponseBase, ResponseWithTotal,
-                         error_response, success_response,
+from app import crud
+from app.auth import get_current_user_id
+from app.db import DBRunner, get_db_runner
+from app.schemas import (NoteListItem, NoteOut, ResponseBase,
+                         ResponseWithTotal, error_response, success_response,
                          success_response_for_notes)
+from app.utils.etag import conditional, make_etag, set_cache_headers
 
 router = APIRouter(
     prefix="/api/favorites",
@@ -18,14 +18,14 @@ router = APIRouter(
 
 # 收藏笔记
 @router.post("/{note_id}", response_model=ResponseBase[dict])
-def add_favorite(
+async def add_favorite(
         note_id: int,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    favorite, err = crud.add_favorite(db,
-                                      user_id=current_user.id,
-                                      note_id=note_id)
+    favorite, err = await db.run(crud.add_favorite,
+                                 user_id=current_user_id,
+                                 note_id=note_id)
     if err:
         return error_response(code=3001, msg=err)
     return success_response(data={"note_id": note_id},
@@ -34,14 +34,14 @@ def add_favorite(
 
 # 取消收藏
 @router.delete("/{note_id}", response_model=ResponseBase[dict])
-def remove_favorite(
+async def remove_favorite(
         note_id: int,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    success, err = crud.remove_favorite(db,
-                                        user_id=current_user.id,
-                                        note_id=note_id)
+    success, err = await db.run(crud.remove_favorite,
+                                user_id=current_user_id,
+                                note_id=note_id)
     if err:
         return error_response(code=3002, msg=err)
     return success_response(data={"note_id": note_id},
@@ -49,33 +49,63 @@ def remove_favorite(
 
 
 # 获取当前用户的收藏笔记列表
-@router.get("", response_model=ResponseWithTotal[List[NoteOut]])
-def get_user_favorite_notes(
-        skip: int = 0,
-        limit: int = 20,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+@router.get("",
+            response_model=ResponseWithTotal[List[Union[NoteOut,
+                                                        NoteListItem]]])
+async def get_user_favorite_notes(
+        request: Request,
+        skip: int = Query(0, ge=0, description="跳过的条数"),
+        limit: int = Query(20, ge=1, le=100, description="返回条数限制"),
+        cursor: Optional[str] = Query(
+            None, description="游标分页：上一页返回的 next_cursor，传入时忽略 skip"),
+        include_total: bool = Query(
+            True, description="是否返回 total；为 false 时只返回 has_more"),
+        view: str = Query("full",
+                          pattern="^(full|compact)$",
+                          description="full=完整笔记，compact=不返回完整 content"),
+        preview_length: int = Query(
+            crud.NOTE_PREVIEW_LENGTH,
+            ge=0,
+            le=1000,
+            description="compact 视图下 content 预览的字符数，0 表示不返回预览"),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    res = crud.get_user_favorite_notes(db,
-                                       user_id=current_user.id,
-                                       skip=skip,
-                                       limit=limit)
-    return success_response_for_notes(
-        data=res.get('notes', []),
-        msg="Fetched user favorites successfully",
-        total=res.get('total', 0))
+    version = await db.run(crud.get_collection_version, current_user_id)
+    etag = make_etag(current_user_id, version, request.url.query)
+    cached = conditional(request, etag)
+    if cached:
+        return cached
+    try:
+        res = await db.run(crud.get_user_favorite_notes,
+                           user_id=current_user_id,
+                           skip=skip,
+                           limit=limit,
+                           cursor=cursor,
+                           include_total=include_total,
+                           view=crud.resolve_note_view(view, preview_length))
+    except ValueError as e:
+        return error_response(code=3003, msg=str(e))
+    return set_cache_headers(
+        success_response_for_notes(
+            data=res.get('notes', []),
+            msg="Fetched user favorites successfully",
+            total=res.get('total'),
+            next_cursor=res.get('next_cursor'),
+            has_more=res.get('has_more'),
+            item_model=NoteListItem if view == "compact" else NoteOut), etag)
 
 
 # 判断某笔记是否被收藏
 @router.get("/{note_id}/status", response_model=ResponseBase[dict])
-def check_favorite_status(
+async def check_favorite_status(
         note_id: int,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    is_favorited = crud.is_note_favorited(db,
-                                          user_id=current_user.id,
-                                          note_id=note_id)
+    is_favorited = await db.run(crud.is_note_favorited,
+                                user_id=current_user_id,
+                                note_id=note_id)
     return success_response(data={
         "note_id": note_id,
         "is_favorited": is_favorited
@@ -2,98 +2,268 @@
 # @Time        : 2025-08-28 17:30:14
 # @Author      : gaochenyang
 # @File        : note.py
-# @Description : 2001=创建失败，2002=更新失败，2003=删除失败
+# @Description : 2001=创建失败，2002=更新失败，2003=删除失败，2005=游标无效，2006=导入文件无效
 
 # here put the import lib
-from typing import List
+import tempfile
+import zipfile
+from datetime import date
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, Depends, Query
+import anyio
+import orjson
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from app import crud
-from app.auth import get_current_user
-from app.db import get_db
-from app.models import user as user_model
-from app.schemas import (NoteCreate, NoteOut, NoteUpdate, ResponseBase,
-                         ResponseWithTotal, SummaryRequest, error_response,
-                         success_response, success_response_for_notes)
-from app.utils.summary_agent import generate_summary
+from app.auth import get_current_user_id
+from app.config import settings
+from app.db import DBRunner, SessionLocal, get_db, get_db_runner
+from app.schemas import (NoteCreate, NoteListItem, NoteOut, NoteUpdate,
+                         RelatedNoteOut, ResponseBase, ResponseWithTotal,
+                         SummaryRequest, error_response, success_response,
+                         success_response_for_notes)
+from app.utils.etag import conditional, make_etag, set_cache_headers
+from app.utils.note_archive import (encode_markdown_zip, encode_ndjson,
+                                    iter_markdown_zip_records,
+                                    iter_ndjson_records)
+from app.utils.read_cache import read_cache
+from app.utils.related_worker import related_worker
+from app.utils.summary_cache import generate_summary_cached
 
 router = APIRouter(prefix="/api/notes", tags=["notes"])
 
 
 @router.post("", response_model=ResponseBase[NoteOut])
-def create_note(note_data: NoteCreate,
-                db: Session = Depends(get_db),
-                current_user: user_model.User = Depends(get_current_user)):
+async def create_note(note_data: NoteCreate,
+                      db: DBRunner = Depends(get_db_runner),
+                      current_user_id: int = Depends(get_current_user_id)):
     try:
-        note = crud.create_note(db, user_id=current_user.id, note=note_data)
-        return success_response(data=note, msg="Note created successfully")
+        note = await db.run(crud.create_note,
+                            user_id=current_user_id,
+                            note=note_data)
+        related_worker.notify()
+        return success_response(data=note,
+                                msg="Note created successfully",
+                                model=NoteOut)
+    except ValueError as e:
+        # 标签不存在或不属于当前用户
+        return error_response(code=2001, msg=str(e))
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         return error_response(code=2001, msg="Failed to create note")
 
 
 @router.put("/{note_id}", response_model=ResponseBase[NoteOut])
-def update_note(
+async def update_note(
         note_id: int,
         note_data: NoteUpdate,
-        db: Session = Depends(get_db),
-        current_user: user_model.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    note, err = crud.update_note(db,
-                                 note_id=note_id,
-                                 user_id=current_user.id,
-                                 note_update=note_data)
+    note, err = await db.run(crud.update_note,
+                             note_id=note_id,
+                             user_id=current_user_id,
+                             note_update=note_data)
     if err:
         return error_response(code=2002, msg=err)
+    related_worker.notify()
     return success_response(
         data=note,
         msg="Note updated successfully",
+        model=NoteOut,
     )
 
 
 @router.delete("/{note_id}", response_model=ResponseBase[None])
-def delete_note(
+async def delete_note(
         note_id: int,
-        db: Session = Depends(get_db),
-        current_user: user_model.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    ok, err = crud.delete_note(db, note_id=note_id, user_id=current_user.id)
+    ok, err = await db.run(crud.delete_note,
+                           note_id=note_id,
+                           user_id=current_user_id)
     if not ok:
         return error_response(code=2003, msg=err)
+    related_worker.notify()
     return success_response(msg="Note deleted successfully")
 
 
-# 模糊搜索 基于PostgreSQL 的 全文搜索 (Full-Text Search, FTS)
+# 基于 PostgreSQL 的全文搜索 (Full-Text Search, FTS)，按相关度排序并返回高亮片段
 # FastAPI 是 按路由声明顺序匹配的；/search 的定义要放在 / {note_id} 前面
-@router.get("/search", response_model=ResponseBase[List[NoteOut]])
-def search_notes(
+@router.get("/search",
+            response_model=ResponseBase[List[Union[NoteOut, NoteListItem]]])
+async def search_notes(
+        request: Request,
         q: str = Query(..., description="搜索关键词"),  # 必填
         skip: int = Query(0, ge=0, description="跳过的条数"),
         limit: int = Query(20, ge=1, le=100, description="返回条数限制"),
-        db: Session = Depends(get_db),
-        current_user: user_model.User = Depends(get_current_user),
+        mode: str = Query("fts",
+                          pattern="^(fts|like|semantic|hybrid)$",
+                          description=("搜索模式：fts=全文检索，like=模糊匹配，"
+                                       "semantic=语义相似，hybrid=全文与语义融合")),
+        view: str = Query("full",
+                          pattern="^(full|compact)$",
+                          description="full=完整笔记，compact=不返回完整 content"),
+        preview_length: int = Query(
+            crud.NOTE_PREVIEW_LENGTH,
+            ge=0,
+            le=1000,
+            description="compact 视图下 content 预览的字符数，0 表示不返回预览"),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
+    # 结果只取决于查询参数和用户数据版本，未变化时不执行搜索
+    version = await db.run(crud.get_collection_version, current_user_id)
+    etag = make_etag(current_user_id, version, request.url.query)
+    cached = conditional(request, etag)
+    if cached:
+        return cached
     try:
-        notes = crud.search_notes(db,
-                                  user_id=current_user.id,
-                                  query=q,
-                                  skip=skip,
-                                  limit=limit)
-        return success_response(msg="success", data=notes)
+        # 语义检索可能需要补算向量、重建索引，async 栈下也放到线程池执行
+        run = db.run_cpu_bound if mode in ("semantic", "hybrid") else db.run
+        notes = await run(crud.search_notes,
+                          user_id=current_user_id,
+                          query=q,
+                          skip=skip,
+                          limit=limit,
+                          mode=mode,
+                          view=crud.resolve_note_view(view, preview_length))
+        item_model = NoteListItem if view == "compact" else NoteOut
+        return set_cache_headers(
+            success_response(msg="success", data=notes,
+                             model=List[item_model]), etag)
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         return error_response(code=2003, msg="Failed to search notes")
 
 
+# 导出格式 -> (编码器, Content-Type, 扩展名)
+EXPORT_FORMATS = {
+    "ndjson": (encode_ndjson, "application/x-ndjson", "ndjson"),
+    "markdown": (encode_markdown_zip, "application/zip", "zip"),
+}
+
+
+async def _export_body(encode, user_id: int):
+    """导出用的独立同步会话：依赖注入的会话在响应开始发送前就已关闭
+
+    查询和编码在线程池中逐块执行，两种 DB_STACK 下都走同步引擎；
+    客户端中途断开时流被取消，finally 中关闭生成器（释放服务端游标）和会话
+    """
+    db = SessionLocal()
+    source = crud.iter_export_chunks(db, user_id, settings.EXPORT_CHUNK_SIZE)
+    body = encode(source)
+    try:
+        async for part in iterate_in_threadpool(body):
+            yield part
+    finally:
+        await _close_stream(body, source, db)
+
+
+async def _close_stream(*resources):
+    """在线程池中依次关闭流式响应持有的生成器 / 会话 / 文件
+
+    流被取消时清理仍须执行完，否则连接会带着未关闭的游标回到连接池
+    """
+    with anyio.CancelScope(shield=True):
+        await run_in_threadpool(_close_all, resources)
+
+
+def _close_all(resources):
+    for resource in resources:
+        resource.close()
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_notes(
+        format: str = Query(
+            "ndjson",
+            pattern="^(ndjson|markdown)$",
+            description="ndjson=每行一条 JSON，markdown=Markdown 文件 zip 包"),
+        current_user_id: int = Depends(get_current_user_id),
+):
+    """流式导出当前用户的全部笔记（含标签和收藏状态），内存占用与笔记数量无关"""
+    encode, media_type, extension = EXPORT_FORMATS[format]
+    filename = f"notes-{date.today().isoformat()}.{extension}"
+    return StreamingResponse(_export_body(encode, current_user_id),
+                             media_type=media_type,
+                             headers={
+                                 "Content-Disposition":
+                                 f'attachment; filename="{filename}"',
+                                 "Cache-Control": "no-store",
+                             })
+
+
+async def _import_events(records, upload, user_id: int):
+    """逐块导入并以 NDJSON 输出事件；与导出相同，使用独立的同步会话，在线程池中逐块执行
+
+    客户端中途断开时同样在 finally 中关闭生成器、会话和上传的临时文件；
+    此前的块已提交，无论是否导入完成都唤醒关联笔记 worker
+    """
+    db = SessionLocal()
+    events = crud.import_note_records(db, user_id, records,
+                                      settings.IMPORT_CHUNK_SIZE)
+    try:
+        async for event in iterate_in_threadpool(events):
+            yield orjson.dumps(event) + b"\n"
+    finally:
+        try:
+            await _close_stream(events, records, db, upload)
+        finally:
+            related_worker.notify()
+
+
+@router.post("/import")
+async def import_notes(
+        request: Request,
+        format: str = Query(
+            "ndjson",
+            pattern="^(ndjson|markdown)$",
+            description="请求体格式，与导出一致：ndjson 或 markdown（zip 包）"),
+        current_user_id: int = Depends(get_current_user_id),
+):
+    """批量导入笔记，请求体为文件原始字节
+
+    上传内容边接收边写入临时文件（超过 IMPORT_SPOOL_SIZE 才落盘），之后按块写入数据库，
+    响应为 NDJSON：每条无效记录一个 error 事件，每块一个 progress 事件，最后一个 done 事件
+    """
+    upload = tempfile.SpooledTemporaryFile(max_size=settings.IMPORT_SPOOL_SIZE)
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > settings.IMPORT_MAX_BYTES:
+            upload.close()
+            return error_response(code=2006, msg="Import file too large")
+        upload.write(chunk)
+    upload.seek(0)
+
+    if format == "markdown":
+        try:
+            records = iter_markdown_zip_records(zipfile.ZipFile(upload))
+        except zipfile.BadZipFile:
+            upload.close()
+            return error_response(code=2006, msg="Invalid zip archive")
+    else:
+        records = iter_ndjson_records(upload)
+    return StreamingResponse(_import_events(records, upload, current_user_id),
+                             media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-store"})
+
+
 @router.post("/generate_summary", response_model=ResponseBase[str])
-def regenerate_summary(summary_request: SummaryRequest):
+def regenerate_summary(summary_request: SummaryRequest,
+                       db: Session = Depends(get_db)):
     """生成笔记摘要
     
     可用于新建笔记时生成摘要，或为已有笔记重新生成摘要。
     不依赖数据库中已有的笔记，只需要提供标题和内容即可。
+    标题和内容未变化时直接返回缓存的摘要，不再调用 DeepSeek。
     
     Args:
         summary_request: 包含笔记标题和内容的请求体
@@ -102,7 +272,8 @@ def regenerate_summary(summary_request: SummaryRequest):
         生成的摘要文本
     """
     # 调用 AI 摘要生成器
-    summary = generate_summary(summary_request.title, summary_request.content)
+    summary = generate_summary_cached(db, summary_request.title,
+                                      summary_request.content)
     if not summary:
         return error_response(code=5001, msg="AI摘要生成失败，请稍后再试")
 
@@ -110,40 +281,122 @@ def regenerate_summary(summary_request: SummaryRequest):
 
 
 @router.get("/{note_id}", response_model=ResponseBase[NoteOut])
-def get_note(
+async def get_note(
         note_id: int,
-        db: Session = Depends(get_db),
-        current_user: user_model.User = Depends(get_current_user),
+        request: Request,
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    note = crud.get_note(db, note_id=note_id, user_id=current_user.id)
+    # 标签改名、收藏状态变化不会更新 updated_at，所以同时带上集合版本号
+    version = await db.run(crud.get_note_version,
+                           note_id=note_id,
+                           user_id=current_user_id)
+    if not version:
+        return error_response(code=2004,
+                              msg="Note not found or not authorized")
+    etag = make_etag(current_user_id, note_id, *version)
+    cached = conditional(request, etag)
+    if cached:
+        return cached
+    note = await db.run(crud.get_note,
+                        note_id=note_id,
+                        user_id=current_user_id)
     if not note:
         return error_response(code=2004,
                               msg="Note not found or not authorized")
-    return success_response(
-        data=note,
-        msg="Note retrieved successfully",
-    )
+    return set_cache_headers(
+        success_response(
+            data=note,
+            msg="Note retrieved successfully",
+            model=NoteOut,
+        ), etag)
+
+
+@router.get("/{note_id}/related",
+            response_model=ResponseBase[List[RelatedNoteOut]])
+async def get_related_notes(
+        note_id: int,
+        limit: int = Query(5,
+                           ge=1,
+                           le=settings.RELATED_TOP_K,
+                           description="返回的关联笔记数"),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
+):
+    """相似笔记（文本相似度 + 共同标签），由后台 worker 预先计算，笔记修改后短暂延迟更新"""
+    related, err = await db.run(crud.get_related_notes,
+                                note_id=note_id,
+                                user_id=current_user_id,
+                                limit=limit)
+    if err:
+        return error_response(code=2004, msg=err)
+    return success_response(data=related,
+                            msg="success",
+                            model=List[RelatedNoteOut])
 
 
-@router.get("", response_model=ResponseWithTotal[List[NoteOut]])
-def list_notes(
+@router.get("",
+            response_model=ResponseWithTotal[List[Union[NoteOut,
+                                                        NoteListItem]]])
+async def list_notes(
+        request: Request,
         tag_id_list: List[int] = Query([], description="标签 ID 列表"),  # 标签名称
         skip: int = Query(0, ge=0, description="跳过的条数"),
         limit: int = Query(20, ge=1, le=100, description="返回条数限制"),
-        db: Session = Depends(get_db),
-        current_user: user_model.User = Depends(get_current_user),
+        cursor: Optional[str] = Query(
+            None, description="游标分页：上一页返回的 next_cursor，传入时忽略 skip"),
+        include_total: bool = Query(
+            True, description="是否返回 total；为 false 时只返回 has_more"),
+        view: str = Query("full",
+                          pattern="^(full|compact)$",
+                          description="full=完整笔记，compact=不返回完整 content"),
+        preview_length: int = Query(
+            crud.NOTE_PREVIEW_LENGTH,
+            ge=0,
+            le=1000,
+            description="compact 视图下 content 预览的字符数，0 表示不返回预览"),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    if tag_id_list:
-        res = crud.get_notes_by_tags(db,
-                                     user_id=current_user.id,
-                                     tag_id_list=tag_id_list,
-                                     skip=skip,
-                                     limit=limit)
-    else:
-        res = crud.list_notes_with_favorites(db,
-                                             user_id=current_user.id,
-                                             skip=skip,
-                                             limit=limit)
-    return success_response_for_notes(data=res.get('notes', []),
-                                      msg="Notes retrieved successfully",
-                                      total=res.get('total', 0))
+    version = await db.run(crud.get_collection_version, current_user_id)
+    etag = make_etag(current_user_id, version, request.url.query)
+    cached = conditional(request, etag)
+    if cached:
+        return cached
+    note_view = crud.resolve_note_view(view, preview_length)
+
+    async def load() -> bytes:
+        if tag_id_list:
+            res = await db.run(crud.get_notes_by_tags,
+                               user_id=current_user_id,
+                               tag_id_list=tag_id_list,
+                               skip=skip,
+                               limit=limit,
+                               cursor=cursor,
+                               include_total=include_total,
+                               view=note_view)
+        else:
+            res = await db.run(crud.list_notes_with_favorites,
+                               user_id=current_user_id,
+                               skip=skip,
+                               limit=limit,
+                               cursor=cursor,
+                               include_total=include_total,
+                               view=note_view)
+        return success_response_for_notes(
+            data=res.get('notes', []),
+            msg="Notes retrieved successfully",
+            total=res.get('total'),
+            next_cursor=res.get('next_cursor'),
+            has_more=res.get('has_more'),
+            item_model=NoteListItem if note_view.compact else NoteOut).body
+
+    # 同一用户、同一数据版本、同一查询参数的列表结果直接复用序列化好的响应体
+    try:
+        body = await read_cache.get_or_load(
+            read_cache.key(current_user_id, version, "notes",
+                           request.url.query), load)
+    except ValueError as e:
+        return error_response(code=2005, msg=str(e))
+    return set_cache_headers(
+        Response(content=body, media_type="application/json"), etag)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# @File        : summary.py
+# @Description : AI 摘要后台任务；5002=提交失败，5003=任务不存在
+
+# here put the import lib
+from fastapi import APIRouter, Depends
+
+from app import crud
+from app.auth import get_current_user_id
+from app.db import DBRunner, get_db_runner
+from app.schemas import (ResponseBase, SummaryJobCreate, SummaryJobOut,
+                         error_response, success_response)
+from app.utils.summary_worker import summary_worker
+
+router = APIRouter(prefix="/api/summary_jobs", tags=["summary"])
+
+
+@router.post("", response_model=ResponseBase[SummaryJobOut])
+async def create_summary_job(
+        job_in: SummaryJobCreate,
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
+):
+    """提交笔记摘要任务，立即返回任务 id；完成后摘要写入 notes.summary"""
+    job, err = await db.run(crud.create_summary_job,
+                            user_id=current_user_id,
+                            note_id=job_in.note_id)
+    if err:
+        return error_response(code=5002, msg=err)
+    summary_worker.notify()
+    return success_response(data=job, msg="Summary job submitted")
+
+
+@router.get("/{job_id}", response_model=ResponseBase[SummaryJobOut])
+async def get_summary_job(
+        job_id: int,
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
+):
+    """查询摘要任务状态"""
+    job = await db.run(crud.get_summary_job,
+                       job_id=job_id,
+                       user_id=current_user_id)
+    if not job:
+        return error_response(code=5003, msg="Summary job not found")
+    return success_response(data=job)
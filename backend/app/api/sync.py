@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# @File        : sync.py
+# @Description : 增量同步；6001=同步令牌无效
+
+# here put the import lib
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+
+from app import crud
+from app.auth import get_current_user_id
+from app.db import DBRunner, get_db_runner
+from app.schemas import ResponseBase, SyncOut, error_response, success_response
+from app.utils.etag import conditional, make_etag, set_cache_headers
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+@router.get("", response_model=ResponseBase[SyncOut])
+async def sync_changes(
+        request: Request,
+        since: Optional[str] = Query(None,
+                                     description="上次同步返回的 token，为空时返回全部数据"),
+        limit: int = Query(500, ge=1, le=1000, description="单次返回的变更条数上限"),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
+):
+    """返回 since 之后新增 / 修改的笔记、标签、收藏，以及被删除的 id（墓碑）"""
+    # 没有新变更时直接 304，不查询变更表
+    version = await db.run(crud.get_collection_version, current_user_id)
+    etag = make_etag(current_user_id, version, request.url.query)
+    cached = conditional(request, etag)
+    if cached:
+        return cached
+    try:
+        changes = await db.run(crud.get_changes,
+                               user_id=current_user_id,
+                               since=since,
+                               limit=limit)
+    except ValueError as e:
+        # 令牌无效（如数据被重置），客户端应清空本地数据后不带 since 重新同步
+        return error_response(code=6001, msg=str(e))
+    return set_cache_headers(
+        success_response(msg="success", data=changes, model=SyncOut), etag)
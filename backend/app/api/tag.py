@@ -7,57 +7,73 @@
 from typing import List
 
 # routers/tags.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
-from app import crud, models
-from app.auth import get_current_user
-from app.db import get_db
-from app.schemas import (ResponseBase, TagCreate, TagOut, TagUpdate,
-                         success_response)
+from app import crud
+from app.auth import get_current_user_id
+from app.db import DBRunner, get_db_runner
+from app.schemas import (ResponseBase, TagBulkAssign, TagCreate, TagOut,
+                         TagUpdate, success_response)
+from app.utils.etag import conditional, make_etag, set_cache_headers
+from app.utils.read_cache import read_cache
 
 router = APIRouter(prefix="/api/tags", tags=["tags"])
 
 
 @router.post("", response_model=ResponseBase[TagOut])
-def create_tag(
+async def create_tag(
         tag_in: TagCreate,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    tag = crud.create_tag(db, current_user.id, tag_in)
+    tag = await db.run(crud.create_tag, current_user_id, tag_in)
     return success_response(msg="Tag created successfully", data=tag)
 
 
 @router.get("", response_model=ResponseBase[List[TagOut]])
-def get_tags(
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+async def get_tags(
+        request: Request,
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    tags = crud.get_tags(db, current_user.id)
-    return success_response(msg="Tags retrieved successfully", data=tags)
+    version = await db.run(crud.get_collection_version, current_user_id)
+    etag = make_etag(current_user_id, version)
+    cached = conditional(request, etag)
+    if cached:
+        return cached
+
+    async def load() -> bytes:
+        tags = await db.run(crud.get_tags, current_user_id)
+        return success_response(msg="Tags retrieved successfully",
+                                data=tags,
+                                model=List[TagOut]).body
+
+    body = await read_cache.get_or_load(
+        read_cache.key(current_user_id, version, "tags"), load)
+    return set_cache_headers(
+        Response(content=body, media_type="application/json"), etag)
 
 
 @router.put("/{tag_id}", response_model=ResponseBase[TagOut])
-def update_tag(
+async def update_tag(
         tag_id: int,
         tag_in: TagUpdate,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    tag = crud.update_tag(db, tag_id, current_user.id, tag_in)
+    tag = await db.run(crud.update_tag, tag_id, current_user_id, tag_in)
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
     return success_response(msg="Tag updated successfully", data=tag)
 
 
 @router.delete("/{tag_id}", response_model=ResponseBase[dict])
-def delete_tag(
+async def delete_tag(
         tag_id: int,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    tag = crud.delete_tag(db, tag_id, current_user.id)
+    tag = await db.run(crud.delete_tag, tag_id, current_user_id)
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
     return success_response(msg="Tag deleted successfully",
@@ -65,14 +81,45 @@ def delete_tag(
 
 
 # === Note 与 Tag 关系接口 ===
+# 批量接口：一条 INSERT ... ON CONFLICT DO NOTHING / DELETE 处理全部组合
+# 需放在 /{tag_id} 系列路由之前声明
+@router.post("/bulk/attach", response_model=ResponseBase[dict])
+async def bulk_add_tags_to_notes(
+        payload: TagBulkAssign,
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
+):
+    count, err = await db.run(crud.bulk_add_tags_to_notes, current_user_id,
+                              payload.note_ids, payload.tag_ids)
+    if err:
+        raise HTTPException(status_code=404, detail=err)
+    return success_response(msg="Tags added to notes successfully",
+                            data={"attached": count})
+
+
+@router.post("/bulk/detach", response_model=ResponseBase[dict])
+async def bulk_remove_tags_from_notes(
+        payload: TagBulkAssign,
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
+):
+    count, err = await db.run(crud.bulk_remove_tags_from_notes,
+                              current_user_id, payload.note_ids,
+                              payload.tag_ids)
+    if err:
+        raise HTTPException(status_code=404, detail=err)
+    return success_response(msg="Tags removed from notes successfully",
+                            data={"detached": count})
+
+
 @router.post("/{tag_id}/notes/{note_id}", response_model=ResponseBase[dict])
-def add_tag_to_note(
+async def add_tag_to_note(
         tag_id: int,
         note_id: int,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    note = crud.add_tag_to_note(db, note_id, tag_id, current_user.id)
+    note = await db.run(crud.add_tag_to_note, note_id, tag_id, current_user_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note or Tag not found")
     return success_response(msg="Tag added to note successfully",
@@ -83,13 +130,14 @@ def add_tag_to_note(
 
 
 @router.delete("/{tag_id}/notes/{note_id}", response_model=ResponseBase[dict])
-def remove_tag_from_note(
+async def remove_tag_from_note(
         tag_id: int,
         note_id: int,
-        db: Session = Depends(get_db),
-        current_user: models.User = Depends(get_current_user),
+        db: DBRunner = Depends(get_db_runner),
+        current_user_id: int = Depends(get_current_user_id),
 ):
-    note = crud.remove_tag_from_note(db, note_id, tag_id, current_user.id)
+    note = await db.run(crud.remove_tag_from_note, note_id, tag_id,
+                        current_user_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note or Tag not found")
     return success_response(msg="Tag removed from note successfully",
@@ -6,30 +6,31 @@
 
 # here put the import lib
 
-
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-
 from app import crud
-from app.auth import create_access_token, verify_password
-from app.db import get_db
+from app.auth import averify_password, create_access_token
+from app.db import DBRunner, get_db_runner
 from app.schemas import OAuth2Response
 
 router = APIRouter(prefix="/api/token", tags=["token"])
 
 
 @router.post("", response_model=OAuth2Response)
-def token(form_data: OAuth2PasswordRequestForm = Depends(),
-          db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=form_data.username)
-    if not db_user or not verify_password(form_data.password,
-                                          db_user.hashed_password):
+async def token(form_data: OAuth2PasswordRequestForm = Depends(),
+                db: DBRunner = Depends(get_db_runner)):
+    db_user = await db.run(crud.get_user_by_email, email=form_data.username)
+    ok, new_hash = (await averify_password(
+        form_data.password, db_user.hashed_password) if db_user else
+                    (False, None))
+    if not ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        await db.run(crud.update_user_password_hash, db_user.id, new_hash)
 
     access_token = create_access_token(data={"sub": str(db_user.id)})
 
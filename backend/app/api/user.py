@@ -6,11 +6,11 @@
 
 from fastapi import APIRouter, Depends
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.orm import Session
 
 from app import crud
-from app.auth import create_access_token, get_current_user, verify_password
-from app.db import get_db
+from app.auth import (ahash_password, averify_password, create_access_token,
+                      get_current_user)
+from app.db import DBRunner, get_db_runner
 from app.models import user as user_model
 from app.schemas import (OAuth2Response, ResponseBase, UserCreate, UserLogin,
                          UserOut, error_response, success_response)
@@ -20,30 +20,30 @@ router = APIRouter(prefix="/api/users", tags=["users"])
 
 # 注册
 @router.post("/register", response_model=ResponseBase[UserOut])
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate,
+                   db: DBRunner = Depends(get_db_runner)):
     try:
         # 先检查用户名
-        if db.query(user_model.User).filter(
-                user_model.User.username == user_data.username).first():
+        if await db.run(crud.get_user_by_username, user_data.username):
             return error_response(code=1001, msg="Username already registered")
 
         # 再检查邮箱
-        if db.query(user_model.User).filter(
-                user_model.User.email == user_data.email).first():
+        if await db.run(crud.get_user_by_email, user_data.email):
             return error_response(code=1002, msg="Email already registered")
 
-        # 尝试创建用户
-        user = crud.create_user(db, user_data)
+        # 尝试创建用户；bcrypt 在进程池中计算，不占用请求线程
+        hashed_password = await ahash_password(user_data.password)
+        user = await db.run(crud.create_user, user_data, hashed_password)
         return success_response(data=user, msg="User registered successfully")
 
     except IntegrityError:
         # 并发下可能漏网 —— 再兜底
-        db.rollback()
+        await db.rollback()
         return error_response(code=1003,
                               msg="Email or username already registered")
 
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         return error_response(code=1004,
                               msg="Database error, please try again later")
 
@@ -53,11 +53,17 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
 # 以便处理函数可以使用这些依赖项来获取数据、执行验证、进行身份认证等操作
 # OAuth2 规范明确要求 token 请求必须使用 application/x-www-form-urlencoded，而不是 application/json。
 @router.post("/login", response_model=ResponseBase[OAuth2Response])
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
-    if not db_user or not verify_password(user.password,
-                                          db_user.hashed_password):
+async def login(user: UserLogin, db: DBRunner = Depends(get_db_runner)):
+    db_user = await db.run(crud.get_user_by_email, email=user.email)
+    if not db_user:
         return error_response(code=1003, msg="Incorrect email or password")
+    ok, new_hash = await averify_password(user.password,
+                                          db_user.hashed_password)
+    if not ok:
+        return error_response(code=1003, msg="Incorrect email or password")
+    if new_hash:
+        # 哈希参数（rounds）已调整，顺带更新存储的哈希
+        await db.run(crud.update_user_password_hash, db_user.id, new_hash)
 
     access_token = create_access_token(data={"sub": str(db_user.id)})
 
@@ -1,8 +1,11 @@
 # 用于认证相关统一导入
-from .auth import (create_access_token, get_current_user, hash_password,
+from .auth import (CurrentUserId, UserPrincipal, ahash_password,
+                   averify_password, create_access_token, get_current_user,
+                   get_current_user_id, hash_password, invalidate_user_cache,
                    verify_password)
 
 __all__ = [
     "hash_password", "create_access_token", "get_current_user",
-    "verify_password"
+    "verify_password", "get_current_user_id", "CurrentUserId", "UserPrincipal",
+    "invalidate_user_cache", "ahash_password", "averify_password"
 ]
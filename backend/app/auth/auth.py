@@ -6,34 +6,48 @@
 
 # here put the import lib
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Annotated, NamedTuple, Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import event
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
-from app.db import get_db
+from app.db import SessionLocal, get_db
 from app.models import User as user_model
+from app.utils.password_hasher import crypt_context, password_hasher
+from app.utils.ttl_cache import TTLCache
 
 # ------------------------
 # 密码哈希工具
 # ------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = crypt_context(settings.BCRYPT_ROUNDS)
 
 
 def hash_password(password: str) -> str:
-    """生成密码哈希"""
+    """生成密码哈希（同步，在当前线程计算）"""
     return pwd_context.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """校验密码是否匹配"""
+    """校验密码是否匹配（同步，在当前线程计算）"""
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def ahash_password(password: str) -> str:
+    """生成密码哈希（在密码哈希进程池中计算）"""
+    return await password_hasher.hash(password)
+
+
+async def averify_password(plain_password: str,
+                           hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """校验密码，返回 (是否匹配, 新哈希)；新哈希不为 None 时调用方应写回数据库"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
 # ------------------------
 # JWT 配置
 # ------------------------
@@ -47,7 +61,6 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (
         expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    print(123, expire)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
@@ -59,9 +72,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme),
-                     db: Session = Depends(get_db)) -> user_model:
-    """从 JWT token 中获取当前用户"""
+# ------------------------
+# 用户缓存
+# ------------------------
+class UserPrincipal(NamedTuple):
+    """鉴权通过后的轻量用户信息，不绑定 ORM Session，可跨请求缓存"""
+    id: int
+    username: str
+    email: str
+
+
+_user_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE,
+                       ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+def invalidate_user_cache(user_id: int) -> None:
+    """用户被删除或修改时清除本进程内的缓存"""
+    _user_cache.pop(str(user_id))
+
+
+@event.listens_for(user_model, "after_update")
+@event.listens_for(user_model, "after_delete")
+def _invalidate_user_on_write(mapper, connection, target):
+    invalidate_user_cache(target.id)
+
+
+def _load_principal(sub: str) -> Optional[UserPrincipal]:
+    # 缓存未命中时调用；不依赖 get_db，用完即还连接
+    with SessionLocal() as db:
+        row = db.query(
+            user_model.id, user_model.username,
+            user_model.email).filter(user_model.id == int(sub)).first()
+    if row is None:
+        return None
+    principal = UserPrincipal(*row)
+    _user_cache.set(sub, principal)
+    return principal
+
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    """从 JWT token 中获取当前用户 id（快速路径，缓存命中时不访问数据库）"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -70,13 +120,32 @@ def get_current_user(token: str = Depends(oauth2_scheme),
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or not user_id.isdigit():
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    # 根据 userid 查询数据库
-    user = db.query(user_model).filter(user_model.id == user_id).first()
-    if user is None:
+    principal = _user_cache.get(user_id)
+    if principal is None:
+        principal = await run_in_threadpool(_load_principal, user_id)
+    if principal is None:
         raise credentials_exception
+    return principal.id
+
+
+# 只需要用户 id 的接口使用：current_user_id: CurrentUserId
+CurrentUserId = Annotated[int, Depends(get_current_user_id)]
+
+
+def get_current_user(user_id: int = Depends(get_current_user_id),
+                     db: Session = Depends(get_db)) -> user_model:
+    """从 JWT token 中获取当前用户（完整 ORM 对象）"""
+    user = db.get(user_model, user_id)
+    if user is None:
+        invalidate_user_cache(user_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
@@ -5,6 +5,7 @@
 # @Description :
 
 from functools import lru_cache
+from typing import Literal, Optional
 
 # here put the import lib
 from pydantic_settings import BaseSettings
@@ -15,6 +16,106 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     DEEPSEEK_API_KEY: str
+    DEEPSEEK_API_URL: str = "https://api.deepseek.com/v1/chat/completions"
+    # 数据库栈：sync=psycopg2 + 线程池，async=asyncpg + AsyncSession，便于灰度切换
+    DB_STACK: Literal["sync", "async"] = "sync"
+    # 数据库引擎 / 连接池
+    DB_ECHO: bool = False  # True 时打印所有 SQL，仅调试用
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # 秒；池满时等待借出连接的最长时间
+    DB_POOL_RECYCLE: int = 1800  # 秒；超过该时长的连接在借出前重建
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 表示不限制
+    DB_PGBOUNCER: bool = False  # 经 PgBouncer 事务池连接：NullPool + 关闭预编译语句
+    # 认证缓存：JWT sub -> 用户，命中时鉴权不访问数据库
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_TTL: int = 60  # 秒；用户被删除 / 修改后其他进程最多延迟这么久生效
+    # 密码哈希：bcrypt 在独立进程池中计算；修改 rounds 后旧哈希在下次登录时更新
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2  # 进程数，0 表示退回线程池
+    PASSWORD_HASH_MAX_PENDING: int = 16  # 每个进程同时提交的最大任务数，超出的排队等待
+    # AI 摘要后台任务
+    SUMMARY_WORKER_ENABLED: bool = True
+    SUMMARY_WORKER_CONCURRENCY: int = 4  # 每个进程同时调用 LLM 的最大数量
+    SUMMARY_REQUEST_TIMEOUT: float = 30  # 秒
+    SUMMARY_POLL_INTERVAL: float = 2  # 秒；没有新任务通知时轮询队列的间隔
+    SUMMARY_JOB_STALE_AFTER: int = 300  # 秒；running 超过该时长视为 worker 失联
+    # AI 摘要缓存
+    SUMMARY_CACHE_SIZE: int = 1024  # 进程内 LRU 条数
+    SUMMARY_CACHE_TTL: int = 7 * 24 * 3600  # 秒
+    SUMMARY_CACHE_MAX_ROWS: int = 100000  # 持久层最多保留条数
+
+    # 标签列表 / 笔记列表的读穿缓存，key 带用户数据版本号，写入后自动失效
+    CACHE_ENABLED: bool = True
+    CACHE_MEMORY_SIZE: int = 2048  # 进程内 LRU 条数
+    CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024  # 进程内缓存的响应体总字节数上限
+    CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024  # 超过该大小的响应体不进进程内缓存
+    CACHE_TTL: int = 300  # 秒
+    # 如 redis://localhost:6379/0，为空时只用进程内缓存（需安装 redis 可选依赖）
+    CACHE_REDIS_URL: Optional[str] = None
+    CACHE_REDIS_TIMEOUT: float = 0.5  # 秒；Redis 超时按未命中处理
+    CACHE_KEY_PREFIX: str = "kms"
+    CACHE_LOCK_TIMEOUT: float = 5  # 秒；其他进程加载同一 key 时最多等待这么久
+
+    # 暴露 /metrics（Prometheus）；该接口不鉴权，应只允许内网 / 监控系统访问
+    METRICS_ENABLED: bool = True
+
+    # 按请求的 SQL 统计：Server-Timing 响应头 + 超过阈值时输出语句列表
+    SQL_PROFILE_ENABLED: bool = True
+    SQL_PROFILE_SERVER_TIMING: bool = True  # 响应头会暴露 DB 耗时，对外服务可关闭
+    SQL_PROFILE_SLOW_REQUEST_MS: float = 500
+    SQL_PROFILE_MAX_STATEMENTS: int = 20  # 单个请求超过这么多条语句时记录
+    SQL_PROFILE_REPEAT_THRESHOLD: int = 10  # 同一指纹重复这么多次（疑似 N+1）时记录
+    # 对单次耗时超过 EXPLAIN_MIN_MS 的 SELECT 按概率采样 EXPLAIN ANALYZE，0 表示关闭
+    SQL_PROFILE_EXPLAIN_SAMPLE_RATE: float = 0.0
+    SQL_PROFILE_EXPLAIN_MIN_MS: float = 200
+    SQL_PROFILE_EXPLAIN_INTERVAL: int = 600  # 秒；同一指纹两次 EXPLAIN 的最小间隔
+
+    # 增量同步的删除墓碑保留天数，更早的定期清理；上次同步早于清理范围的客户端需全量重新同步
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30  # 0 表示不清理
+    SYNC_PRUNE_INTERVAL: float = 3600  # 秒；清理墓碑的间隔
+    SYNC_PRUNE_BATCH_SIZE: int = 500  # 每个事务清理的用户数
+
+    EXPORT_CHUNK_SIZE: int = 500  # 导出时服务端游标每次读取的行数
+    IMPORT_CHUNK_SIZE: int = 1000  # 导入时每个事务写入的笔记数
+    IMPORT_MAX_BYTES: int = 512 * 1024 * 1024  # 导入文件大小上限
+    IMPORT_SPOOL_SIZE: int = 8 * 1024 * 1024  # 上传内容超过该大小后转存临时文件
+
+    # 语义搜索（/api/notes/search?mode=semantic|hybrid）：本地哈希词频向量 + 进程内索引
+    SEMANTIC_DIM: int = 512  # 向量维度，修改后已存储的向量会按需重新计算
+    SEMANTIC_MIN_SCORE: float = 0.1  # 低于该相似度的结果不返回
+    SEMANTIC_INDEX_MAX_USERS: int = 64  # 每个进程缓存索引的用户数
+    SEMANTIC_IVF_MIN_SIZE: int = 20000  # 笔记数达到该值时改用 IVF 近似检索
+    SEMANTIC_IVF_NPROBE: int = 8  # IVF 查询时计算的簇数
+    HYBRID_CANDIDATES: int = 100  # hybrid 模式下关键词 / 向量各取的候选数
+    HYBRID_RRF_K: int = 60  # 倒数排名融合（RRF）的平滑常数
+
+    # 关联笔记（/api/notes/{id}/related）：后台 worker 按 sync_changes 增量维护近邻表
+    RELATED_WORKER_ENABLED: bool = True
+    RELATED_POLL_INTERVAL: float = 5  # 秒；没有写入通知时检查待处理变更的间隔
+    RELATED_BATCH_SIZE: int = 200  # 每个事务处理的变化笔记数
+    RELATED_RETRY_DELAY: float = 30  # 秒；处理失败的用户首次重试的间隔，之后每次翻倍
+    RELATED_TOP_K: int = 10  # 每篇笔记保存的近邻数
+    RELATED_CANDIDATES: int = 50  # 文本相似 / 共同标签各取的候选数
+    RELATED_TAG_WEIGHT: float = 0.3  # 标签 Jaccard 相似度在综合分数中的权重
+    RELATED_MIN_SCORE: float = 0.05  # 低于该综合分数的不作为近邻
+
+    # 生产服务进程：gunicorn + uvicorn worker（见 gunicorn.conf.py）
+    SERVER_BIND: str = "0.0.0.0:8000"
+    SERVER_WORKERS: int = 0  # 0 表示按 CPU 核数；每个 worker 各有一套连接池
+    # auto：安装了 uvloop / httptools 就使用，否则退回 asyncio / h11
+    SERVER_LOOP: Literal["auto", "asyncio", "uvloop"] = "auto"
+    SERVER_HTTP: Literal["auto", "h11", "httptools"] = "auto"
+    SERVER_PRELOAD: bool = True  # fork 前在 master 中导入应用，worker 共享只读内存
+    SERVER_TIMEOUT: int = 60  # 秒；worker 无响应超过该时长被重启
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # 秒；重启 / 退出时等待处理中请求完成的时长
+    SERVER_KEEPALIVE: int = 5  # 秒
+    SERVER_MAX_REQUESTS: int = 0  # >0 时 worker 处理这么多请求后平滑重启
+
+    # 读接口的 Cache-Control；private 防止共享缓存（nginx / CDN）跨用户复用，
+    # no-cache 要求每次带 If-None-Match 回源校验，未变化时返回 304
+    HTTP_CACHE_CONTROL: str = "private, no-cache"
 
     class Config:
         env_file = ".env"  # 指定读取 backend/.env 文件
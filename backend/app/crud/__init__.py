@@ -1,15 +1,44 @@
 from .favorite import (add_favorite, get_user_favorite_notes,
                        is_note_favorited, list_notes_with_favorites,
                        remove_favorite)
+from .note_export import iter_export_chunks
+from .note_import import import_note_records, import_notes, resolve_tag_names
+from .note_related import (defer_related_user, get_related_notes,
+                           pending_related_users, update_related_notes)
+from .note_semantic import (refresh_user_index, save_note_embedding,
+                            semantic_note_ids)
+from .note_view import NOTE_PREVIEW_LENGTH, NoteView, resolve_note_view
 from .note import create_note, delete_note, get_note, search_notes, update_note, get_notes_by_tags
-from .tag import (add_tag_to_note, create_tag, delete_tag, get_tags,
-                  remove_tag_from_note, update_tag)
-from .user import create_user, get_user_by_email
+from .summary_cache import (evict_summary_cache, get_cached_summary,
+                            save_cached_summary)
+from .summary_job import (claim_summary_jobs, complete_summary_job,
+                          create_summary_job, fail_summary_job,
+                          get_summary_job)
+from .sync import (decode_sync_token, encode_sync_token, get_changes,
+                   prune_sync_tombstones)
+from .tag import (add_tag_to_note, bulk_add_tags_to_notes,
+                  bulk_remove_tags_from_notes, create_tag, delete_tag,
+                  get_tags, get_tags_by_ids, remove_tag_from_note, update_tag)
+from .user import (create_user, get_user_by_email, get_user_by_username,
+                   update_user_password_hash)
+from .user_stats import (get_collection_version, get_note_version,
+                         get_user_stats)
 
 __all__ = [
     "get_user_by_email", "create_user", "create_note", "update_note",
     "delete_note", "get_note", "search_notes", "create_tag", "get_tags",
     "update_tag", "delete_tag", "add_tag_to_note", "remove_tag_from_note",
     "add_favorite", "remove_favorite", "get_user_favorite_notes",
-    "is_note_favorited", "list_notes_with_favorites", "get_notes_by_tags"
+    "is_note_favorited", "list_notes_with_favorites", "get_notes_by_tags",
+    "get_user_stats", "create_summary_job", "get_summary_job",
+    "claim_summary_jobs", "complete_summary_job", "fail_summary_job",
+    "get_cached_summary", "save_cached_summary", "evict_summary_cache",
+    "get_tags_by_ids", "bulk_add_tags_to_notes", "bulk_remove_tags_from_notes",
+    "get_user_by_username", "update_user_password_hash", "NoteView",
+    "resolve_note_view", "NOTE_PREVIEW_LENGTH", "get_collection_version",
+    "get_note_version", "iter_export_chunks", "import_note_records",
+    "import_notes", "resolve_tag_names", "get_changes", "encode_sync_token",
+    "decode_sync_token", "prune_sync_tombstones", "refresh_user_index",
+    "save_note_embedding", "semantic_note_ids", "get_related_notes",
+    "pending_related_users", "update_related_notes", "defer_related_user"
 ]
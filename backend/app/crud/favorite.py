@@ -1,14 +1,19 @@
 # Favorite 相关数据库操作
+from typing import Optional
+
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.sql import exists
 
 from app import models
+from app.crud.note_view import FULL_VIEW, NoteView
+from app.crud.user_stats import get_user_stats
+from app.utils.pagination import paginate, split_page
 
 
 # 添加收藏
 def add_favorite(db: Session, user_id: int, note_id: int):
-    note = db.query(models.Note).filter(models.Note.id == note_id).first()
+    note = db.query(models.Note.id).filter(models.Note.id == note_id).first()
     if not note:
         return None, "Note not found"
 
@@ -49,24 +54,41 @@ def remove_favorite(db: Session, user_id: int, note_id: int):
 def get_user_favorite_notes(db: Session,
                             user_id: int,
                             skip: int = 0,
-                            limit: int = 20):
-    # 查询收藏总记录数
-    total = (db.query(models.Note).join(
-        models.Favorite, models.Note.id == models.Favorite.note_id).filter(
-            models.Favorite.user_id == user_id).count())
-    # 查询当前用户收藏的所有笔记，并支持分页
-    res = (
-        db.query(models.Note).join(
-            models.Favorite, models.Note.id == models.Favorite.note_id).filter(
-                models.Favorite.user_id == user_id).options(
-                    joinedload(models.Note.tags))  # 预加载 tags
-        .order_by(models.Favorite.created_at.desc())  # 按收藏时间降序
-        .offset(skip).limit(limit).all())
-
-    for note in res:
+                            limit: int = 20,
+                            cursor: Optional[str] = None,
+                            include_total: bool = True,
+                            view: NoteView = FULL_VIEW):
+    # 收藏总数直接读计数表，不再 COUNT(*)
+    total = (get_user_stats(db, user_id).favorite_count
+             if include_total else None)
+    # 查询当前用户收藏的所有笔记，按收藏时间降序，支持 offset / 游标分页
+    query = (
+        db.query(models.Note, models.Favorite.created_at,
+                 models.Favorite.id).join(
+                     models.Favorite,
+                     models.Note.id == models.Favorite.note_id).filter(
+                         models.Favorite.user_id == user_id).options(
+                             selectinload(models.Note.tags))  # 预加载 tags
+    )
+    query = view.apply(query)
+    rows = [
+        view.unpack(row)
+        for row in paginate(query, models.Favorite.created_at,
+                            models.Favorite.id, skip, limit, cursor).all()
+    ]
+    rows, next_cursor = split_page(rows, limit, key=lambda r: (r[1], r[2]))
+
+    res = []
+    for note, _, _ in rows:
         note.is_favorited = True  # 用户的收藏列表，全部标记为已收藏
+        res.append(note)
 
-    return {"total": total, "notes": res}
+    return {
+        "total": total,
+        "notes": res,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
 
 
 # 判断某笔记是否被用户收藏
@@ -81,25 +103,36 @@ def is_note_favorited(db: Session, user_id: int, note_id: int) -> bool:
 def list_notes_with_favorites(db: Session,
                               user_id: int,
                               skip: int = 0,
-                              limit: int = 20):
-    # 查询总记录数
-    total = (db.query(
-        models.Note).filter(models.Note.user_id == user_id).count())
+                              limit: int = 20,
+                              cursor: Optional[str] = None,
+                              include_total: bool = True,
+                              view: NoteView = FULL_VIEW):
+    # 笔记总数直接读计数表，不再 COUNT(*)
+    total = (get_user_stats(db, user_id).note_count if include_total else None)
     # 子查询：判断当前用户是否收藏了笔记
     favorite_subquery = (db.query(models.Favorite.note_id).filter(
         models.Favorite.user_id == user_id).subquery())
 
-    # 主查询：查询笔记并附加 is_favorited 字段
-    tmp_notes = (
+    # 主查询：查询笔记并附加 is_favorited 字段，按修改时间降序分页
+    query = (
         db.query(
             models.Note,
             exists().where(
                 models.Note.id == favorite_subquery.c.note_id).label(
                     "is_favorited")  # 附加布尔字段
         ).filter(models.Note.user_id == user_id).options(
-            joinedload(models.Note.tags))  # 预加载 tags
-        .order_by(models.Note.updated_at.desc())  # 按修改时间降序
-        .offset(skip).limit(limit).all())
+            selectinload(models.Note.tags))  # 预加载 tags
+    )
+    query = view.apply(query)
+    tmp_notes = [
+        view.unpack(row)
+        for row in paginate(query, models.Note.updated_at, models.Note.id,
+                            skip, limit, cursor).all()
+    ]
+    tmp_notes, next_cursor = split_page(tmp_notes,
+                                        limit,
+                                        key=lambda r:
+                                        (r[0].updated_at, r[0].id))
 
     # 将查询结果中的 is_favorited 字段附加到 Note 对象
     res = []
@@ -107,4 +140,9 @@ def list_notes_with_favorites(db: Session,
         note.is_favorited = is_favorited
         res.append(note)
 
-    return {"total": total, "notes": res}
+    return {
+        "total": total,
+        "notes": res,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
@@ -1,14 +1,32 @@
 # Note 相关数据库操作
-from typing import List
+from typing import Dict, List, Optional
 
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.sql import exists
 
 from app import models
+from app.config import settings
 # 如果 is_note_favorited 是本模块外部函数，需要导入
 from app.crud.favorite import is_note_favorited
+from app.crud.note_semantic import save_note_embedding, semantic_note_ids
+from app.crud.note_view import FULL_VIEW, NoteView
+from app.crud.tag import get_tags_by_ids
+from app.models.note_tags import note_tags
 from app.schemas import NoteCreate, NoteUpdate
+from app.utils.pagination import paginate, split_page
+
+
+def _resolve_tags(db: Session, user_id: int, tag_ids: List[int]):
+    """一次 IN 查询校验标签存在且属于当前用户，按传入顺序返回"""
+    found = {tag.id: tag for tag in get_tags_by_ids(db, user_id, tag_ids)}
+    tags = []
+    for tag_id in dict.fromkeys(tag_ids):
+        if tag_id not in found:
+            return None, f"Tag '{tag_id}' does not exist"
+        tags.append(found[tag_id])
+    return tags, None
 
 
 def create_note(db: Session, user_id: int, note: NoteCreate):
@@ -19,17 +37,16 @@ def create_note(db: Session, user_id: int, note: NoteCreate):
         summary=note.summary,
     )
 
-    # 处理 tags（只允许已有标签）
+    # 处理 tags（只允许当前用户已有的标签）
     if note.tags:
-        tags = []
-        for tag_id in note.tags:
-            tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
-            if not tag:
-                raise ValueError(f"Tag '{tag_id}' does not exist")  # 阻止新建
-            tags.append(tag)
+        tags, err = _resolve_tags(db, user_id, note.tags)
+        if err:
+            raise ValueError(err)  # 阻止新建
         db_note.tags = tags
 
     db.add(db_note)
+    db.flush()  # 取得笔记 id，向量与笔记在同一事务中写入
+    save_note_embedding(db, db_note)
     db.commit()
     db.refresh(db_note)
     db_note.is_favorited = False  # 新建的笔记默认未收藏
@@ -39,31 +56,35 @@ def create_note(db: Session, user_id: int, note: NoteCreate):
 def update_note(db: Session, note_id: int, user_id: int,
                 note_update: NoteUpdate):
     note = db.query(models.Note).filter(models.Note.id == note_id).first()
-    # 判断是否被收藏
-    note.is_favorited = is_note_favorited(db, user_id, note_id)
     if not note:
         return None, "Note not found"
     if note.user_id != user_id:
         return None, "Not authorized to edit this note"
+    # 判断是否被收藏
+    note.is_favorited = is_note_favorited(db, user_id, note_id)
 
+    text_changed = False
     if note_update.title is not None:
+        text_changed |= note.title != note_update.title
         note.title = note_update.title
     if note_update.content is not None:
+        text_changed |= note.content != note_update.content
         note.content = note_update.content
     if note_update.summary is not None:
         note.summary = note_update.summary
 
     # 更新 tags（如果传了就整体替换，并严格校验存在性）
     if note_update.tags is not None:
-        tags = []
-        for tag_id in note_update.tags:
-            tag = db.query(models.Tag).filter(models.Tag.id == tag_id).first()
-            if not tag:
-                return None, f"Tag '{tag_id}' does not exist"
-            tags.append(tag)
+        tags, err = _resolve_tags(db, user_id, note_update.tags)
+        if err:
+            return None, err
         note.tags = tags
     try:
+        # 标题或正文变化时重新计算向量；语义索引通过 sync_changes 得知笔记已变化
+        if text_changed:
+            save_note_embedding(db, note)
         db.commit()
+        # refresh 会按 selectin 策略一并重新加载 tags，序列化时不再懒加载
         db.refresh(note)
         return note, None
     except SQLAlchemyError as e:
@@ -79,6 +100,7 @@ def delete_note(db: Session, note_id: int, user_id: int):
         return False, "Not authorized to delete this note"
 
     try:
+        # 删除墓碑由 notes 上的触发器写入 sync_changes，增量同步据此下发删除
         db.delete(note)
         db.commit()
         return True, None
@@ -93,7 +115,7 @@ def get_note(db: Session, note_id: int, user_id: int):
     note = (
         db.query(models.Note).filter(
             models.Note.id == note_id, models.Note.user_id == user_id).options(
-                joinedload(models.Note.tags))  # 预加载 tags
+                selectinload(models.Note.tags))  # 预加载 tags
         .first())
 
     if not note:
@@ -105,35 +127,125 @@ def get_note(db: Session, note_id: int, user_id: int):
     return note
 
 
-# 简单全文搜索 todo 接入ElasticSearch？
+# 全文搜索：基于 search_vector（GIN 索引 notes_search_idx，由触发器维护）
+# 过短的关键词分词后几乎无意义，回退到 ILIKE 模糊匹配
+FTS_CONFIG = "english"  # 需与迁移 a59deba3aabb 中触发器使用的配置一致
+FTS_MIN_QUERY_LENGTH = 3
+FTS_HEADLINE_OPTIONS = ("StartSel=<mark>, StopSel=</mark>, "
+                        "MaxWords=35, MinWords=15, MaxFragments=2")
+
+
 def search_notes(db: Session,
                  user_id: int,
                  query: str,
                  skip: int = 0,
-                 limit: int = 20):
+                 limit: int = 20,
+                 mode: str = "fts",
+                 view: NoteView = FULL_VIEW):
+    query = query.strip()
     # 子查询：判断当前用户是否收藏了笔记
     favorite_subquery = (db.query(models.Favorite.note_id).filter(
         models.Favorite.user_id == user_id).subquery())
+    is_favorited = exists().where(
+        models.Note.id == favorite_subquery.c.note_id).label("is_favorited")
+
+    if mode in ("semantic", "hybrid"):
+        return _search_ranked(db, user_id, query, skip, limit, mode, view,
+                              is_favorited)
 
-    # 主查询：全文搜索笔记，并附加 is_favorited 字段
-    tmp_notes = (
-        db.query(
-            models.Note,
-            exists().where(
-                models.Note.id == favorite_subquery.c.note_id).label(
-                    "is_favorited")  # 附加布尔字段
+    if mode == "like" or len(query) < FTS_MIN_QUERY_LENGTH:
+        tmp_notes = (view.apply(
+            db.query(models.Note,
+                     is_favorited).options(selectinload(models.Note.tags))
         ).filter(models.Note.user_id == user_id,
                  (models.Note.title.ilike(f"%{query}%")
                   | models.Note.content.ilike(f"%{query}%")
-                  | models.Note.summary.ilike(f"%{query}%")
-                  )).offset(skip).limit(limit).all())
+                  | models.Note.summary.ilike(f"%{query}%"))).order_by(
+                      models.Note.updated_at.desc(),
+                      models.Note.id.desc()).offset(skip).limit(limit).all())
+        return _attach_search_fields(
+            view.unpack(row) + (None, ) for row in tmp_notes)
+
+    ts_query = func.websearch_to_tsquery(FTS_CONFIG, query)
+    rank = func.ts_rank_cd(models.Note.search_vector, ts_query).label("rank")
+
+    # 子查询：命中 GIN 索引并按相关度排序分页，只返回 id 和 rank
+    ranked = (db.query(models.Note.id.label("id"), rank).filter(
+        models.Note.user_id == user_id,
+        models.Note.search_vector.op("@@")(ts_query)).order_by(
+            rank.desc(),
+            models.Note.id.desc()).offset(skip).limit(limit).subquery())
+
+    # 主查询：ts_headline 代价较高，只对当前页的结果计算高亮片段
+    headline = func.ts_headline(FTS_CONFIG, models.Note.content, ts_query,
+                                FTS_HEADLINE_OPTIONS).label("headline")
+    tmp_notes = (view.apply(
+        db.query(models.Note, is_favorited,
+                 headline).options(selectinload(models.Note.tags))).join(
+                     ranked, models.Note.id == ranked.c.id).order_by(
+                         ranked.c.rank.desc(), models.Note.id.desc()).all())
+
+    return _attach_search_fields(view.unpack(row) for row in tmp_notes)
 
-    # 将查询结果中的 is_favorited 字段附加到 Note 对象
+
+def _fts_note_ids(db: Session, user_id: int, query: str, k: int) -> List[int]:
+    ts_query = func.websearch_to_tsquery(FTS_CONFIG, query)
+    rank = func.ts_rank_cd(models.Note.search_vector, ts_query)
+    return list(
+        db.scalars(
+            select(models.Note.id).where(
+                models.Note.user_id == user_id,
+                models.Note.search_vector.op("@@")(ts_query)).order_by(
+                    rank.desc(), models.Note.id.desc()).limit(k)))
+
+
+def _search_ranked(db: Session, user_id: int, query: str, skip: int,
+                   limit: int, mode: str, view: NoteView, is_favorited):
+    """semantic：按向量相似度排序；hybrid：关键词与向量两路结果做倒数排名融合（RRF）
+
+    两路分数的量纲不同，RRF 只看名次：score = Σ 1 / (HYBRID_RRF_K + 名次)。
+    过短的关键词不做全文检索，hybrid 退化为仅向量
+    """
+    k = skip + limit
+    if mode == "semantic":
+        ranked = [
+            note_id for note_id, _ in semantic_note_ids(db, user_id, query, k)
+        ]
+    else:
+        k = max(settings.HYBRID_CANDIDATES, k)
+        lexical = (_fts_note_ids(db, user_id, query, k)
+                   if len(query) >= FTS_MIN_QUERY_LENGTH else [])
+        semantic = [
+            note_id for note_id, _ in semantic_note_ids(db, user_id, query, k)
+        ]
+        fused: Dict[int, float] = {}
+        for ranking in (lexical, semantic):
+            for rank, note_id in enumerate(ranking, start=1):
+                score = 1.0 / (settings.HYBRID_RRF_K + rank)
+                fused[note_id] = fused.get(note_id, 0.0) + score
+        ranked = sorted(fused, key=lambda i: (-fused[i], -i))
+    note_ids = ranked[skip:skip + limit]
+    if not note_ids:
+        return []
+
+    rows = view.apply(
+        db.query(models.Note,
+                 is_favorited).options(selectinload(models.Note.tags))).filter(
+                     models.Note.user_id == user_id,
+                     models.Note.id.in_(note_ids)).all()
+    # 索引追赶之后笔记可能又被删除，按名次还原顺序时跳过
+    by_id = {row[0].id: view.unpack(row) for row in rows}
+    return _attach_search_fields(by_id[note_id] + (None, )
+                                 for note_id in note_ids if note_id in by_id)
+
+
+def _attach_search_fields(rows):
+    # 将查询结果中的 is_favorited / headline 字段附加到 Note 对象
     res = []
-    for note, is_favorited in tmp_notes:
+    for note, is_favorited, headline in rows:
         note.is_favorited = is_favorited
+        note.headline = headline
         res.append(note)
-
     return res
 
 
@@ -141,40 +253,42 @@ def get_notes_by_tags(db: Session,
                       user_id: int,
                       tag_id_list: List[int],
                       skip: int = 0,
-                      limit: int = 20):
+                      limit: int = 20,
+                      cursor: Optional[str] = None,
+                      include_total: bool = True,
+                      view: NoteView = FULL_VIEW):
     try:
-        # 查询总记录数
-        total = (
-            db.query(models.Note).join(models.Note.tags)  # 关联 tags 表
-            .filter(
-                models.Note.user_id == user_id,
-                models.Tag.id.in_(tag_id_list)  # 根据 tag_id_list 过滤
-            ).group_by(models.Note.id)  # 按笔记分组
-            .count())
+        # 笔记带有 tag_id_list 中任一标签（EXISTS 避免 JOIN 后按笔记去重）
+        has_tags = exists().where(note_tags.c.note_id == models.Note.id,
+                                  note_tags.c.tag_id.in_(tag_id_list))
+        # 查询总记录数（标签组合无法预先计数，仍需 COUNT，可通过 include_total 跳过）
+        total = (db.query(models.Note).filter(models.Note.user_id == user_id,
+                                              has_tags).count()
+                 if include_total else None)
         # 子查询：判断当前用户是否收藏了笔记
         favorite_subquery = (db.query(models.Favorite.note_id).filter(
             models.Favorite.user_id == user_id).subquery())
 
-        # 子查询：查询符合条件的笔记 ID
-        note_subquery = (
-            db.query(models.Note.id).join(models.Note.tags)  # 关联 tags 表
-            .filter(
-                models.Note.user_id == user_id,
-                models.Tag.id.in_(tag_id_list)  # 根据 tag_id_list 过滤
-            ).group_by(models.Note.id)  # 按笔记分组
-            .offset(skip).limit(limit).subquery())
-
-        # 主查询：根据子查询的笔记 ID 获取完整的笔记数据，并附加 is_favorited 字段
-        tmp_notes = (
+        # 主查询：获取完整的笔记数据并附加 is_favorited 字段，按修改时间降序分页
+        query = (
             db.query(
                 models.Note,
                 exists().where(
                     models.Note.id == favorite_subquery.c.note_id).label(
                         "is_favorited")  # 附加布尔字段
-            ).filter(models.Note.id.in_(note_subquery)).options(
-                joinedload(models.Note.tags))  # 预加载 tags
-            .order_by(models.Note.updated_at.desc())  # 按修改时间降序
-            .all())
+            ).filter(models.Note.user_id == user_id, has_tags).options(
+                selectinload(models.Note.tags))  # 预加载 tags
+        )
+        query = view.apply(query)
+        tmp_notes = [
+            view.unpack(row)
+            for row in paginate(query, models.Note.updated_at, models.Note.id,
+                                skip, limit, cursor).all()
+        ]
+        tmp_notes, next_cursor = split_page(tmp_notes,
+                                            limit,
+                                            key=lambda r:
+                                            (r[0].updated_at, r[0].id))
 
         # 将查询结果中的 is_favorited 字段附加到 Note 对象
         res = []
@@ -182,6 +296,11 @@ def get_notes_by_tags(db: Session,
             note.is_favorited = is_favorited
             res.append(note)
 
-        return {"total": total, "notes": res}
+        return {
+            "total": total,
+            "notes": res,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
     except SQLAlchemyError as e:
         raise e
@@ -0,0 +1,56 @@
+# 笔记导出：服务端游标分块读取，每块一次性加载标签
+from collections import defaultdict
+from typing import Dict, Iterator, List
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models.note_tags import note_tags
+
+EXPORT_COLUMNS = (models.Note.id, models.Note.title, models.Note.content,
+                  models.Note.summary, models.Note.created_at,
+                  models.Note.updated_at)
+
+
+def iter_export_chunks(db: Session, user_id: int,
+                       chunk_size: int) -> Iterator[List[dict]]:
+    """按 id 顺序逐块返回当前用户的全部笔记（dict，含标签名和收藏状态）
+
+    只查询列而不构造 ORM 对象；stream_results 使用服务端游标，
+    进程内任何时候只持有一块数据，内存占用与笔记总数无关
+    """
+    is_favorited = exists().where(
+        models.Favorite.user_id == user_id,
+        models.Favorite.note_id == models.Note.id).label("is_favorited")
+    result = db.execute(
+        select(*EXPORT_COLUMNS,
+               is_favorited).where(models.Note.user_id == user_id).order_by(
+                   models.Note.id).execution_options(stream_results=True,
+                                                     yield_per=chunk_size))
+    for rows in result.partitions():
+        tags = _tag_names_by_note(db, [row.id for row in rows])
+        yield [{
+            "id": row.id,
+            "title": row.title,
+            "content": row.content,
+            "summary": row.summary,
+            "tags": tags.get(row.id, []),
+            "is_favorited": row.is_favorited,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+        } for row in rows]
+
+
+def _tag_names_by_note(db: Session,
+                       note_ids: List[int]) -> Dict[int, List[str]]:
+    # 一条 IN 查询取出整块笔记的标签，避免逐条笔记加载
+    by_note: Dict[int, List[str]] = defaultdict(list)
+    rows = db.execute(
+        select(note_tags.c.note_id, models.Tag.name).join(
+            models.Tag, models.Tag.id == note_tags.c.tag_id).where(
+                note_tags.c.note_id.in_(note_ids)).order_by(
+                    note_tags.c.note_id, models.Tag.name))
+    for note_id, name in rows:
+        by_note[note_id].append(name)
+    return by_note
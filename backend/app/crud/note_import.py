@@ -0,0 +1,188 @@
+# 笔记批量导入：标签按名称批量解析 / 创建，笔记及关联行分块 COPY 写入
+import io
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import Table, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models.note_tags import note_tags
+from app.schemas import NoteImport
+from app.utils.note_archive import ImportRecord
+
+
+def resolve_tag_names(db: Session, user_id: int, names: Iterable[str],
+                      known: Dict[str, int]) -> Tuple[int, Set[str]]:
+    """把尚未解析的标签名写入 known（名称 -> id），返回 (新建数, 无法使用的名称)
+
+    不存在的标签用一条 INSERT ... ON CONFLICT DO NOTHING 批量创建，已有的再用一条 IN 查询取回；
+    标签名全局唯一，被其他用户占用的名称无法使用
+    """
+    missing = sorted(set(names) - known.keys())
+    if not missing:
+        return 0, set()
+    created = db.execute(
+        insert(models.Tag).values([{
+            "name": name,
+            "user_id": user_id
+        } for name in missing]).on_conflict_do_nothing().returning(
+            models.Tag.id, models.Tag.name)).all()
+    known.update((name, tag_id) for tag_id, name in created)
+    existing = [name for name in missing if name not in known]
+    if existing:
+        rows = db.execute(
+            select(models.Tag.id,
+                   models.Tag.name).where(models.Tag.user_id == user_id,
+                                          models.Tag.name.in_(existing)))
+        known.update((name, tag_id) for tag_id, name in rows)
+    db.commit()
+    return len(created), {name for name in missing if name not in known}
+
+
+def _csv_field(value) -> str:
+    if value is None:
+        return ""  # CSV 格式下不带引号的空值为 NULL
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _bulk_insert(db: Session, table: Table, rows: List[dict]):
+    """psycopg2 下用 COPY ... FROM STDIN 写入（无逐行参数绑定），其余驱动回退为 executemany"""
+    if not rows:
+        return
+    if db.get_bind().dialect.driver != "psycopg2":
+        db.execute(insert(table), rows)
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_csv_field(row[column]) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    statement = (f"COPY {table.name} ({', '.join(columns)}) FROM STDIN "
+                 "WITH (FORMAT csv)")
+    # 与会话共用同一连接，COPY 与其余语句在同一事务内
+    dbapi = db.get_bind().dialect.dbapi
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    except dbapi.Error as e:
+        # 直接调用驱动不经过 SQLAlchemy，包装成 DBAPIError 以便调用方统一按 SQLAlchemyError 处理
+        raise DBAPIError.instance(statement, None, e, dbapi.Error) from e
+    finally:
+        cursor.close()
+
+
+def import_notes(db: Session, user_id: int, notes: List[NoteImport],
+                 tag_ids: Dict[str, int]) -> List[int]:
+    """同一事务写入一块笔记及其标签关联、收藏，返回新笔记 id（与传入顺序一致）
+
+    先用一条语句从序列预取整块的 id，笔记和关联行都可以直接 COPY，不需要 RETURNING
+    """
+    sequence = func.pg_get_serial_sequence("notes", "id")
+    note_ids = db.scalars(
+        select(func.nextval(sequence)).select_from(
+            func.generate_series(1, len(notes)))).all()
+    now = datetime.now(timezone.utc)
+    rows, links, favorites = [], [], []
+    for note_id, note in zip(note_ids, notes):
+        rows.append({
+            "id": note_id,
+            "user_id": user_id,
+            "title": note.title,
+            "content": note.content,
+            "summary": note.summary,
+            "created_at": note.created_at or now,
+            "updated_at": note.updated_at or note.created_at or now,
+        })
+        links.extend({
+            "note_id": note_id,
+            "tag_id": tag_ids[name]
+        } for name in dict.fromkeys(note.tags))
+        if note.is_favorited:
+            favorites.append({"user_id": user_id, "note_id": note_id})
+    _bulk_insert(db, models.Note.__table__, rows)
+    _bulk_insert(db, note_tags, links)
+    _bulk_insert(db, models.Favorite.__table__, favorites)
+    db.commit()
+    return note_ids
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                     for error in exc.errors())
+
+
+def import_note_records(db: Session, user_id: int,
+                        records: Iterable[ImportRecord],
+                        chunk_size: int) -> Iterator[dict]:
+    """逐块导入解析出的记录，返回事件 dict：
+
+    - error：单条记录无效（record 为该条的位置，跳过该条）；
+      或整块写入失败（records 为该块全部记录，整块回滚，后续块继续）
+    - progress：每块提交后的累计数量
+    - done：全部完成后的汇总
+    """
+    totals = {"imported": 0, "failed": 0, "tags_created": 0}
+    tag_ids: Dict[str, int] = {}
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        valid = []
+        for label, record, err in chunk:
+            if err is None:
+                try:
+                    valid.append((label, NoteImport.model_validate(record)))
+                    continue
+                except ValidationError as e:
+                    err = _validation_message(e)
+            totals["failed"] += 1
+            yield {"event": "error", "record": label, "error": err}
+
+        names = {name for _, note in valid for name in note.tags}
+        try:
+            created, unusable = resolve_tag_names(db, user_id, names, tag_ids)
+        except SQLAlchemyError:
+            db.rollback()
+            created, unusable = 0, names - tag_ids.keys()
+        totals["tags_created"] += created
+
+        notes, labels = [], []
+        for label, note in valid:
+            taken = unusable.intersection(note.tags)
+            if taken:
+                totals["failed"] += 1
+                yield {
+                    "event": "error",
+                    "record": label,
+                    "error": f"Tag '{min(taken)}' is not available"
+                }
+                continue
+            notes.append(note)
+            labels.append(label)
+        if notes:
+            try:
+                import_notes(db, user_id, notes, tag_ids)
+                totals["imported"] += len(notes)
+            except SQLAlchemyError:
+                db.rollback()
+                totals["failed"] += len(notes)
+                yield {
+                    "event": "error",
+                    "records": labels,
+                    "error": "Failed to save notes"
+                }
+        yield {"event": "progress", **totals}
+    yield {"event": "done", **totals}
@@ -0,0 +1,282 @@
+# 关联笔记：related_notes 中预先计算的近邻，读取时只按 note_id 查一次
+#
+# 后台 worker（utils/related_worker.py）按 sync_changes 增量维护：
+# - 变化的笔记重新计算 top-k 近邻；原本把它列为近邻的笔记也重新计算
+# - 分数对称，变化笔记的新近邻同时把它插入自己的列表，再截断回 top-k
+# 综合分数 = (1 - RELATED_TAG_WEIGHT) * 文本相似度 + RELATED_TAG_WEIGHT * 标签 Jaccard
+# 文本相似度复用语义搜索的向量索引（IDF 加权余弦）
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import delete, exists, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.crud.note_semantic import refresh_user_index
+from app.crud.user_stats import get_collection_version
+from app.models.note_tags import note_tags
+from app.models.sync_change import ENTITY_NOTE
+from app.utils.vector_index import UserVectorIndex
+
+# 近邻：(近邻笔记 id, 综合分数, 共同标签数)
+Neighbor = Tuple[int, float, int]
+
+# 处理失败后重试间隔的上限（秒）
+RELATED_MAX_RETRY_DELAY = 3600
+
+
+def get_related_notes(db: Session, note_id: int, user_id: int, limit: int):
+    """返回 (近邻列表, 错误信息)；笔记刚写入、worker 尚未处理时近邻为空"""
+    related = models.RelatedNote
+    rows = db.execute(
+        select(models.Note.id, models.Note.title, models.Note.summary,
+               models.Note.updated_at,
+               related.score, related.shared_tags).join(
+                   related, related.neighbor_id == models.Note.id).where(
+                       related.note_id == note_id,
+                       models.Note.user_id == user_id).order_by(
+                           related.score.desc(),
+                           related.neighbor_id).limit(limit)).all()
+    if rows:
+        return [row._asdict() for row in rows], None
+    exists = db.scalar(
+        select(models.Note.id).where(models.Note.id == note_id,
+                                     models.Note.user_id == user_id))
+    if exists is None:
+        return None, "Note not found or not authorized"
+    return [], None
+
+
+def pending_related_users(db: Session, limit: int) -> List[int]:
+    """有尚未处理的笔记变更的用户，最久未处理的在前（各用户轮流处理）
+
+    进度行以 FOR UPDATE SKIP LOCKED 选取：其他进程正在处理的用户不占本轮名额；
+    失败后仍在退避期内的用户同样跳过
+    """
+    stats, state = models.UserStats, models.RelatedNoteState
+    # 先为没有进度行的用户补建，之后才能对进度行加锁
+    db.execute(
+        insert(state).from_select(
+            ["user_id"],
+            select(stats.user_id).where(~exists().where(
+                state.user_id == stats.user_id))).on_conflict_do_nothing())
+    user_ids = list(
+        db.scalars(
+            select(state.user_id).join(
+                stats, stats.user_id == state.user_id).where(
+                    (stats.version > state.seq) | state.note_id.is_not(None),
+                    state.retry_at.is_(None)
+                    | (state.retry_at <= func.now())).order_by(
+                        state.updated_at,
+                        state.user_id).limit(limit).with_for_update(
+                            of=state, skip_locked=True)))
+    db.commit()
+    return user_ids
+
+
+def defer_related_user(db: Session, user_id: int, delay: float):
+    """处理失败的用户按连续失败次数指数退避，避免反复失败的用户占满每轮名额"""
+    state = models.RelatedNoteState
+    seconds = func.least(delay * func.power(2, state.failures),
+                         RELATED_MAX_RETRY_DELAY)
+    db.execute(
+        update(state).where(state.user_id == user_id).values(
+            failures=state.failures + 1,
+            retry_at=func.now() +
+            func.make_interval(0, 0, 0, 0, 0, 0, seconds)))
+    db.commit()
+
+
+def update_related_notes(db: Session, user_id: int, batch_size: int) -> int:
+    """处理该用户的一批笔记变更，返回处理的变更数
+
+    进度行以 FOR UPDATE SKIP LOCKED 锁定，多个进程的 worker 不会同时处理同一用户。
+    锁定后先在 SQL 中确认有待处理的笔记变更，之后才追赶向量索引：
+    只有标签 / 收藏变化的用户不必加载索引
+    """
+    state_model = models.RelatedNoteState
+    db.execute(
+        insert(state_model).values(user_id=user_id).on_conflict_do_nothing())
+    state = db.scalar(
+        select(state_model).where(
+            state_model.user_id == user_id).with_for_update(skip_locked=True))
+    if state is None:
+        db.rollback()
+        return 0
+
+    change = models.SyncChange
+    # 版本号已提交意味着不超过它的变更都已提交
+    version = get_collection_version(db, user_id)
+    pending = [
+        change.user_id == user_id, change.entity == ENTITY_NOTE,
+        change.seq > state.seq if state.note_id is None else tuple_(
+            change.seq, change.entity_id) > (state.seq, state.note_id)
+    ]
+    if not db.scalar(select(exists().where(*pending, change.seq <= version))):
+        _advance(state, max(state.seq, version), None)
+        db.commit()
+        return 0
+
+    # 补算的向量与本批结果在同一事务中提交，提交之前进度行一直处于锁定状态
+    index = refresh_user_index(db, user_id, commit=False)
+    with index.lock:
+        bound = index.seq
+    if bound is None:
+        db.rollback()
+        return 0
+    rows = db.execute(
+        select(change.entity_id, change.seq,
+               change.deleted).where(*pending, change.seq <= bound).order_by(
+                   change.seq, change.entity_id).limit(batch_size + 1)).all()
+    has_more = len(rows) > batch_size
+    rows = rows[:batch_size]
+
+    if rows:
+        _apply_changes(db, index, [r.entity_id for r in rows if not r.deleted],
+                       [r.entity_id for r in rows if r.deleted])
+    if has_more:
+        _advance(state, rows[-1].seq, rows[-1].entity_id)
+    else:
+        _advance(state, max(state.seq, bound), None)
+    db.commit()
+    return len(rows)
+
+
+def _advance(state: models.RelatedNoteState, seq: int, note_id):
+    state.seq, state.note_id = seq, note_id
+    state.failures, state.retry_at = 0, None
+    # 即使位置未变也刷新处理时间，轮转到队尾
+    state.updated_at = func.now()
+
+
+def _apply_changes(db: Session, index: UserVectorIndex, changed: List[int],
+                   deleted: List[int]):
+    related = models.RelatedNote
+    # 把变化 / 删除的笔记列为近邻的笔记需要重新计算
+    referrers = set(
+        db.scalars(
+            select(related.note_id).where(
+                related.neighbor_id.in_(changed + deleted))))
+    recompute = sorted((referrers | set(changed)) - set(deleted))
+    neighbors = _compute_neighbors(db, index, recompute)
+
+    db.execute(delete(related).where(related.note_id.in_(recompute)))
+    rows = [{
+        "note_id": note_id,
+        "neighbor_id": neighbor_id,
+        "score": score,
+        "shared_tags": shared
+    } for note_id, items in neighbors.items()
+            for neighbor_id, score, shared in items]
+    # 变化笔记的近邻若不在本批重算范围内，把变化笔记插入它们的列表
+    recomputed = set(recompute)
+    reverse = {
+        (neighbor_id, note_id): (score, shared)
+        for note_id in changed
+        for neighbor_id, score, shared in neighbors.get(note_id, [])
+        if neighbor_id not in recomputed
+    }
+    rows += [{
+        "note_id": note_id,
+        "neighbor_id": neighbor_id,
+        "score": score,
+        "shared_tags": shared
+    } for (note_id, neighbor_id), (score, shared) in reverse.items()]
+    if rows:
+        stmt = insert(related).values(rows)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["note_id", "neighbor_id"],
+                set_={
+                    "score": stmt.excluded.score,
+                    "shared_tags": stmt.excluded.shared_tags,
+                }))
+    if reverse:
+        _truncate(db, {note_id for note_id, _ in reverse})
+
+
+def _truncate(db: Session, note_ids: Set[int]):
+    """只保留每篇笔记分数最高的 RELATED_TOP_K 个近邻"""
+    related = models.RelatedNote
+    ranked = select(
+        related.note_id, related.neighbor_id,
+        func.row_number().over(
+            partition_by=related.note_id,
+            order_by=(related.score.desc(),
+                      related.neighbor_id)).label("rank")).where(
+                          related.note_id.in_(note_ids)).subquery()
+    db.execute(
+        delete(related).where(
+            tuple_(related.note_id, related.neighbor_id).in_(
+                select(ranked.c.note_id, ranked.c.neighbor_id).where(
+                    ranked.c.rank > settings.RELATED_TOP_K))))
+
+
+def _tag_candidates(db: Session, note_ids: List[int]):
+    """返回 ({笔记: 标签数}, {笔记: {共享标签的其他笔记: 共同标签数}})，每篇只取共同标签最多的几篇"""
+    other = note_tags.alias("other")
+    shared = func.count().label("shared")
+    pairs = select(
+        note_tags.c.note_id, other.c.note_id.label("other_id"),
+        shared).join(other, other.c.tag_id == note_tags.c.tag_id).where(
+            note_tags.c.note_id.in_(note_ids), other.c.note_id
+            != note_tags.c.note_id).group_by(note_tags.c.note_id,
+                                             other.c.note_id).subquery()
+    ranked = select(
+        pairs,
+        func.row_number().over(
+            partition_by=pairs.c.note_id,
+            order_by=(pairs.c.shared.desc(),
+                      pairs.c.other_id)).label("rank")).subquery()
+    candidates: Dict[int, Dict[int, int]] = defaultdict(dict)
+    for note_id, other_id, count, _ in db.execute(
+            select(ranked).where(
+                ranked.c.rank <= settings.RELATED_CANDIDATES)):
+        candidates[note_id][other_id] = count
+
+    involved = set(note_ids).union(*candidates.values())
+    counts = dict(
+        db.execute(
+            select(note_tags.c.note_id, func.count()).where(
+                note_tags.c.note_id.in_(involved)).group_by(
+                    note_tags.c.note_id)).all()) if involved else {}
+    return counts, candidates
+
+
+def _compute_neighbors(db: Session, index: UserVectorIndex,
+                       note_ids: List[int]) -> Dict[int, List[Neighbor]]:
+    if not note_ids:
+        return {}
+    tag_counts, tag_candidates = _tag_candidates(db, note_ids)
+    weight = settings.RELATED_TAG_WEIGHT
+    result = {}
+    for note_id in note_ids:
+        # 只在检索内存数组时持有索引锁，打分和下一篇之间让出给搜索请求
+        with index.lock:
+            query = index.vector(note_id)
+            if query is None:
+                # 不在索引中：已被删除，墓碑会在后续批次处理
+                continue
+            shared = tag_candidates.get(note_id, {})
+            text = dict(index.search(query, settings.RELATED_CANDIDATES + 1))
+            text.pop(note_id, None)
+            # 只通过共同标签召回的候选，单独补算文本相似度
+            tag_only = [other for other in shared if other not in text]
+            if tag_only:
+                text.update(zip(tag_only, index.similarity(query, tag_only)))
+
+        scored = []
+        for other in set(text) | set(shared):
+            common = shared.get(other, 0)
+            union = (tag_counts.get(note_id, 0) + tag_counts.get(other, 0) -
+                     common)
+            jaccard = common / union if union else 0.0
+            score = (1 - weight) * max(text.get(other, 0.0),
+                                       0.0) + weight * jaccard
+            if score >= settings.RELATED_MIN_SCORE:
+                scored.append((other, score, common))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        result[note_id] = scored[:settings.RELATED_TOP_K]
+    return result
@@ -0,0 +1,146 @@
+# 语义搜索：笔记向量的持久化，以及进程内向量索引（utils/vector_index.py）的加载与增量追赶
+#
+# 索引记录自己同步到的用户版本号（user_stats.version）；每次搜索前读当前版本，
+# 从 sync_changes 取两者之间变化的笔记补齐，因此其他 worker 进程的写入同样能被追上。
+# 查询数据库时不持有索引锁（async 栈下 IO 会切回事件循环），只在更新 / 检索内存数组时加锁
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.crud.user_stats import get_user_stats
+from app.models.sync_change import ENTITY_NOTE
+from app.utils.embedding import (EMBEDDING_MODEL, embed_note, embed_text,
+                                 from_bytes, stack, to_bytes)
+from app.utils.vector_index import vector_index
+
+
+def _upsert_embeddings(db: Session, rows: List[dict]):
+    stmt = insert(models.NoteEmbedding).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(index_elements=["note_id"],
+                                   set_={
+                                       "model": stmt.excluded.model,
+                                       "vector": stmt.excluded.vector,
+                                       "updated_at": func.now(),
+                                   }))
+
+
+def save_note_embedding(db: Session, note: models.Note):
+    """计算并写入笔记向量，不提交：与笔记本身的写入在同一事务中生效"""
+    _upsert_embeddings(
+        db, [{
+            "note_id": note.id,
+            "user_id": note.user_id,
+            "model": EMBEDDING_MODEL,
+            "vector": to_bytes(embed_note(note.title, note.content or "")),
+        }])
+
+
+def _load_embeddings(db: Session,
+                     user_id: int,
+                     note_ids: Optional[List[int]] = None,
+                     commit: bool = True) -> Dict[int, np.ndarray]:
+    """读取笔记向量；缺失或模型版本过期的（如批量导入的笔记）现场计算并写回
+
+    先只查 id 和向量，正文只为缺失向量的笔记再查一次
+    """
+    embedding = models.NoteEmbedding
+
+    def joined(*columns):
+        query = select(*columns).outerjoin(
+            embedding,
+            and_(embedding.note_id == models.Note.id,
+                 embedding.model == EMBEDDING_MODEL)).where(
+                     models.Note.user_id == user_id)
+        if note_ids is not None:
+            query = query.where(models.Note.id.in_(note_ids))
+        return query
+
+    vectors, stale = {}, False
+    for note_id, vector in db.execute(joined(models.Note.id,
+                                             embedding.vector)):
+        if vector is None:
+            stale = True
+        else:
+            vectors[note_id] = from_bytes(vector)
+    if not stale:
+        return vectors
+
+    missing = []
+    for note_id, title, content in db.execute(
+            joined(models.Note.id, models.Note.title,
+                   models.Note.content).where(embedding.note_id.is_(None))):
+        vectors[note_id] = embed_note(title, content or "")
+        missing.append({
+            "note_id": note_id,
+            "user_id": user_id,
+            "model": EMBEDDING_MODEL,
+            "vector": to_bytes(vectors[note_id]),
+        })
+    if missing:
+        _upsert_embeddings(db, missing)
+        if commit:
+            db.commit()
+    return vectors
+
+
+def _note_changes(db: Session, user_id: int, since: int,
+                  version: int) -> Tuple[List[int], List[int]]:
+    """返回 (since, version] 之间 (变化的笔记 id, 删除的笔记 id)"""
+    change = models.SyncChange
+    bounded = (change.user_id == user_id, change.entity == ENTITY_NOTE,
+               change.seq > since, change.seq <= version)
+    rows = db.execute(
+        select(change.entity_id, change.deleted).where(*bounded)).all()
+    changed = [row.entity_id for row in rows if not row.deleted]
+    deleted = [row.entity_id for row in rows if row.deleted]
+    return changed, deleted
+
+
+def refresh_user_index(db: Session, user_id: int, commit: bool = True):
+    """把该用户的向量索引追赶到当前版本：首次使用时全量加载，之后只应用增量
+
+    commit=False 时补算的向量只写入、不提交，由调用方随自己的事务一起提交
+    """
+    index = vector_index.get(user_id)
+    stats = get_user_stats(db, user_id)
+    version = stats.version
+    with index.lock:
+        seq = index.seq
+    if seq == version:
+        return index
+
+    # 版本号回退（如数据重建），或期间的删除墓碑已被清理时同样全量加载
+    full = seq is None or seq > version or seq < stats.sync_min_seq
+    if full:
+        vectors, deleted = _load_embeddings(db, user_id, commit=commit), []
+    else:
+        changed, deleted = _note_changes(db, user_id, seq, version)
+        vectors = _load_embeddings(db, user_id, changed,
+                                   commit) if changed else {}
+
+    with index.lock:
+        # 期间已被其他请求更新过的索引不再重复应用，缺的变更留给下一次搜索
+        if index.seq == seq:
+            if full:
+                index.reset()
+            index.remove(deleted)
+            index.upsert(list(vectors), stack(list(vectors.values())))
+            index.seq = version
+    return index
+
+
+def semantic_note_ids(db: Session, user_id: int, query: str,
+                      k: int) -> List[Tuple[int, float]]:
+    """返回与查询语义最接近的 k 个 (笔记 id, 相似度)，按相似度降序
+
+    索引追赶可能补算向量、重建 IVF 聚类，是 CPU 密集的，调用方应在线程池中执行
+    """
+    index = refresh_user_index(db, user_id)
+    with index.lock:
+        return index.search(embed_text(query), k, settings.SEMANTIC_MIN_SCORE)
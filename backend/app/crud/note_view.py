@@ -0,0 +1,48 @@
+# 笔记列表的加载视图：full 加载整行，compact 只加载列表展示需要的列
+from typing import NamedTuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, load_only
+
+from app import models
+
+NOTE_PREVIEW_LENGTH = 200  # compact 视图默认的 content 预览字符数
+
+_COMPACT_COLUMNS = (models.Note.id, models.Note.user_id, models.Note.title,
+                    models.Note.summary, models.Note.created_at,
+                    models.Note.updated_at)
+
+
+class NoteView(NamedTuple):
+    compact: bool = False
+    preview_length: int = 0  # 仅 compact 时生效，0 表示不返回预览
+
+    @property
+    def has_preview(self) -> bool:
+        return self.compact and self.preview_length > 0
+
+    def apply(self, query: Query) -> Query:
+        """compact 时不加载完整 content；预览在 SQL 中截取，追加为结果的最后一列"""
+        if not self.compact:
+            return query
+        query = query.options(load_only(*_COMPACT_COLUMNS))
+        if self.has_preview:
+            query = query.add_columns(
+                func.left(models.Note.content,
+                          self.preview_length).label("content_preview"))
+        return query
+
+    def unpack(self, row) -> tuple:
+        """把 apply 追加的预览列挂到 Note 对象上，返回去掉该列后的行"""
+        if self.has_preview:
+            row[0].content_preview = row[-1]
+            return tuple(row[:-1])
+        return tuple(row)
+
+
+FULL_VIEW = NoteView()
+
+
+def resolve_note_view(view: str = "full",
+                      preview_length: int = NOTE_PREVIEW_LENGTH) -> NoteView:
+    return NoteView(compact=view == "compact", preview_length=preview_length)
@@ -0,0 +1,41 @@
+# SummaryCacheEntry 相关数据库操作
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+def get_cached_summary(db: Session, key: str, ttl: int) -> Optional[str]:
+    row = db.query(models.SummaryCacheEntry.summary).filter(
+        models.SummaryCacheEntry.key == key,
+        models.SummaryCacheEntry.created_at
+        > func.now() - timedelta(seconds=ttl)).first()
+    return row.summary if row else None
+
+
+def save_cached_summary(db: Session, key: str, summary: str):
+    stmt = insert(models.SummaryCacheEntry).values(key=key, summary=summary)
+    db.execute(
+        stmt.on_conflict_do_update(index_elements=["key"],
+                                   set_={
+                                       "summary": stmt.excluded.summary,
+                                       "created_at": func.now(),
+                                   }))
+    db.commit()
+
+
+def evict_summary_cache(db: Session, ttl: int, max_rows: int):
+    """删除过期条目，并只保留最新的 max_rows 条"""
+    cache = models.SummaryCacheEntry
+    db.query(cache).filter(cache.created_at <= func.now() -
+                           timedelta(seconds=ttl)).delete(
+                               synchronize_session=False)
+    keep = db.query(cache.key).order_by(
+        cache.created_at.desc()).offset(max_rows).subquery()
+    db.query(cache).filter(cache.key.in_(db.query(
+        keep.c.key))).delete(synchronize_session=False)
+    db.commit()
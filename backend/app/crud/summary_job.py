@@ -0,0 +1,119 @@
+# SummaryJob 相关数据库操作
+from datetime import timedelta
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models.summary_job import (JOB_FAILED, JOB_PENDING, JOB_RUNNING,
+                                    JOB_SUCCEEDED)
+
+# 同一任务最多尝试次数（worker 崩溃后超时的 running 任务会被重新领取）
+MAX_ATTEMPTS = 3
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    note_id: int
+    title: str
+    content: str
+
+
+def create_summary_job(db: Session, user_id: int, note_id: int):
+    note = db.query(models.Note.id).filter(
+        models.Note.id == note_id, models.Note.user_id == user_id).first()
+    if not note:
+        return None, "Note not found"
+
+    try:
+        job = models.SummaryJob(user_id=user_id, note_id=note_id)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job, None
+    except SQLAlchemyError as e:
+        db.rollback()
+        return None, str(e)
+
+
+def get_summary_job(db: Session, job_id: int,
+                    user_id: int) -> Optional[models.SummaryJob]:
+    return db.query(models.SummaryJob).filter(
+        models.SummaryJob.id == job_id,
+        models.SummaryJob.user_id == user_id).first()
+
+
+def claim_summary_jobs(db: Session, limit: int,
+                       stale_after: int) -> List[ClaimedJob]:
+    """领取最多 limit 个待处理任务并标记为 running
+
+    FOR UPDATE SKIP LOCKED 保证多个进程同时领取时互不重复；
+    running 超过 stale_after 秒仍未完成的任务视为 worker 已失联，重新领取。
+    """
+    stale_before = func.now() - timedelta(seconds=stale_after)
+    running_stale = and_(models.SummaryJob.status == JOB_RUNNING,
+                         models.SummaryJob.started_at < stale_before)
+    # 超过重试次数且已失联的任务直接置为失败
+    db.query(models.SummaryJob).filter(
+        running_stale, models.SummaryJob.attempts >= MAX_ATTEMPTS).update(
+            {
+                "status": JOB_FAILED,
+                "error": "Too many attempts",
+                "finished_at": func.now(),
+            },
+            synchronize_session=False)
+
+    jobs = (db.query(models.SummaryJob).filter(
+        models.SummaryJob.attempts < MAX_ATTEMPTS,
+        or_(models.SummaryJob.status == JOB_PENDING, running_stale)).order_by(
+            models.SummaryJob.created_at).limit(limit).with_for_update(
+                skip_locked=True).all())
+    if not jobs:
+        db.commit()
+        return []
+
+    for job in jobs:
+        job.status = JOB_RUNNING
+        job.started_at = func.now()
+        job.attempts = models.SummaryJob.attempts + 1
+
+    notes = {
+        row.id: row
+        for row in db.query(
+            models.Note.id, models.Note.title, models.Note.content).filter(
+                models.Note.id.in_([job.note_id for job in jobs]))
+    }
+    claimed = [
+        ClaimedJob(job.id, job.note_id, notes[job.note_id].title,
+                   notes[job.note_id].content) for job in jobs
+    ]
+    db.commit()
+    return claimed
+
+
+def complete_summary_job(db: Session, job_id: int, note_id: int, summary: str):
+    """任务成功：保存摘要并写回 notes.summary"""
+    db.query(models.SummaryJob).filter(models.SummaryJob.id == job_id).update(
+        {
+            "status": JOB_SUCCEEDED,
+            "summary": summary,
+            "error": None,
+            "finished_at": func.now(),
+        },
+        synchronize_session=False)
+    db.query(models.Note).filter(models.Note.id == note_id).update(
+        {"summary": summary}, synchronize_session=False)
+    db.commit()
+
+
+def fail_summary_job(db: Session, job_id: int, error: str):
+    db.query(models.SummaryJob).filter(models.SummaryJob.id == job_id).update(
+        {
+            "status": JOB_FAILED,
+            "error": error,
+            "finished_at": func.now(),
+        },
+        synchronize_session=False)
+    db.commit()
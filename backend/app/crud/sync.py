@@ -0,0 +1,163 @@
+# 增量同步：按用户变更序号（user_stats.version）返回 since 之后的新增 / 修改 / 删除
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.crud.user_stats import get_collection_version
+from app.models.sync_change import ENTITY_FAVORITE, ENTITY_NOTE, ENTITY_TAG
+
+# 同步令牌：(seq,) 表示 seq 之后的全部变更；
+# (seq, entity, entity_id) 表示分页中断的位置，同一 seq 内按 (entity, entity_id) 继续
+SyncPosition = Tuple
+
+
+def encode_sync_token(position: SyncPosition) -> str:
+    raw = json.dumps(list(position)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> SyncPosition:
+    """解析同步令牌，格式不合法时抛出 ValueError"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        if len(position) == 1:
+            return (int(position[0]), )
+        seq, entity, entity_id = position
+        return int(seq), str(entity), int(entity_id)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError("Invalid sync token")
+
+
+def get_changes(db: Session, user_id: int, since: Optional[str],
+                limit: int) -> dict:
+    """返回 since 之后的变更；since 为空时返回全部现存数据（首次同步，不含墓碑）
+
+    先读当前版本号，只返回 seq 不超过它的变更：版本号已提交意味着更小的 seq 都已提交，
+    之后提交的写入 seq 更大，留给下一次同步，不会漏掉
+    """
+    position = decode_sync_token(since) if since else (0, )
+    version = get_collection_version(db, user_id)
+    if position[0] > version:
+        raise ValueError("Invalid sync token")
+
+    change = models.SyncChange
+    bounded = (change.user_id == user_id, change.seq <= version)
+    query = select(change.entity, change.entity_id, change.seq,
+                   change.deleted).where(*bounded)
+    if not since:
+        # 客户端本地没有数据，删除记录对它没有意义
+        query = query.where(change.deleted.is_(False))
+    if len(position) == 1:
+        query = query.where(change.seq > position[0])
+    else:
+        query = query.where(
+            tuple_(change.seq, change.entity, change.entity_id) > position)
+    rows = db.execute(
+        query.order_by(change.seq, change.entity,
+                       change.entity_id).limit(limit + 1)).all()
+    # 在读取变更之后检查：并发的清理若在这之前提交，这里一定能看到新的下限
+    if since and _token_expired(position, _sync_min_seq(db, user_id)):
+        raise ValueError("Sync token expired")
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    token = (rows[-1].seq, rows[-1].entity,
+             rows[-1].entity_id) if has_more else (version, )
+
+    changed = {ENTITY_NOTE: [], ENTITY_TAG: [], ENTITY_FAVORITE: []}
+    deleted = {ENTITY_NOTE: [], ENTITY_TAG: [], ENTITY_FAVORITE: []}
+    for row in rows:
+        (deleted if row.deleted else changed)[row.entity].append(row.entity_id)
+
+    return {
+        "token": encode_sync_token(token),
+        "has_more": has_more,
+        "notes": _load_notes(db, user_id, changed[ENTITY_NOTE]),
+        "tags": _load_tags(db, user_id, changed[ENTITY_TAG]),
+        "favorites": changed[ENTITY_FAVORITE],
+        "deleted": {
+            "notes": deleted[ENTITY_NOTE],
+            "tags": deleted[ENTITY_TAG],
+            "favorites": deleted[ENTITY_FAVORITE],
+        },
+    }
+
+
+def _sync_min_seq(db: Session, user_id: int) -> int:
+    # 直接查询列，不取 identity map 中可能已过期的 UserStats
+    return db.scalar(
+        select(models.UserStats.sync_min_seq).where(
+            models.UserStats.user_id == user_id)) or 0
+
+
+def _token_expired(position: SyncPosition, min_seq: int) -> bool:
+    """seq <= min_seq 的墓碑可能已被清理；分页令牌在该 seq 内还有未读的变更"""
+    if len(position) == 1:
+        return position[0] < min_seq
+    return position[0] <= min_seq
+
+
+def prune_sync_tombstones(db: Session, before: datetime, limit: int) -> int:
+    """清理 before 之前的删除墓碑，每次最多处理 limit 个用户，返回处理的用户数
+
+    被清理用户的 sync_min_seq 提高到清理掉的最大 seq，早于它的同步令牌随之失效。
+    先锁 user_stats 行再删除变更记录，与写入触发器的加锁顺序一致，避免死锁；
+    正在写入的用户跳过，留给下一次清理
+    """
+    change, stats = models.SyncChange, models.UserStats
+    aged = (change.deleted, change.changed_at < before)
+    user_ids = db.scalars(
+        select(stats.user_id).where(
+            stats.user_id.in_(
+                select(change.user_id).where(
+                    *aged).distinct().limit(limit))).order_by(
+                        stats.user_id).with_for_update(
+                            skip_locked=True)).all()
+    if not user_ids:
+        db.rollback()
+        return 0
+
+    horizons: Dict[int, int] = defaultdict(int)
+    for user_id, seq in db.execute(
+            delete(change).where(change.user_id.in_(user_ids),
+                                 *aged).returning(change.user_id, change.seq)):
+        horizons[user_id] = max(horizons[user_id], seq)
+    table = stats.__table__
+    db.execute(
+        update(table).where(table.c.user_id == bindparam("uid")).values(
+            sync_min_seq=func.greatest(table.c.sync_min_seq, bindparam(
+                "seq"))), [{
+                    "uid": user_id,
+                    "seq": seq
+                } for user_id, seq in horizons.items()])
+    db.commit()
+    return len(user_ids)
+
+
+def _load_notes(db: Session, user_id: int, note_ids):
+    # 读取的是当前内容；期间又被修改 / 删除的笔记会在下一次同步中再次出现
+    if not note_ids:
+        return []
+    notes = db.query(models.Note).filter(models.Note.user_id == user_id,
+                                         models.Note.id.in_(note_ids)).all()
+    favorited = set(
+        db.scalars(
+            select(models.Favorite.note_id).where(
+                models.Favorite.user_id == user_id,
+                models.Favorite.note_id.in_(note_ids))))
+    for note in notes:
+        note.is_favorited = note.id in favorited
+    return notes
+
+
+def _load_tags(db: Session, user_id: int, tag_ids):
+    if not tag_ids:
+        return []
+    return db.query(models.Tag).filter(models.Tag.user_id == user_id,
+                                       models.Tag.id.in_(tag_ids)).all()
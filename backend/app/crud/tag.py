@@ -1,7 +1,12 @@
 # Tag 相关数据库操作
+from typing import List
+
+from sqlalchemy import delete, func, select, true
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app import models
+from app.models.note_tags import note_tags
 from app.schemas import TagCreate, TagUpdate
 
 
@@ -18,6 +23,14 @@ def get_tags(db: Session, user_id: int):
     return db.query(models.Tag).filter(models.Tag.user_id == user_id).all()
 
 
+def get_tags_by_ids(db: Session, user_id: int, tag_ids: List[int]):
+    # 单条 IN 查询，不存在或不属于该用户的 id 直接被过滤掉
+    if not tag_ids:
+        return []
+    return db.query(models.Tag).filter(models.Tag.user_id == user_id,
+                                       models.Tag.id.in_(set(tag_ids))).all()
+
+
 def update_tag(db: Session, tag_id: int, user_id: int, tag_in: TagUpdate):
     tag = db.query(models.Tag).filter(models.Tag.id == tag_id,
                                       models.Tag.user_id == user_id).first()
@@ -59,3 +72,51 @@ def remove_tag_from_note(db: Session, note_id: int, tag_id: int, user_id: int):
         db.commit()
         db.refresh(note)
     return note
+
+
+def _owns_all(db: Session, user_id: int, note_ids: set, tag_ids: set):
+    """一条语句同时统计属于该用户的笔记数和标签数"""
+    note_count = select(func.count(models.Note.id)).where(
+        models.Note.user_id == user_id,
+        models.Note.id.in_(note_ids)).scalar_subquery()
+    tag_count = select(func.count(models.Tag.id)).where(
+        models.Tag.user_id == user_id,
+        models.Tag.id.in_(tag_ids)).scalar_subquery()
+    notes, tags = db.execute(select(note_count, tag_count)).one()
+    return notes == len(note_ids) and tags == len(tag_ids)
+
+
+def bulk_add_tags_to_notes(db: Session, user_id: int, note_ids: List[int],
+                           tag_ids: List[int]):
+    """批量给笔记打标签，返回 (新增关联数, err)；已有的关联直接跳过"""
+    note_ids, tag_ids = set(note_ids), set(tag_ids)
+    if not _owns_all(db, user_id, note_ids, tag_ids):
+        return 0, "Note or Tag not found"
+
+    # notes × tags 的笛卡尔积一次性写入，冲突（已存在）的行由数据库忽略
+    pairs = select(models.Note.id, models.Tag.id).join(
+        models.Tag, true()).where(models.Note.user_id == user_id,
+                                  models.Note.id.in_(note_ids),
+                                  models.Tag.user_id == user_id,
+                                  models.Tag.id.in_(tag_ids))
+    stmt = insert(note_tags).from_select(["note_id", "tag_id"],
+                                         pairs).on_conflict_do_nothing()
+    result = db.execute(stmt)
+    db.commit()
+    return result.rowcount, None
+
+
+def bulk_remove_tags_from_notes(db: Session, user_id: int, note_ids: List[int],
+                                tag_ids: List[int]):
+    """批量移除笔记上的标签，返回 (删除关联数, err)"""
+    note_ids, tag_ids = set(note_ids), set(tag_ids)
+    if not _owns_all(db, user_id, note_ids, tag_ids):
+        return 0, "Note or Tag not found"
+
+    owned_notes = select(models.Note.id).where(models.Note.user_id == user_id,
+                                               models.Note.id.in_(note_ids))
+    stmt = delete(note_tags).where(note_tags.c.note_id.in_(owned_notes),
+                                   note_tags.c.tag_id.in_(tag_ids))
+    result = db.execute(stmt)
+    db.commit()
+    return result.rowcount, None
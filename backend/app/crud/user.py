@@ -1,7 +1,6 @@
 # 用户相关数据库操作
 from sqlalchemy.orm import Session
 
-from app.auth import hash_password
 from app.models import user as user_model
 from app.schemas.user import UserCreate
 
@@ -11,13 +10,23 @@ def get_user_by_email(db: Session, email: str):
         user_model.User).filter(user_model.User.email == email).first()
 
 
-def create_user(db: Session, user: UserCreate):
-    hashed_pw = hash_password(user.password)
+def get_user_by_username(db: Session, username: str):
+    return db.query(
+        user_model.User).filter(user_model.User.username == username).first()
+
+
+# 密码哈希由调用方在进程池中算好再传入，这里只负责写库
+def create_user(db: Session, user: UserCreate, hashed_password: str):
     db_user = user_model.User(username=user.username,
                               email=user.email,
-                              hashed_password=hashed_pw)
+                              hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
+
+def update_user_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(user_model.User).filter(user_model.User.id == user_id).update(
+        {user_model.User.hashed_password: hashed_password})
+    db.commit()
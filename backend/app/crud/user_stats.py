@@ -0,0 +1,37 @@
+# 用户计数相关数据库操作（计数由触发器维护，这里只读）
+from typing import Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+def get_user_stats(db: Session, user_id: int) -> models.UserStats:
+    stats = db.get(models.UserStats, user_id)
+    if stats is None:
+        # 尚未写过笔记 / 收藏的用户没有计数行，视为 0
+        stats = models.UserStats(user_id=user_id,
+                                 note_count=0,
+                                 favorite_count=0,
+                                 version=0,
+                                 sync_min_seq=0)
+    return stats
+
+
+def get_collection_version(db: Session, user_id: int) -> int:
+    # 与 get_user_stats 共用 identity map，同一请求内再取计数不会重复查询
+    return get_user_stats(db, user_id).version
+
+
+def get_note_version(db: Session, note_id: int,
+                     user_id: int) -> Optional[Tuple]:
+    """返回 (updated_at, 集合版本号)，笔记不存在或不属于该用户时返回 None"""
+    row = db.execute(
+        select(models.Note.updated_at,
+               func.coalesce(models.UserStats.version, 0)).outerjoin(
+                   models.UserStats,
+                   models.UserStats.user_id == models.Note.user_id).where(
+                       models.Note.id == note_id,
+                       models.Note.user_id == user_id)).first()
+    return tuple(row) if row else None
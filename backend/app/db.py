@@ -1,22 +1,165 @@
-import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, TypeVar, Union
+from uuid import uuid4
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
+                                    create_async_engine)
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
 
 # 1️⃣ 加载环境变量
 load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")  # 从配置读取
+DATABASE_URL = settings.DATABASE_URL  # 从配置读取
+
+
+# 连接池统计：借出次数、等待借出的耗时等，供监控接口读取
+class PoolStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class _TimedQueuePool(QueuePool):
+    """记录从连接池借出连接的等待时间（含池满时排队、新建连接）"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+
+class _TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+
+def _engine_options(is_async: bool) -> Dict[str, Any]:
+    """根据 Settings 生成 create_engine / create_async_engine 的参数"""
+    options: Dict[str, Any] = {"echo": settings.DB_ECHO}
+    connect_args: Dict[str, Any] = {}
+
+    if settings.DB_PGBOUNCER:
+        # PgBouncer 事务池模式：连接由 PgBouncer 复用，应用侧不再做池；
+        # 同一会话的语句可能落到不同后端连接，必须关闭预编译语句缓存。
+        # statement_timeout 也不能作为启动参数传递，需在 PgBouncer / 角色上配置
+        options["poolclass"] = NullPool
+        if is_async:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = (
+                lambda: f"__asyncpg_{uuid4()}__")
+    else:
+        options.update(
+            poolclass=(_TimedAsyncAdaptedQueuePool
+                       if is_async else _TimedQueuePool),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+            if is_async:
+                connect_args["server_settings"] = {
+                    "statement_timeout": timeout
+                }
+            else:
+                connect_args["options"] = f"-c statement_timeout={timeout}"
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def _listen_pool_events(pool):
+    event.listen(pool, "connect", lambda *args: pool_stats.record_connect())
+
 
 # 2️⃣ 创建 SQLAlchemy 引擎
-engine = create_engine(
-    DATABASE_URL,
-    echo=True,  # True 时打印所有 SQL，调试用
-    future=True)
+engine = create_engine(DATABASE_URL, future=True, **_engine_options(False))
+_listen_pool_events(engine.pool)
 
 # 3️⃣ 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎（asyncpg），仅在 DB_STACK=async 时创建
+# 异步会话不能在 greenlet 之外懒加载，提交后不过期对象，避免序列化时触发查询
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_STACK == "async":
+    async_engine = create_async_engine(
+        make_url(DATABASE_URL).set(drivername="postgresql+asyncpg"),
+        **_engine_options(True))
+    _listen_pool_events(async_engine.sync_engine.pool)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine,
+                                           autoflush=False,
+                                           expire_on_commit=False)
+
+
+def reset_pools_after_fork():
+    """在 fork 出的 worker 中调用：丢弃从父进程继承的连接池，之后按需重新建连
+
+    close=False 只是不再使用继承来的连接，不会关闭父进程仍持有的 socket
+    """
+    engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+
+
+def get_pool_status() -> Dict[str, Any]:
+    """当前连接池状态 + 累计统计"""
+    status: Dict[str, Any] = dict(pool_stats.snapshot())
+    active = async_engine.sync_engine if async_engine is not None else engine
+    pool = active.pool
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(),
+                      checked_in=pool.checkedin(),
+                      checked_out=pool.checkedout(),
+                      overflow=pool.overflow())
+    return status
+
+
 # 4️⃣ 声明 Base
 Base = declarative_base()
 
@@ -28,3 +171,68 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+T = TypeVar("T")
+
+
+class SyncSessionRunner:
+    """同步栈：在线程池中调用 crud 函数"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    # 本身就在线程池中执行
+    run_cpu_bound = run
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.session.rollback)
+
+
+def _run_in_new_session(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    with SessionLocal() as db:
+        return fn(db, *args, **kwargs)
+
+
+class AsyncSessionRunner:
+    """异步栈：通过 AsyncSession.run_sync 在 asyncpg 连接上执行同一套 crud 函数
+
+    crud 中的同步 ORM 代码运行在 greenlet 里，不占用线程池。
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+    async def run_cpu_bound(self, fn: Callable[..., T], *args: Any,
+                            **kwargs: Any) -> T:
+        """CPU 密集的 crud（如补算向量、IVF 聚类）不能在事件循环上执行：
+        改用独立的同步会话在线程池中运行，返回的 ORM 对象已与会话分离
+        """
+        return await run_in_threadpool(_run_in_new_session, fn, *args,
+                                       **kwargs)
+
+    async def rollback(self) -> None:
+        await self.session.rollback()
+
+
+DBRunner = Union[SyncSessionRunner, AsyncSessionRunner]
+
+
+# 依赖函数（用于 async 路由注入），按 DB_STACK 选择同步或异步栈
+# 用法：await db.run(crud.get_note, note_id=..., user_id=...)
+async def get_db_runner() -> AsyncIterator[DBRunner]:
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield AsyncSessionRunner(session)
+    else:
+        db = SessionLocal()
+        try:
+            yield SyncSessionRunner(db)
+        finally:
+            await run_in_threadpool(db.close)
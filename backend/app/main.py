@@ -1,15 +1,34 @@
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.api.favorite import router as favorite_router
 from app.api.note import router as notes_router
+from app.api.summary import router as summary_router
+from app.api.sync import router as sync_router
 from app.api.tag import router as tags_router
 from app.api.token import router as token_router
 from app.api.user import router as users_router
-from app.schemas import error_response
+from app.config import settings
+from app.db import async_engine, engine, get_pool_status
+from app.schemas import error_response, success_response
+from app.utils.metrics import (MetricsMiddleware, instrument_engine,
+                               render_metrics)
+from app.utils.password_hasher import password_hasher
+from app.utils.read_cache import read_cache
+from app.utils.related_worker import related_worker
+from app.utils.sql_profiler import ExplainSampler, SQLProfiler
+from app.utils.summary_cache import summary_cache
+from app.utils.summary_worker import summary_worker
+from app.utils.sync_pruner import sync_pruner
+from app.utils.vector_index import vector_index
+
+# 慢语句 EXPLAIN 采样（后台线程执行，见 utils.sql_profiler）
+explain_sampler = ExplainSampler(engine)
 
 # 控制是否在生产环境暴露接口文档
 EXPOSE_DOCS = os.getenv("EXPOSE_DOCS", "false").lower() == "true"
@@ -17,12 +36,40 @@ docs_url = "/docs" if EXPOSE_DOCS else None
 redoc_url = None
 openapi_url = "/openapi.json" if EXPOSE_DOCS else None
 
-app = FastAPI(docs_url=docs_url, redoc_url=redoc_url, openapi_url=openapi_url)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.SUMMARY_WORKER_ENABLED:
+        await summary_worker.start()
+    if settings.RELATED_WORKER_ENABLED:
+        await related_worker.start()
+    if settings.SYNC_TOMBSTONE_RETENTION_DAYS > 0:
+        await sync_pruner.start()
+    yield
+    await summary_worker.stop()
+    await related_worker.stop()
+    await sync_pruner.stop()
+    password_hasher.shutdown()
+    explain_sampler.shutdown()
+    await read_cache.close()
+    # asyncpg 连接绑定在当前事件循环上，退出时释放连接池
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+# 默认用 orjson 编码响应；笔记列表等热点接口另有 TypeAdapter 快速路径（见 schemas.response）
+app = FastAPI(docs_url=docs_url,
+              redoc_url=redoc_url,
+              openapi_url=openapi_url,
+              lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 app.include_router(users_router)
 app.include_router(notes_router)
 app.include_router(token_router)
 app.include_router(tags_router)
 app.include_router(favorite_router)
+app.include_router(summary_router)
+app.include_router(sync_router)
 
 origins = [
     "http://localhost.tiangolo.com",
@@ -40,15 +87,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus 指标与按请求的 SQL 分析（见 utils.sql_profiler）共用同一套引擎监听器和中间件；
+# 最后添加的中间件在最外层，计时包含 CORS 等全部处理
+if settings.METRICS_ENABLED or settings.SQL_PROFILE_ENABLED:
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    app.add_middleware(MetricsMiddleware,
+                       pool_status=get_pool_status,
+                       metrics=settings.METRICS_ENABLED,
+                       profiler=SQLProfiler(explain_sampler)
+                       if settings.SQL_PROFILE_ENABLED else None)
+
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        body, content_type = render_metrics(get_pool_status)
+        return Response(content=body, media_type=content_type)
+
+
+# 健康检查：返回数据库连接池状态（借出 / 等待统计）与摘要缓存、读缓存命中统计
+@app.get("/api/health")
+async def health():
+    return success_response(
+        data={
+            "db_pool": get_pool_status(),
+            "summary_cache": summary_cache.stats(),
+            "read_cache": read_cache.stats(),
+            "vector_index": vector_index.stats(),
+        })
+
 
 @app.exception_handler(SQLAlchemyError)
 async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError):
-    return JSONResponse(status_code=500,
-                        content=error_response(code=500, msg="Database error"))
+    return ORJSONResponse(status_code=500,
+                          content=error_response(code=500,
+                                                 msg="Database error"))
 
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    return JSONResponse(status_code=500,
-                        content=error_response(code=500,
-                                               msg="Internal server error"))
+    return ORJSONResponse(status_code=500,
+                          content=error_response(code=500,
+                                                 msg="Internal server error"))
@@ -1,8 +1,18 @@
 # app/models/__init__.py
 from app.models.favorite import Favorite
 from app.models.note import Note
+from app.models.note_embedding import NoteEmbedding
 from app.models.note_tags import note_tags
+from app.models.related_note import RelatedNote, RelatedNoteState
+from app.models.summary_cache import SummaryCacheEntry
+from app.models.summary_job import SummaryJob
+from app.models.sync_change import SyncChange
 from app.models.tag import Tag
 from app.models.user import User
+from app.models.user_stats import UserStats
 
-__all__ = ["User", "Note", "Tag", "note_tags", "Favorite"]
+__all__ = [
+    "User", "Note", "Tag", "note_tags", "Favorite", "UserStats", "SummaryJob",
+    "SummaryCacheEntry", "SyncChange", "NoteEmbedding", "RelatedNote",
+    "RelatedNoteState"
+]
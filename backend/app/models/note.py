@@ -7,7 +7,7 @@
 # here put the import lib
 from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
 from sqlalchemy.dialects.postgresql import TSVECTOR
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 
 from app.db import Base
@@ -27,11 +27,16 @@ class Note(Base):
                         server_default=func.now(),
                         onupdate=func.now())
 
-    # 全文搜索字段
-    search_vector = Column(TSVECTOR)
+    # 全文搜索字段：由触发器维护，只在 SQL 中使用，加载笔记时不读取
+    search_vector = deferred(Column(TSVECTOR))
 
     user = relationship("User", backref="notes")
-    tags = relationship("Tag", secondary=note_tags, back_populates="notes")
+    # 笔记读取路径统一使用 selectin：一页笔记的标签用一条 IN 查询批量加载，
+    # 避免逐条懒加载（N+1），异步会话下也不会在序列化时触发查询
+    tags = relationship("Tag",
+                        secondary=note_tags,
+                        back_populates="notes",
+                        lazy="selectin")
     favorites = relationship("Favorite",
                              back_populates="note",
                              cascade="all, delete-orphan")
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# @File        : note_embedding.py
+# @Description : 笔记的语义向量（float32 字节串），随笔记的增删改维护，供语义搜索加载到内存索引
+
+# here put the import lib
+from sqlalchemy import (Column, DateTime, ForeignKey, Index, Integer,
+                        LargeBinary, String)
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class NoteEmbedding(Base):
+    __tablename__ = "note_embeddings"
+    __table_args__ = (Index("ix_note_embeddings_user_model", "user_id",
+                            "model"), )
+
+    note_id = Column(Integer,
+                     ForeignKey("notes.id", ondelete="CASCADE"),
+                     primary_key=True)
+    user_id = Column(Integer,
+                     ForeignKey("users.id", ondelete="CASCADE"),
+                     nullable=False)
+    # 生成向量的模型版本（见 utils/embedding.py），与当前版本不同的向量视为缺失
+    model = Column(String(32), nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime(timezone=True),
+                        nullable=False,
+                        server_default=func.now())
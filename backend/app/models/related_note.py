@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# @File        : related_note.py
+# @Description : 预先计算的关联笔记（每篇笔记的 top-k 近邻）及后台 worker 的处理进度
+
+# here put the import lib
+from sqlalchemy import (BigInteger, Column, DateTime, Float, ForeignKey,
+                        Integer, SmallInteger)
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class RelatedNote(Base):
+    __tablename__ = "related_notes"
+
+    note_id = Column(Integer,
+                     ForeignKey("notes.id", ondelete="CASCADE"),
+                     primary_key=True)
+    # 不设外键：近邻被删除时由 worker 找出引用它的笔记并重新计算，读取时 JOIN notes 过滤
+    neighbor_id = Column(Integer, primary_key=True, index=True)
+    score = Column(Float, nullable=False)
+    shared_tags = Column(SmallInteger, nullable=False, server_default="0")
+
+
+class RelatedNoteState(Base):
+    """每个用户已处理到的 sync_changes 位置：(seq, note_id)，note_id 为空表示 seq 已处理完"""
+    __tablename__ = "related_note_state"
+
+    user_id = Column(Integer,
+                     ForeignKey("users.id", ondelete="CASCADE"),
+                     primary_key=True)
+    seq = Column(BigInteger, nullable=False, server_default="0")
+    note_id = Column(Integer)
+    # 连续失败次数及下次重试时间，成功处理后清零
+    failures = Column(SmallInteger, nullable=False, server_default="0")
+    retry_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True),
+                        nullable=False,
+                        server_default=func.now(),
+                        onupdate=func.now())
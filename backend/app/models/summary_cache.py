@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# @File        : summary_cache.py
+# @Description : AI 摘要缓存（持久层），按 (模型, 提示词, 长度, 标题, 正文) 的哈希寻址
+
+# here put the import lib
+from sqlalchemy import Column, DateTime, String, Text
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class SummaryCacheEntry(Base):
+    __tablename__ = "summary_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 hex
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True),
+                        server_default=func.now(),
+                        index=True)
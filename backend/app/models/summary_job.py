@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# @File        : summary_job.py
+# @Description : AI 摘要后台任务，表本身即任务队列（SKIP LOCKED 领取）
+
+# here put the import lib
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class SummaryJob(Base):
+    __tablename__ = "summary_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer,
+                     ForeignKey("users.id", ondelete="CASCADE"),
+                     nullable=False)
+    note_id = Column(Integer,
+                     ForeignKey("notes.id", ondelete="CASCADE"),
+                     nullable=False)
+    status = Column(String(16), nullable=False, server_default=JOB_PENDING)
+    summary = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# @File        : sync_change.py
+# @Description : 增量同步的变更记录，每个实体一行（删除后保留为墓碑），只由触发器写入
+
+# here put the import lib
+from sqlalchemy import (BigInteger, Boolean, Column, DateTime, ForeignKey,
+                        Integer, String)
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+# 实体类型；favorite 的 entity_id 为笔记 id
+ENTITY_NOTE = "note"
+ENTITY_TAG = "tag"
+ENTITY_FAVORITE = "favorite"
+
+
+class SyncChange(Base):
+    __tablename__ = "sync_changes"
+
+    user_id = Column(Integer,
+                     ForeignKey("users.id", ondelete="CASCADE"),
+                     primary_key=True)
+    entity = Column(String(16), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    # 变更时该用户的 user_stats.version，同一用户内单调递增
+    seq = Column(BigInteger, nullable=False)
+    deleted = Column(Boolean, nullable=False, server_default="false")
+    changed_at = Column(DateTime(timezone=True),
+                        nullable=False,
+                        server_default=func.now())
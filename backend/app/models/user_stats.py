@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# @File        : user_stats.py
+# @Description : 每个用户的笔记数 / 收藏数计数及数据版本号，由数据库触发器维护
+
+# here put the import lib
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer
+
+from app.db import Base
+
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer,
+                     ForeignKey("users.id", ondelete="CASCADE"),
+                     primary_key=True)
+    # 以下计数只由 notes / favorites 上的触发器写入，应用层只读
+    note_count = Column(Integer, nullable=False, server_default="0")
+    favorite_count = Column(Integer, nullable=False, server_default="0")
+    # 用户数据集合版本号：notes / tags / favorites / note_tags 任一写入都会 +1
+    version = Column(BigInteger, nullable=False, server_default="0")
+    # 已清理的删除墓碑中最大的 seq：早于它的同步令牌可能漏掉删除，不再接受
+    sync_min_seq = Column(BigInteger, nullable=False, server_default="0")
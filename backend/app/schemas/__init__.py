@@ -1,9 +1,12 @@
-from .note import NoteBase, NoteCreate, NoteOut, NoteUpdate
+from .note import (NoteBase, NoteCreate, NoteImport, NoteListItem, NoteOut,
+                   NoteUpdate, RelatedNoteOut)
 from .response import (OAuth2Response, ResponseBase, ResponseWithTotal,
                        error_response, success_response,
                        success_response_for_notes)
-from .summary import SummaryRequest, SummaryResponse
-from .tag import TagBase, TagCreate, TagOut, TagUpdate
+from .summary import (SummaryJobCreate, SummaryJobOut, SummaryRequest,
+                      SummaryResponse)
+from .sync import SyncDeleted, SyncOut
+from .tag import TagBase, TagBulkAssign, TagCreate, TagOut, TagUpdate
 from .token import Token
 from .user import UserBase, UserCreate, UserLogin, UserOut
 
@@ -12,5 +15,7 @@ __all__ = [
     "NoteUpdate", "NoteOut", "TagBase", "TagCreate", "TagUpdate", "TagOut",
     "ResponseBase", "ResponseWithTotal", "OAuth2Response", "success_response",
     "error_response", "success_response_for_notes", "SummaryRequest",
-    "SummaryResponse", "Token"
+    "SummaryResponse", "Token", "SummaryJobCreate", "SummaryJobOut",
+    "TagBulkAssign", "NoteListItem", "NoteImport", "SyncOut", "SyncDeleted",
+    "RelatedNoteOut"
 ]
@@ -1,8 +1,8 @@
 # Note 相关 schema
 from datetime import datetime
-from typing import List, Optional
+from typing import Annotated, List, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 from app.schemas.tag import TagOut
 
@@ -18,6 +18,27 @@ class NoteCreate(NoteBase):
     tags: Optional[List[int]] = []  # 前端传 tag 的 id 列表
 
 
+class NoteImport(BaseModel):
+    """导入的一条笔记，字段与导出格式一致；id 等其余字段忽略"""
+    title: str = Field(..., min_length=1, max_length=255)
+    content: str
+    summary: Optional[str] = None
+    # 标签名，不存在的自动创建
+    tags: List[Annotated[str, Field(min_length=1, max_length=50)]] = []
+    is_favorited: bool = False
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @field_validator("title", "content", "summary", "tags")
+    @classmethod
+    def reject_nul(cls, value):
+        # PostgreSQL 文本不能包含 NUL，COPY 时整块失败，逐条校验时拒绝
+        texts = value if isinstance(value, list) else [value]
+        if any(text and "\x00" in text for text in texts):
+            raise ValueError("must not contain NUL characters")
+        return value
+
+
 class NoteUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
@@ -32,4 +53,30 @@ class NoteOut(NoteBase):
     updated_at: datetime
     tags: List[TagOut] = []
     is_favorited: bool
+    headline: Optional[str] = None  # 全文搜索命中片段（<mark> 高亮），仅搜索接口返回
+    model_config = ConfigDict(from_attributes=True)
+
+
+class NoteListItem(BaseModel):
+    """列表精简视图（view=compact）：不含完整 content，只带 SQL 中截取的预览"""
+    id: int
+    user_id: int
+    title: str
+    summary: Optional[str] = None
+    content_preview: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    tags: List[TagOut] = []
+    is_favorited: bool
+    headline: Optional[str] = None  # 仅搜索接口返回
     model_config = ConfigDict(from_attributes=True)
+
+
+class RelatedNoteOut(BaseModel):
+    """关联笔记：只含列表展示需要的字段，score 为综合相似度"""
+    id: int
+    title: str
+    summary: Optional[str] = None
+    updated_at: datetime
+    score: float
+    shared_tags: int
@@ -1,5 +1,10 @@
-from typing import Generic, TypeVar, Optional
-from pydantic import BaseModel, ConfigDict
+from functools import lru_cache
+from typing import Any, Generic, List, Optional, TypeVar
+
+from fastapi.responses import Response
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+
+from app.schemas.note import NoteOut
 
 T = TypeVar("T")
 
@@ -13,6 +18,8 @@ class ResponseBase(BaseModel, Generic[T]):
 
 class ResponseWithTotal(ResponseBase[T]):
     total: Optional[int] = None
+    next_cursor: Optional[str] = None  # 游标分页：下一页的游标，没有更多数据时为 None
+    has_more: Optional[bool] = None  # 是否还有下一页（include_total=false 时用它代替 total）
 
 
 # 标准 OAuth2 响应模型
@@ -21,16 +28,48 @@ class OAuth2Response(BaseModel):
     token_type: str = "bearer"
 
 
+@lru_cache(maxsize=None)
+def _adapter(model_type: Any) -> TypeAdapter:
+    return TypeAdapter(model_type)
+
+
+def model_response(model_type: Any, content: dict) -> Response:
+    """快速路径：按 model_type 校验一次（ORM 对象按属性读取），直接序列化为 JSON 字节
+
+    返回 Response 时 FastAPI 不再按 response_model 重复校验和编码
+    """
+    adapter = _adapter(model_type)
+    body = adapter.dump_json(
+        adapter.validate_python(content, from_attributes=True))
+    return Response(content=body, media_type="application/json")
+
+
 def success_response(data: Optional[T] = None,
-                     msg: str = "success") -> ResponseBase[T]:
-    return ResponseBase[T](code=0, msg=msg,
-                           data=data).model_dump(exclude_none=True)
+                     msg: str = "success",
+                     model: Any = None):
+    """model 为 data 的类型（如 NoteOut）时走快速路径，否则交给 response_model 校验"""
+    content = {"code": 0, "msg": msg, "data": data}
+    if model is not None:
+        return model_response(ResponseBase[model], content)
+    return content
 
 
 def success_response_for_notes(data: Optional[T] = None,
                                msg: str = "success",
-                               total: int = 0) -> ResponseBase[T]:
-    return ResponseWithTotal[T](code=0, msg=msg, data=data, total=total)
+                               total: Optional[int] = 0,
+                               next_cursor: Optional[str] = None,
+                               has_more: Optional[bool] = None,
+                               item_model: Any = NoteOut) -> Response:
+    # item_model：NoteOut（完整）或 NoteListItem（view=compact）
+    return model_response(
+        ResponseWithTotal[List[item_model]], {
+            "code": 0,
+            "msg": msg,
+            "data": data,
+            "total": total,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        })
 
 
 def error_response(code: int = 1, msg: str = "Error") -> dict:
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
 
 
 class SummaryRequest(BaseModel):
@@ -8,3 +11,18 @@ class SummaryRequest(BaseModel):
 
 class SummaryResponse(BaseModel):
     summary: str
+
+
+class SummaryJobCreate(BaseModel):
+    note_id: int
+
+
+class SummaryJobOut(BaseModel):
+    id: int
+    note_id: int
+    status: str  # pending / running / succeeded / failed
+    summary: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
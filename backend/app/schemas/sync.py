@@ -0,0 +1,22 @@
+# 增量同步相关 schema
+from typing import List
+
+from pydantic import BaseModel
+
+from app.schemas.note import NoteOut
+from app.schemas.tag import TagOut
+
+
+class SyncDeleted(BaseModel):
+    notes: List[int] = []
+    tags: List[int] = []
+    favorites: List[int] = []  # 取消收藏的笔记 id
+
+
+class SyncOut(BaseModel):
+    token: str  # 下次请求作为 since 传回
+    has_more: bool  # 为 true 时立即用新 token 继续拉取
+    notes: List[NoteOut] = []
+    tags: List[TagOut] = []
+    favorites: List[int] = []  # 新收藏的笔记 id
+    deleted: SyncDeleted
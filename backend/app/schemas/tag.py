@@ -1,5 +1,7 @@
 # Tag 相关 schema
-from pydantic import BaseModel, ConfigDict
+from typing import List
+
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class TagBase(BaseModel):
@@ -18,3 +20,9 @@ class TagUpdate(BaseModel):
 class TagOut(TagBase):
     id: int
     model_config = ConfigDict(from_attributes=True)
+
+
+class TagBulkAssign(BaseModel):
+    # 一次请求最多处理的笔记 / 标签数量，避免生成过大的笛卡尔积
+    note_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    tag_ids: List[int] = Field(..., min_length=1, max_length=100)
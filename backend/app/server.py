@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# @File        : server.py
+# @Description : gunicorn 使用的 uvicorn worker，事件循环 / HTTP 解析器由配置决定
+
+# here put the import lib
+from uvicorn.workers import UvicornWorker as _UvicornWorker
+
+from app.config import settings
+
+
+class UvicornWorker(_UvicornWorker):
+    # auto：安装了 uvloop / httptools 时自动启用，否则退回 asyncio / h11
+    CONFIG_KWARGS = {
+        "loop": settings.SERVER_LOOP,
+        "http": settings.SERVER_HTTP,
+        "lifespan": "on",
+    }
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# @File        : embedding.py
+# @Description : 本地计算的笔记向量：特征哈希（hashing trick）的词频向量，不依赖外部模型或 API
+#
+# 特征：英文 / 数字单词 + 单词的字符三元组（覆盖词形变化），中文按单字和相邻两字切分；
+# 每个特征用 crc32 映射到 SEMANTIC_DIM 维中的一维（带符号，减小碰撞偏差），
+# 词频取 1 + log(tf)。IDF 随用户的笔记集合变化，不写入向量，检索时由索引按文档频率加权
+
+# here put the import lib
+import re
+import zlib
+from collections import Counter
+from typing import Iterable, List
+
+import numpy as np
+
+from app.config import settings
+
+# 存储的向量与模型版本绑定，特征或维度变化时旧向量视为缺失并重新计算
+EMBEDDING_MODEL = f"hash-tf-{settings.SEMANTIC_DIM}-v1"
+EMBEDDING_DIM = settings.SEMANTIC_DIM
+
+_WORD = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+_CJK = re.compile(r"[\u4e00-\u9fff]")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that "
+    "the this to was were will with".split())
+# 字符三元组的权重低于整词，避免长词被子串特征主导
+SUBWORD_WEIGHT = 0.5
+
+
+def _features(text: str) -> Iterable[tuple]:
+    for token in _WORD.findall(text.lower()):
+        if _CJK.match(token):
+            yield from ((char, 1.0) for char in token)
+            yield from ((token[i:i + 2], 1.0) for i in range(len(token) - 1))
+            continue
+        if token in _STOP_WORDS or len(token) < 2:
+            continue
+        yield token, 1.0
+        if len(token) >= 4:
+            padded = f"<{token}>"
+            yield from ((padded[i:i + 3], SUBWORD_WEIGHT)
+                        for i in range(len(padded) - 2))
+
+
+def embed_text(text: str) -> np.ndarray:
+    """返回 float32 的哈希词频向量（未归一化；空文本为零向量）"""
+    counts: Counter = Counter()
+    for feature, weight in _features(text):
+        counts[feature] += weight
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for feature, count in counts.items():
+        hashed = zlib.crc32(feature.encode())
+        sign = 1.0 if hashed & 0x80000000 else -1.0
+        vector[hashed % EMBEDDING_DIM] += sign * (1.0 + np.log(count))
+    return vector
+
+
+def embed_note(title: str, content: str) -> np.ndarray:
+    # 标题通常概括主题，重复一次提高权重
+    return embed_text(f"{title}\n{title}\n{content}")
+
+
+def to_bytes(vector: np.ndarray) -> bytes:
+    return vector.astype(np.float32).tobytes()
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32)
+
+
+def stack(vectors: List[np.ndarray]) -> np.ndarray:
+    if not vectors:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return np.vstack(vectors).astype(np.float32, copy=False)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# @File        : etag.py
+# @Description : 读接口的弱 ETag 与条件请求（If-None-Match -> 304）
+
+# here put the import lib
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+from app.config import settings
+
+# 响应格式变化时修改此值，让客户端已缓存的 ETag 全部失效
+ETAG_SALT = "v1"
+
+
+def make_etag(*parts) -> str:
+    """由版本号、更新时间、查询参数等拼出弱 ETag（只保证语义等价，不保证字节一致）"""
+    raw = "\x1f".join([ETAG_SALT, *(str(p) for p in parts)])
+    digest = hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match 按弱比较：忽略 W/ 前缀，支持逗号分隔的多个值和 *
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque
+               for tag in header.split(","))
+
+
+def set_cache_headers(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = settings.HTTP_CACHE_CONTROL
+    # 同一 URL 的内容取决于当前用户
+    response.headers["Vary"] = "Authorization"
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    return set_cache_headers(Response(status_code=304), etag)
+
+
+def conditional(request: Request, etag: str) -> Optional[Response]:
+    """客户端缓存仍然有效时返回 304 响应，否则返回 None"""
+    return not_modified(etag) if etag_matches(request, etag) else None
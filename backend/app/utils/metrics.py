@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# @File        : metrics.py
+# @Description : Prometheus 指标：接口延迟、每个请求的 SQL 次数 / 耗时、连接池、DeepSeek、bcrypt
+#
+# 每个请求的 SQL 统计（ContextVar + 引擎监听器 + 中间件）只有这一套，慢请求分析也复用它
+#
+# 多个 gunicorn worker 时需设置环境变量 PROMETHEUS_MULTIPROC_DIR（空目录），
+# 各进程把指标写入该目录，/metrics 汇总所有 worker 的数据（见 gunicorn.conf.py）
+#
+# 本模块不依赖 app.db（bcrypt 子进程也会导入它），引擎和连接池状态由 main.py 传入
+
+# here put the import lib
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Protocol
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+
+# 未匹配到路由的请求统一记为该值，避免扫描类请求撑爆标签基数
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds",
+                            "HTTP 请求耗时（按路由模板）", ["method", "route", "status"])
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress",
+                             "处理中的 HTTP 请求数", ["method"],
+                             multiprocess_mode="livesum")
+DB_STATEMENT_DURATION = Histogram("db_statement_duration_seconds",
+                                  "单条 SQL 语句耗时",
+                                  buckets=(.0005, .001, .0025, .005, .01, .025,
+                                           .05, .1, .25, .5, 1, 2.5))
+REQUEST_DB_STATEMENTS = Histogram("http_request_db_statements",
+                                  "单个请求执行的 SQL 语句数", ["route"],
+                                  buckets=(0, 1, 2, 3, 4, 6, 8, 12, 20, 50))
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "单个请求内 SQL 语句耗时之和",
+                               ["route"])
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "连接池连接数（size / checked_in / checked_out / overflow）", ["state"],
+    multiprocess_mode="livesum")
+DB_POOL_CHECKOUTS = Gauge("db_pool_checkouts",
+                          "累计借出连接次数",
+                          multiprocess_mode="livesum")
+DB_POOL_WAIT_SECONDS = Gauge("db_pool_wait_seconds",
+                             "累计等待借出连接的耗时",
+                             multiprocess_mode="livesum")
+DEEPSEEK_LATENCY = Histogram("deepseek_request_duration_seconds",
+                             "DeepSeek 摘要接口调用耗时", ["outcome"],
+                             buckets=(.25, .5, 1, 2, 4, 8, 15, 30, 60))
+DEEPSEEK_ERRORS = Counter("deepseek_request_errors_total", "DeepSeek 调用失败次数",
+                          ["reason"])
+PASSWORD_HASH_SECONDS = Histogram("password_hash_duration_seconds",
+                                  "bcrypt 哈希 / 校验耗时（不含排队）", ["operation"],
+                                  buckets=(.01, .025, .05, .1, .2, .3, .5, 1,
+                                           2, 5))
+PASSWORD_HASH_QUEUE_SECONDS = Histogram("password_hash_queue_seconds",
+                                        "bcrypt 任务等待空闲进程的耗时",
+                                        buckets=(0, .001, .01, .05, .1, .25,
+                                                 .5, 1, 2, 5))
+
+
+@dataclass
+class RequestDBStats:
+    statements: int = 0
+    seconds: float = 0.0
+
+    def record(self, statement: str, parameters, seconds: float,
+               paramstyle: str):
+        # 慢请求分析（utils.sql_profiler.RequestProfile）在子类中按语句指纹分组
+        self.statements += 1
+        self.seconds += seconds
+
+
+# 当前请求的 SQL 统计；线程池（run_in_threadpool）和 run_sync 都会继承 contextvars
+_request_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar(
+    "request_db_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_STATEMENT_DURATION.observe(elapsed)
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats.record(statement, parameters, elapsed, conn.dialect.paramstyle)
+
+
+def _handle_error(exception_context):
+    # 出错的语句不会触发 after_cursor_execute，丢弃它的开始时间
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_query_start"):
+        conn.info["metrics_query_start"].pop()
+
+
+def instrument_engine(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+PoolStatus = Callable[[], Dict[str, Any]]
+
+
+class RequestProfiler(Protocol):
+    """按请求分析 SQL 的钩子，由 utils.sql_profiler.SQLProfiler 实现"""
+
+    def new_stats(self) -> RequestDBStats:
+        ...
+
+    def response_headers(self, stats: RequestDBStats) -> List[tuple]:
+        ...
+
+    def finish(self, scope, status: int, stats: RequestDBStats,
+               elapsed: float):
+        ...
+
+
+def update_pool_gauges(pool_status: PoolStatus):
+    status = pool_status()
+    for state in ("size", "checked_in", "checked_out", "overflow"):
+        if state in status:
+            # 连接数未达到 pool_size 时 QueuePool.overflow() 为负数，按 0 计
+            DB_POOL_CONNECTIONS.labels(state).set(max(status[state], 0))
+    DB_POOL_CHECKOUTS.set(status["checkouts"])
+    DB_POOL_WAIT_SECONDS.set(status["wait_seconds_total"])
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：按路由模板记录耗时和 SQL 统计，不缓冲响应体（流式响应也适用）
+
+    传入 profiler 时同一份请求 SQL 统计再交给它做语句指纹分析（Server-Timing、慢请求日志）；
+    metrics=False 时只做分析，不记录 Prometheus 指标
+    """
+
+    def __init__(self,
+                 app,
+                 pool_status: PoolStatus,
+                 metrics: bool = True,
+                 profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.pool_status = pool_status
+        self.metrics = metrics
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        profiler = self.profiler
+        stats = profiler.new_stats() if profiler else RequestDBStats()
+        token = _request_db_stats.set(stats)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profiler is not None:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *profiler.response_headers(stats),
+                    ]
+            await send(message)
+
+        # 路由在下游匹配后才写入 scope，进行中请求数只能按方法统计
+        in_progress = REQUESTS_IN_PROGRESS.labels(scope["method"])
+        if self.metrics:
+            in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db_stats.reset(token)
+            elapsed = time.perf_counter() - start
+            if self.metrics:
+                in_progress.dec()
+                route = scope.get("route")
+                template = getattr(route, "path_format", UNMATCHED_ROUTE)
+                REQUEST_LATENCY.labels(scope["method"], template,
+                                       str(status)).observe(elapsed)
+                REQUEST_DB_STATEMENTS.labels(template).observe(
+                    stats.statements)
+                REQUEST_DB_SECONDS.labels(template).observe(stats.seconds)
+                update_pool_gauges(self.pool_status)
+            if profiler is not None:
+                profiler.finish(scope, status, stats, elapsed)
+
+
+def render_metrics(pool_status: PoolStatus):
+    """返回 (响应体, Content-Type)；多进程模式下汇总所有 worker"""
+    update_pool_gauges(pool_status)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def observe_deepseek(seconds: float, error: Optional[str] = None):
+    DEEPSEEK_LATENCY.labels("error" if error else "ok").observe(seconds)
+    if error:
+        DEEPSEEK_ERRORS.labels(error).inc()
+
+
+def deepseek_error_reason(exc: BaseException) -> str:
+    # HTTP 错误按状态码归类，其余按异常类型（超时、连接失败、解析失败等）
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return f"http_{status}" if status else type(exc).__name__
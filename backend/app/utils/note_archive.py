@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# @File        : note_archive.py
+# @Description : 笔记导出 / 导入格式：NDJSON（每行一条 JSON）与 Markdown zip（YAML front matter）
+#
+# 编码函数都是生成器，输入为逐块的笔记 dict，输出为逐块的字节，配合 StreamingResponse 使用；
+# 解析函数逐条返回 (位置, 笔记 dict, 错误信息)，单条记录出错不影响其余记录
+
+# here put the import lib
+import json
+import re
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+# 文件名中保留的标题字符数
+FILENAME_TITLE_LENGTH = 50
+_UNSAFE_FILENAME = re.compile(r"[^\w\-]+", re.UNICODE)
+_FILENAME_ID = re.compile(r"^\d+-")
+# 导入时单个 Markdown 文件解压后的大小上限，防止压缩炸弹
+MAX_MARKDOWN_SIZE = 10 * 1024 * 1024
+
+# (位置, 笔记 dict, 错误信息)
+ImportRecord = Tuple[str, Optional[dict], Optional[str]]
+
+
+def encode_ndjson(chunks: Iterable[List[dict]]) -> Iterator[bytes]:
+    for notes in chunks:
+        yield b"".join(orjson.dumps(note) + b"\n" for note in notes)
+
+
+def _yaml_value(value) -> str:
+    # JSON 字符串 / 数组 / 布尔值同时也是合法的 YAML，不需要引入 YAML 依赖
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return json.dumps(value, ensure_ascii=False)
+
+
+def note_to_markdown(note: dict) -> str:
+    front_matter = [
+        f"{key}: {_yaml_value(note[key])}"
+        for key in ("id", "title", "tags", "is_favorited", "created_at",
+                    "updated_at", "summary") if note.get(key) is not None
+    ]
+    return "---\n" + "\n".join(front_matter) + "\n---\n\n" + note["content"]
+
+
+def markdown_filename(note: dict) -> str:
+    # 以 id 开头保证唯一；标题只保留字母数字（含中文）、下划线和连字符
+    slug = _UNSAFE_FILENAME.sub("-", note["title"]).strip("-")
+    slug = slug[:FILENAME_TITLE_LENGTH] or "untitled"
+    return f"notes/{note['id']}-{slug}.md"
+
+
+class _ChunkBuffer:
+    """只追加、不可 seek 的文件对象，zipfile 写入后由生成器取走已写出的字节"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def encode_markdown_zip(chunks: Iterable[List[dict]]) -> Iterator[bytes]:
+    """流式生成 zip：不可 seek 的输出下 zipfile 使用数据描述符，无需回写文件头"""
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode="w",
+                         compression=zipfile.ZIP_DEFLATED) as archive:
+        for notes in chunks:
+            for note in notes:
+                info = zipfile.ZipInfo(
+                    markdown_filename(note),
+                    date_time=note["updated_at"].timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, note_to_markdown(note))
+            yield buffer.take()
+    # 关闭时写入中央目录
+    yield buffer.take()
+
+
+def iter_ndjson_records(lines: Iterable[bytes]) -> Iterator[ImportRecord]:
+    """逐行解析 NDJSON（可直接传入文件对象），空行跳过"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        label = f"line {number}"
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield label, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield label, None, "Expected a JSON object"
+            continue
+        yield label, record, None
+
+
+def _parse_yaml_value(value: str):
+    # 导出的值都是 JSON；手写的 front matter 再兼容不带引号的字符串和 [a, b] 列表
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    if value.startswith("[") and value.endswith("]"):
+        return [
+            item.strip().strip("\"'") for item in value[1:-1].split(",")
+            if item.strip()
+        ]
+    return value.strip("\"'")
+
+
+def markdown_to_note(text: str, filename: str) -> dict:
+    """note_to_markdown 的逆操作；没有 front matter 时整个文件作为正文，文件名作为标题"""
+    note = {}
+    body = text
+    if text.startswith("---\n"):
+        end = text.find("\n---\n", 3)
+        if end != -1:
+            for line in text[4:end].splitlines():
+                key, sep, value = line.partition(":")
+                if sep:
+                    note[key.strip()] = _parse_yaml_value(value.strip())
+            body = text[end + 5:]
+            if body.startswith("\n"):
+                body = body[1:]
+    note["content"] = body
+    if "title" not in note:
+        stem = filename.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        note["title"] = _FILENAME_ID.sub("", stem)
+    return note
+
+
+def iter_markdown_zip_records(
+        archive: zipfile.ZipFile) -> Iterator[ImportRecord]:
+    """逐个读取 zip 中的 .md 文件，其余文件忽略"""
+    for info in archive.infolist():
+        if info.is_dir() or not info.filename.lower().endswith(".md"):
+            continue
+        if info.file_size > MAX_MARKDOWN_SIZE:
+            yield info.filename, None, "File too large"
+            continue
+        try:
+            text = archive.read(info).decode("utf-8")
+        except UnicodeDecodeError:
+            yield info.filename, None, "File is not valid UTF-8"
+            continue
+        except (zipfile.BadZipFile, EOFError) as e:
+            yield info.filename, None, f"Corrupted entry: {e}"
+            continue
+        yield info.filename, markdown_to_note(text, info.filename), None
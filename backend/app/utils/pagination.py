@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# @File        : pagination.py
+# @Description : 列表接口的游标（keyset）分页工具
+
+# here put the import lib
+import base64
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """将 (排序时间, id) 编码为不透明的游标字符串"""
+    raw = json.dumps([sort_value.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标，格式不合法时抛出 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def paginate(query: Query, sort_column, id_column, skip: int, limit: int,
+             cursor: Optional[str]) -> Query:
+    """按 (sort_column, id_column) 降序分页
+
+    传入 cursor 时使用 keyset 方式从上一页最后一行之后继续查（忽略 skip），
+    否则退回 OFFSET 分页。多取一条用于判断是否还有下一页。
+    """
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(sort_column, id_column) < (sort_value, last_id))
+    elif skip:
+        query = query.offset(skip)
+    return query.order_by(sort_column.desc(),
+                          id_column.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int,
+               key: Callable) -> Tuple[List, Optional[str]]:
+    """截取当前页，并根据多取的一条生成 next_cursor"""
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    return page, encode_cursor(*key(page[-1]))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# @File        : password_hasher.py
+# @Description : bcrypt 哈希 / 校验放到独立进程池中执行，不占用请求线程
+
+# here put the import lib
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.utils.metrics import (PASSWORD_HASH_QUEUE_SECONDS,
+                               PASSWORD_HASH_SECONDS)
+
+
+@lru_cache()
+def crypt_context(rounds: int) -> CryptContext:
+    # rounds 与当前配置不一致的哈希会被判定为需要更新
+    return CryptContext(schemes=["bcrypt"],
+                        deprecated="auto",
+                        bcrypt__rounds=rounds)
+
+
+# 以下两个函数在子进程中执行，只依赖参数，不访问数据库
+def hash_with_rounds(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+
+def verify_and_update(password: str, hashed: str,
+                      rounds: int) -> Tuple[bool, Optional[str]]:
+    try:
+        return crypt_context(rounds).verify_and_update(password, hashed)
+    except ValueError:
+        # 无法识别的哈希格式（例如被禁用的账号）一律视为校验失败
+        return False, None
+
+
+class PasswordHasher:
+    """每个进程一个实例
+
+    - workers 个子进程并行计算 bcrypt，workers=0 时退回线程池（便于调试）
+    - 同时提交的任务数不超过 max_pending，登录洪峰只会在这里排队
+    - 进程池按需创建，gunicorn fork 之后每个 worker 各自拥有一个
+    """
+
+    def __init__(self, rounds: int, workers: int, max_pending: int):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn：不继承父进程的线程 / 连接池等状态
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 信号量绑定事件循环，循环变化（如测试中多次启动应用）时重建
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        return self._semaphore
+
+    async def _run(self, operation: str, fn, *args):
+        queued = time.perf_counter()
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            PASSWORD_HASH_QUEUE_SECONDS.observe(start - queued)
+            try:
+                if self.workers <= 0:
+                    return await run_in_threadpool(fn, *args)
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), fn,
+                                                  *args)
+            finally:
+                # 包含与子进程之间的传输开销；进程池排队也会计入这里
+                PASSWORD_HASH_SECONDS.labels(operation).observe(
+                    time.perf_counter() - start)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_with_rounds, password, self.rounds)
+
+    async def verify(self, password: str,
+                     hashed: str) -> Tuple[bool, Optional[str]]:
+        """返回 (是否匹配, 新哈希)；哈希参数过期时新哈希不为 None"""
+        return await self._run("verify", verify_and_update, password, hashed,
+                               self.rounds)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# @File        : read_cache.py
+# @Description : 热点读接口的读穿缓存：进程内 LRU + 可选 Redis，按用户数据版本号失效
+
+# here put the import lib
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# 等待其他进程加载结果时的轮询间隔（秒）
+LOCK_POLL_INTERVAL = 0.02
+# Redis 调用失败的标记（与 "key 不存在" 的 None 区分）
+_FAILED = object()
+
+
+class ReadThroughCache:
+    """缓存序列化后的响应体（bytes）
+
+    - key 中带有用户的集合版本号（user_stats.version，由触发器在任何写入时 +1），
+      写入后新请求自然落到新 key，旧条目不再被读到，由 LRU / TTL 淘汰，失效是 O(1) 的
+    - 同一进程内相同 key 的并发未命中只执行一次 loader（single-flight）；
+      配置了 Redis 时再用 SET NX 锁让多个进程也只加载一次
+    - Redis 出错时记录日志并退化为只用进程内缓存，不影响请求
+    - 进程内缓存按条数和总字节数（memory_bytes）双重限制，
+      超过 max_entry_bytes 的响应体只写 Redis，不占进程内存
+    """
+
+    def __init__(self,
+                 memory_size: int,
+                 ttl: int,
+                 memory_bytes: Optional[int] = None,
+                 max_entry_bytes: Optional[int] = None,
+                 redis=None,
+                 prefix: str = "kms",
+                 lock_timeout: float = 5,
+                 enabled: bool = True):
+        self.ttl = ttl
+        self.redis = redis
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.enabled = enabled
+        self.max_entry_bytes = max_entry_bytes
+        self._memory = TTLCache(maxsize=memory_size,
+                                ttl=ttl,
+                                maxbytes=memory_bytes)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.redis_errors = 0
+
+    def key(self, user_id: int, version: int, name: str, *parts) -> str:
+        # 用户与版本号放在明文部分，便于在 Redis 中按前缀排查
+        digest = hashlib.blake2b("\x1f".join(str(p) for p in parts).encode(),
+                                 digest_size=12).hexdigest()
+        return f"{self.prefix}:u{user_id}:v{version}:{name}:{digest}"
+
+    async def get_or_load(self, key: str,
+                          loader: Callable[[], Awaitable[bytes]]) -> bytes:
+        """命中直接返回；未命中调用 loader 并写入缓存
+
+        loader 抛出的异常原样传给所有等待者；加载者被取消时等待者改为自己加载
+        """
+        if not self.enabled:
+            return await loader()
+        while True:
+            value = self._memory.get(key)
+            if value is not None:
+                self._count("memory_hits")
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                return await self._lead(key, loader)
+            self._count("coalesced")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # 只有加载者被取消（如其客户端断开）时重新尝试，自己被取消时照常抛出
+                if not inflight.cancelled():
+                    raise
+
+    async def _lead(self, key: str, loader) -> bytes:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时也标记为已读取，避免 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, key: str, loader) -> bytes:
+        locked = False
+        if self.redis is not None:
+            value = await self._redis_get(key)
+            if value is not None:
+                self._count("redis_hits")
+                self._remember(key, value)
+                return value
+            locked = await self._redis_lock(key)
+            if not locked:
+                # 其他进程正在加载同一个 key，等它写入结果
+                value = await self._wait_for(key)
+                if value is not None:
+                    self._count("redis_hits")
+                    self._remember(key, value)
+                    return value
+
+        self._count("misses")
+        try:
+            value = await loader()
+            self._remember(key, value)
+            if self.redis is not None:
+                await self._redis_call(self.redis.set, key, value, ex=self.ttl)
+        finally:
+            if locked:
+                await self._redis_call(self.redis.delete, f"{key}:lock")
+        return value
+
+    async def _redis_get(self, key: str) -> Optional[bytes]:
+        value = await self._redis_call(self.redis.get, key)
+        return None if value is _FAILED else value
+
+    async def _redis_lock(self, key: str) -> bool:
+        ok = await self._redis_call(self.redis.set,
+                                    f"{key}:lock",
+                                    b"1",
+                                    nx=True,
+                                    px=int(self.lock_timeout * 1000))
+        # Redis 不可用时视为拿到锁，直接加载
+        return ok is _FAILED or bool(ok)
+
+    async def _wait_for(self, key: str) -> Optional[bytes]:
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value = await self._redis_call(self.redis.get, key)
+            if value is _FAILED:
+                return None
+            if value is not None:
+                return value
+        # 持锁进程超时未写入，自己加载
+        return None
+
+    async def _redis_call(self, fn, *args, **kwargs):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            self._count("redis_errors")
+            logger.warning("read cache redis error: %s", e)
+            return _FAILED
+
+    def _remember(self, key: str, value: bytes):
+        if self.max_entry_bytes is None or len(value) <= self.max_entry_bytes:
+            self._memory.set(key, value)
+
+    def clear(self):
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "redis_errors": self.redis_errors,
+                "memory_size": len(self._memory),
+                "memory_bytes": self._memory.nbytes,
+            }
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+def _redis_client():
+    if not settings.CACHE_REDIS_URL:
+        return None
+    # 可选依赖：只有配置了 CACHE_REDIS_URL 才需要安装 redis
+    from redis import asyncio as aioredis
+    return aioredis.from_url(settings.CACHE_REDIS_URL,
+                             socket_timeout=settings.CACHE_REDIS_TIMEOUT)
+
+
+read_cache = ReadThroughCache(memory_size=settings.CACHE_MEMORY_SIZE,
+                              ttl=settings.CACHE_TTL,
+                              memory_bytes=settings.CACHE_MEMORY_BYTES,
+                              max_entry_bytes=settings.CACHE_MAX_ENTRY_BYTES,
+                              redis=_redis_client(),
+                              prefix=settings.CACHE_KEY_PREFIX,
+                              lock_timeout=settings.CACHE_LOCK_TIMEOUT,
+                              enabled=settings.CACHE_ENABLED)
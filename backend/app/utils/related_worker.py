@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# @File        : related_worker.py
+# @Description : 关联笔记后台 worker：按 sync_changes 增量更新 related_notes 近邻表
+
+# here put the import lib
+import asyncio
+import logging
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from app.config import settings
+from app.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 每轮检查的用户数
+USERS_PER_ROUND = 16
+
+
+def _with_session(fn, *args, **kwargs):
+    with SessionLocal() as db:
+        return fn(db, *args, **kwargs)
+
+
+class RelatedWorker:
+    """每个进程一个实例，在应用 lifespan 中启动 / 停止
+
+    - 笔记写入后 notify() 立即唤醒；其他进程的写入靠定时轮询发现
+    - 同一用户由进度行的行锁保证同一时刻只有一个进程在处理
+    - 每轮按最久未处理的顺序选取用户，反复失败的用户按指数退避，不会挤占其他用户
+    """
+
+    def __init__(self, poll_interval: float, batch_size: int):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        await asyncio.gather(self._runner, return_exceptions=True)
+        self._runner = None
+
+    def notify(self):
+        """笔记变化时唤醒 worker（可在任意线程调用）"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            processed = 0
+            try:
+                processed = await run_in_threadpool(self.run_once)
+            except Exception as e:
+                logger.error(f"Updating related notes failed: {e}")
+            if processed:
+                # 本轮有进展，可能还有未处理完的变更，继续下一轮
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),
+                                       timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def run_once(self) -> int:
+        """处理一轮待更新的用户（每个用户一批），返回处理的变更数"""
+        processed = 0
+        for user_id in _with_session(crud.pending_related_users,
+                                     USERS_PER_ROUND):
+            try:
+                processed += _with_session(crud.update_related_notes, user_id,
+                                           self.batch_size)
+            except Exception as e:
+                # 单个用户失败不影响其他用户：进度未前进，退避一段时间后重试
+                logger.error(f"Updating related notes of user {user_id} "
+                             f"failed: {e}")
+                _with_session(crud.defer_related_user, user_id,
+                              settings.RELATED_RETRY_DELAY)
+        return processed
+
+
+related_worker = RelatedWorker(poll_interval=settings.RELATED_POLL_INTERVAL,
+                               batch_size=settings.RELATED_BATCH_SIZE)
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+# @File        : sql_profiler.py
+# @Description : 按请求统计 SQL：语句指纹分组、Server-Timing 响应头、慢请求日志、EXPLAIN 采样
+#
+# 与 DB_ECHO 的区别：只在请求超过阈值（耗时 / 语句数 / 同一指纹重复次数）时
+# 输出该请求的语句列表，生产环境也可以常开，用来发现 N+1、慢查询等退化
+#
+# 语句由 utils.metrics 的引擎监听器和 MetricsMiddleware 收集（同一套 ContextVar），
+# 本模块只提供按指纹分组的 RequestProfile 和请求结束时的分析（SQLProfiler）
+
+# here put the import lib
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+from app.config import settings
+from app.utils.metrics import RequestDBStats
+
+logger = logging.getLogger(__name__)
+
+# 日志中每条语句最多输出的字符数
+STATEMENT_LOG_LENGTH = 300
+# 记录 EXPLAIN 时间的指纹数上限（超出后淘汰最早的）
+EXPLAIN_HISTORY_SIZE = 1000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|\?")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES = re.compile(r"(VALUES\s*\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+",
+                     re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+# 有副作用的 SELECT：ANALYZE 会真正执行，回滚撤销不了序列取值，行锁 / 咨询锁会与业务争用
+_VOLATILE = re.compile(
+    r"\b(?:nextval|setval|pg_advisory\w*|pg_notify|set_config)\b"
+    r"|\bFOR\s+(?:UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b",
+    re.IGNORECASE)
+
+
+# SQLAlchemy 编译缓存使同一形状的语句文本完全相同，归一化结果可以直接缓存
+@lru_cache(maxsize=4096)
+def normalize_statement(statement: str) -> str:
+    """把字面量和占位符替换为 ?，IN 列表 / 多行 VALUES 折叠，使同一形状的语句得到同一指纹"""
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(?...)", sql)
+    sql = _VALUES.sub(r"\1", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+@lru_cache(maxsize=4096)
+def _digest(sql: str) -> str:
+    return hashlib.blake2b(sql.encode(), digest_size=6).hexdigest()
+
+
+def fingerprint(statement: str) -> str:
+    return _digest(normalize_statement(statement))
+
+
+@dataclass
+class StatementGroup:
+    fingerprint: str
+    sql: str  # 归一化后的语句
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    # 耗时最长的一次执行的原始语句和参数，供 EXPLAIN 使用
+    slowest_statement: str = ""
+    slowest_parameters: object = None
+
+
+@dataclass
+class RequestProfile(RequestDBStats):
+    """在请求 SQL 统计的基础上按指纹分组"""
+    groups: Dict[str, StatementGroup] = field(default_factory=dict)
+    # psycopg2 / asyncpg 的占位符格式不同，EXPLAIN 时需要转换
+    paramstyle: str = "pyformat"
+
+    def record(self, statement: str, parameters, seconds: float,
+               paramstyle: str):
+        sql = normalize_statement(statement)
+        key = _digest(sql)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = StatementGroup(key, sql)
+        group.count += 1
+        group.seconds += seconds
+        if seconds >= group.max_seconds:
+            group.max_seconds = seconds
+            group.slowest_statement = statement
+            group.slowest_parameters = parameters
+        super().record(statement, parameters, seconds, paramstyle)
+        self.paramstyle = paramstyle
+
+    def top_groups(self) -> List[StatementGroup]:
+        return sorted(self.groups.values(),
+                      key=lambda g: g.seconds,
+                      reverse=True)
+
+
+def _to_pyformat(statement: str, parameters):
+    """asyncpg 的 $n 占位符 + 元组参数 -> psycopg2 的 %s + 列表参数"""
+    values = []
+
+    def replace(match):
+        values.append(parameters[int(match.group(1)) - 1])
+        return "%s"
+
+    if not parameters:
+        return statement, None
+    sql = re.sub(r"\$(\d+)", replace, statement.replace("%", "%%"))
+    return sql, tuple(values)
+
+
+class ExplainSampler:
+    """对慢语句按概率执行 EXPLAIN (ANALYZE, BUFFERS) 并写日志
+
+    - 只处理 SELECT（含不带写操作的 WITH），在回滚的事务里执行，不会改动数据；
+      调用 nextval 等或带 FOR UPDATE 的语句只做不带 ANALYZE 的 EXPLAIN
+    - 同一指纹在 interval 秒内最多 EXPLAIN 一次，避免慢查询被重复放大
+    - 使用独立的同步连接，在单独的后台线程里排队执行，不占用请求的数据库会话，也不拖慢请求
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._last: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Set[Future] = set()
+
+    def submit(self, profile: RequestProfile):
+        """把本请求中需要 EXPLAIN 的语句排入后台线程，立即返回"""
+        for group in self.candidates(profile):
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="sql-explain")
+                future = self._executor.submit(self.explain, group,
+                                               profile.paramstyle)
+                self._pending.add(future)
+            future.add_done_callback(self._pending.discard)
+
+    def wait(self, timeout: Optional[float] = None):
+        """等待已排队的 EXPLAIN 执行完"""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def candidates(self, profile: RequestProfile) -> List[StatementGroup]:
+        threshold = settings.SQL_PROFILE_EXPLAIN_MIN_MS / 1000
+        result = []
+        for group in profile.top_groups():
+            if group.max_seconds < threshold or not self._explainable(
+                    group.sql):
+                continue
+            if random.random() >= settings.SQL_PROFILE_EXPLAIN_SAMPLE_RATE:
+                continue
+            if self._claim(group.fingerprint):
+                result.append(group)
+        return result
+
+    def _claim(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and (now - last
+                                     < settings.SQL_PROFILE_EXPLAIN_INTERVAL):
+                return False
+            self._last[key] = now
+            self._last.move_to_end(key)
+            while len(self._last) > EXPLAIN_HISTORY_SIZE:
+                self._last.popitem(last=False)
+            return True
+
+    @staticmethod
+    def _explainable(sql: str) -> bool:
+        head = sql.lstrip().upper()
+        if head.startswith("SELECT"):
+            return True
+        return head.startswith("WITH") and not re.search(
+            r"\b(INSERT|UPDATE|DELETE)\b", head)
+
+    @staticmethod
+    def _analyzable(sql: str) -> bool:
+        return _VOLATILE.search(sql) is None
+
+    def explain(self, group: StatementGroup, paramstyle: str):
+        statement = group.slowest_statement
+        parameters = group.slowest_parameters
+        if paramstyle == "numeric_dollar":
+            statement, parameters = _to_pyformat(statement, parameters)
+        # 有副作用的语句只看执行计划，不真正执行
+        prefix = ("EXPLAIN (ANALYZE, BUFFERS) "
+                  if self._analyzable(group.sql) else "EXPLAIN ")
+        try:
+            with self.engine.connect() as conn:
+                with conn.begin() as trans:
+                    rows = conn.exec_driver_sql(prefix + statement,
+                                                parameters).fetchall()
+                    trans.rollback()
+        except Exception as e:
+            logger.warning("EXPLAIN failed for fingerprint %s: %s",
+                           group.fingerprint, e)
+            return
+        plan = "\n".join(row[0] for row in rows)
+        logger.warning("EXPLAIN fingerprint=%s max=%.1fms\n%s\n%s",
+                       group.fingerprint, group.max_seconds * 1000,
+                       group.sql[:STATEMENT_LOG_LENGTH], plan)
+
+
+def format_profile(profile: RequestProfile) -> str:
+    lines = []
+    for group in profile.top_groups():
+        lines.append(f"  [{group.fingerprint}] x{group.count} "
+                     f"{group.seconds * 1000:.1f}ms "
+                     f"(max {group.max_seconds * 1000:.1f}ms) "
+                     f"{group.sql[:STATEMENT_LOG_LENGTH]}")
+    return "\n".join(lines)
+
+
+def slow_reasons(profile: RequestProfile, elapsed: float) -> List[str]:
+    reasons = []
+    if elapsed * 1000 >= settings.SQL_PROFILE_SLOW_REQUEST_MS:
+        reasons.append(f"latency {elapsed * 1000:.0f}ms")
+    if profile.statements > settings.SQL_PROFILE_MAX_STATEMENTS:
+        reasons.append(
+            f"over {settings.SQL_PROFILE_MAX_STATEMENTS} statements")
+    repeated = [
+        g for g in profile.groups.values()
+        if g.count >= settings.SQL_PROFILE_REPEAT_THRESHOLD
+    ]
+    if repeated:
+        # 同一指纹在一个请求里执行很多次，通常是 N+1
+        reasons.append("repeated " + ", ".join(f"{g.fingerprint} x{g.count}"
+                                               for g in repeated))
+    return reasons
+
+
+class SQLProfiler:
+    """供 MetricsMiddleware 调用：写 Server-Timing 头，请求结束时记录超过阈值的请求"""
+
+    def __init__(self, explainer: Optional[ExplainSampler] = None):
+        self.explainer = explainer
+
+    def new_stats(self) -> RequestProfile:
+        return RequestProfile()
+
+    def response_headers(self, profile: RequestProfile) -> List[tuple]:
+        if not settings.SQL_PROFILE_SERVER_TIMING:
+            return []
+        # 响应头发出时已执行的语句；流式响应之后的语句只计入日志
+        timing = (f'db;dur={profile.seconds * 1000:.1f};'
+                  f'desc="{profile.statements} queries"')
+        return [(b"server-timing", timing.encode())]
+
+    def finish(self, scope, status: int, profile: RequestProfile,
+               elapsed: float):
+        reasons = slow_reasons(profile, elapsed)
+        if reasons:
+            logger.warning(
+                "slow request %s %s -> %s: %s; %d statements, "
+                "db %.1fms, total %.1fms\n%s", scope["method"], scope["path"],
+                status, "; ".join(reasons),
+                profile.statements, profile.seconds * 1000, elapsed * 1000,
+                format_profile(profile))
+        if self.explainer is not None and (
+                settings.SQL_PROFILE_EXPLAIN_SAMPLE_RATE > 0):
+            self.explainer.submit(profile)
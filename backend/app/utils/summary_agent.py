@@ -1,30 +1,19 @@
 import logging
+import time
 from typing import Optional
 
+import httpx
 import requests
 
 # 建议将 API_KEY 放在环境变量或配置文件中读取
 from app.config import settings
+from app.utils.metrics import deepseek_error_reason, observe_deepseek
 
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
 DEEPSEEK_MODEL = "deepseek-chat"  # 官方推荐模型名称
 
 logger = logging.getLogger(__name__)
 
-
-def generate_summary(note_title: str,
-                     note_content: str,
-                     max_length: int = 100) -> Optional[str]:
-    """
-    调用 DeepSeek API 同步生成笔记摘要。
-    :param note_content: 笔记正文内容
-    :param max_length: 摘要最大长度（字符数）
-    :return: 摘要字符串 或 None（失败时）
-    """
-    if not note_content.strip():
-        return None
-
-    prompt = f"""
+PROMPT_TEMPLATE = """
 请为以下笔记内容生成一个简洁的中文摘要，长度不超过 {max_length} 字。
 要求：准确、自然、有逻辑，不添加主观评价。
 
@@ -33,6 +22,12 @@ def generate_summary(note_title: str,
 {note_content}
 """
 
+
+def _build_request(note_title: str, note_content: str, max_length: int):
+    prompt = PROMPT_TEMPLATE.format(max_length=max_length,
+                                    note_title=note_title,
+                                    note_content=note_content)
+
     headers = {
         "Authorization": f"Bearer {settings.DEEPSEEK_API_KEY}",
         "Content-Type": "application/json",
@@ -56,17 +51,65 @@ def generate_summary(note_title: str,
         "max_tokens":
         512,
     }
+    return headers, payload
+
+
+def _parse_summary(data: dict) -> str:
+    return data["choices"][0]["message"]["content"].strip()
+
+
+def generate_summary(note_title: str,
+                     note_content: str,
+                     max_length: int = 100) -> Optional[str]:
+    """
+    调用 DeepSeek API 同步生成笔记摘要。
+    :param note_content: 笔记正文内容
+    :param max_length: 摘要最大长度（字符数）
+    :return: 摘要字符串 或 None（失败时）
+    """
+    if not note_content.strip():
+        return None
 
+    headers, payload = _build_request(note_title, note_content, max_length)
+
+    start = time.perf_counter()
     try:
-        response = requests.post(DEEPSEEK_API_URL,
+        response = requests.post(settings.DEEPSEEK_API_URL,
                                  headers=headers,
                                  json=payload,
                                  timeout=15)
         response.raise_for_status()
-        data = response.json()
-        summary = data["choices"][0]["message"]["content"].strip()
+        summary = _parse_summary(response.json())
+        observe_deepseek(time.perf_counter() - start)
         return summary
 
     except Exception as e:
+        observe_deepseek(time.perf_counter() - start, deepseek_error_reason(e))
         logger.error(f"DeepSeek summary generation failed: {e}")
         return None
+
+
+async def agenerate_summary(client: httpx.AsyncClient,
+                            note_title: str,
+                            note_content: str,
+                            max_length: int = 100) -> str:
+    """
+    使用复用连接的 httpx.AsyncClient 异步生成笔记摘要（供后台任务使用）。
+    失败时抛出异常，由调用方记录到任务状态中。
+    """
+    if not note_content.strip():
+        raise ValueError("Note content is empty")
+
+    headers, payload = _build_request(note_title, note_content, max_length)
+    start = time.perf_counter()
+    try:
+        response = await client.post(settings.DEEPSEEK_API_URL,
+                                     headers=headers,
+                                     json=payload)
+        response.raise_for_status()
+        summary = _parse_summary(response.json())
+    except Exception as e:
+        observe_deepseek(time.perf_counter() - start, deepseek_error_reason(e))
+        raise
+    observe_deepseek(time.perf_counter() - start)
+    return summary
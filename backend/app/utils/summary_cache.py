@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# @File        : summary_cache.py
+# @Description : AI 摘要内容寻址缓存：进程内 LRU + Postgres 持久层
+
+# here put the import lib
+import hashlib
+import json
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.config import settings
+from app.utils.summary_agent import (DEEPSEEK_MODEL, PROMPT_TEMPLATE,
+                                     generate_summary)
+from app.utils.ttl_cache import TTLCache
+
+# 每写入这么多条持久缓存做一次过期 / 超量清理
+EVICT_EVERY_WRITES = 100
+
+
+def summary_cache_key(note_title: str,
+                      note_content: str,
+                      max_length: int = 100) -> str:
+    """模型、提示词模板、长度或笔记内容任一变化都会得到新的 key"""
+    raw = json.dumps([
+        DEEPSEEK_MODEL, PROMPT_TEMPLATE, max_length, note_title, note_content
+    ],
+                     ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class SummaryCache:
+
+    def __init__(self, maxsize: int, ttl: int, max_rows: int):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, key: str) -> Optional[str]:
+        summary = self._memory.get(key)
+        if summary is not None:
+            self._count("memory_hits")
+            return summary
+        summary = crud.get_cached_summary(db, key, self.ttl)
+        if summary is not None:
+            self._count("db_hits")
+            self._memory.set(key, summary)
+            return summary
+        self._count("misses")
+        return None
+
+    def set(self, db: Session, key: str, summary: str):
+        self._memory.set(key, summary)
+        crud.save_cached_summary(db, key, summary)
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY_WRITES == 0
+        if evict:
+            crud.evict_summary_cache(db, self.ttl, self.max_rows)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "memory_size": len(self._memory),
+            }
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+summary_cache = SummaryCache(maxsize=settings.SUMMARY_CACHE_SIZE,
+                             ttl=settings.SUMMARY_CACHE_TTL,
+                             max_rows=settings.SUMMARY_CACHE_MAX_ROWS)
+
+
+def generate_summary_cached(db: Session,
+                            note_title: str,
+                            note_content: str,
+                            max_length: int = 100) -> Optional[str]:
+    """先查缓存，未命中再调用 DeepSeek 并写入缓存"""
+    key = summary_cache_key(note_title, note_content, max_length)
+    summary = summary_cache.get(db, key)
+    if summary is not None:
+        return summary
+    summary = generate_summary(note_title, note_content, max_length)
+    if summary:
+        summary_cache.set(db, key, summary)
+    return summary
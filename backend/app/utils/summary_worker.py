@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# @File        : summary_worker.py
+# @Description : AI 摘要后台 worker：从 summary_jobs 领取任务，并发调用 LLM，结果写回笔记
+
+# here put the import lib
+import asyncio
+import logging
+from typing import Optional, Set
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from app.config import settings
+from app.crud.summary_job import ClaimedJob
+from app.db import SessionLocal
+from app.utils.summary_agent import agenerate_summary
+from app.utils.summary_cache import summary_cache, summary_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def _with_session(fn, *args, **kwargs):
+    with SessionLocal() as db:
+        return fn(db, *args, **kwargs)
+
+
+class SummaryWorker:
+    """每个进程一个实例，在应用 lifespan 中启动 / 停止
+
+    - 并发上限为 concurrency，所有请求复用同一个 httpx.AsyncClient 连接池
+    - 提交任务时 notify() 立即唤醒；其他进程提交的任务靠定时轮询领取
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._client = httpx.AsyncClient(
+            timeout=settings.SUMMARY_REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=self.concurrency,
+                                max_keepalive_connections=self.concurrency))
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(self._runner,
+                             *self._tasks,
+                             return_exceptions=True)
+        await self._client.aclose()
+        self._runner = None
+
+    def notify(self):
+        """有新任务提交时唤醒 worker（可在任意线程调用）"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            free = self.concurrency - len(self._tasks)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = await run_in_threadpool(
+                        _with_session, crud.claim_summary_jobs, free,
+                        settings.SUMMARY_JOB_STALE_AFTER)
+                except Exception as e:
+                    logger.error(f"Claiming summary jobs failed: {e}")
+            for job in jobs:
+                task = asyncio.create_task(self._process(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._on_done)
+            if len(jobs) == free and free > 0:
+                # 队列里可能还有任务，继续领取直到占满并发
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),
+                                       timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        # 腾出并发名额后立即领取下一个任务
+        self._wakeup.set()
+
+    async def _process(self, job: ClaimedJob):
+        try:
+            key = summary_cache_key(job.title, job.content)
+            summary = await run_in_threadpool(_with_session, summary_cache.get,
+                                              key)
+            if summary is None:
+                summary = await agenerate_summary(self._client, job.title,
+                                                  job.content)
+                await run_in_threadpool(_with_session, summary_cache.set, key,
+                                        summary)
+            await run_in_threadpool(_with_session, crud.complete_summary_job,
+                                    job.id, job.note_id, summary)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Summary job {job.id} failed: {e}")
+            try:
+                await run_in_threadpool(_with_session, crud.fail_summary_job,
+                                        job.id,
+                                        str(e) or type(e).__name__)
+            except Exception as e:
+                # 记录失败也出错时保持 running，超时后会被重新领取
+                logger.error(f"Marking summary job {job.id} failed: {e}")
+
+
+summary_worker = SummaryWorker(concurrency=settings.SUMMARY_WORKER_CONCURRENCY,
+                               poll_interval=settings.SUMMARY_POLL_INTERVAL)
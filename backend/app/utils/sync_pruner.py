@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# @File        : sync_pruner.py
+# @Description : 定期清理增量同步中超过保留期的删除墓碑（sync_changes.deleted）
+
+# here put the import lib
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from app.config import settings
+from app.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _with_session(fn, *args, **kwargs):
+    with SessionLocal() as db:
+        return fn(db, *args, **kwargs)
+
+
+class SyncPruner:
+    """每个进程一个实例，在应用 lifespan 中启动 / 停止
+
+    多个进程同时清理时，已被其他进程锁定的用户直接跳过
+    """
+
+    def __init__(self, interval: float, retention_days: int, batch_size: int):
+        self.interval = interval
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self._runner: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        await asyncio.gather(self._runner, return_exceptions=True)
+        self._runner = None
+
+    async def _run(self):
+        while True:
+            # 先等待再清理，启动时不与其他初始化争用连接
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception as e:
+                logger.error(f"Pruning sync tombstones failed: {e}")
+
+    def run_once(self) -> int:
+        """清理全部超过保留期的墓碑，返回处理的用户数"""
+        before = datetime.now(
+            timezone.utc) - timedelta(days=self.retention_days)
+        total = 0
+        while True:
+            pruned = _with_session(crud.prune_sync_tombstones, before,
+                                   self.batch_size)
+            total += pruned
+            if pruned < self.batch_size:
+                return total
+
+
+sync_pruner = SyncPruner(interval=settings.SYNC_PRUNE_INTERVAL,
+                         retention_days=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+                         batch_size=settings.SYNC_PRUNE_BATCH_SIZE)
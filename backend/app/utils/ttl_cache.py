@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# @File        : ttl_cache.py
+# @Description : 进程内有界 LRU + TTL 缓存（线程安全）
+
+# here put the import lib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """容量有上限的 LRU 缓存，每个条目在 ttl 秒后过期
+
+    只在当前进程内生效；多 worker 部署时各进程各自缓存，
+    一致性依靠较短的 ttl 兜底。
+    maxbytes 不为空时同时按 sizeof(value) 的总和限制容量。
+    """
+
+    def __init__(self,
+                 maxsize: int = 1024,
+                 ttl: float = 60,
+                 maxbytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = len):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at, _ = item
+            if expires_at <= time.monotonic():
+                self._discard(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        with self._lock:
+            self._discard(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._data[key] = (value, expires_at, size)
+            self.nbytes += size
+            while len(self._data) > self.maxsize or (
+                    self.maxbytes is not None and self.nbytes > self.maxbytes):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.nbytes -= evicted
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._discard(key)
+        return default if item is None else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def _discard(self, key: Hashable) -> Optional[tuple]:
+        # 调用方需持有 _lock
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.nbytes -= item[2]
+        return item
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+# @File        : vector_index.py
+# @Description : 进程内按用户划分的笔记向量索引（NumPy），用于语义搜索
+#
+# - 相似度为按 IDF 加权的余弦：IDF 由索引内的文档频率实时计算，增删笔记后立即生效
+# - 笔记数少于 SEMANTIC_IVF_MIN_SIZE 时逐行矩阵乘（精确）；更多时启用 IVF：
+#   球面 k-means 聚类，查询只计算最近的 SEMANTIC_IVF_NPROBE 个簇内的笔记（近似）
+# - 每个 worker 进程各自持有索引，通过 sync_changes 追赶到用户最新版本（见 crud/note_semantic.py）
+
+# here put the import lib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.utils.embedding import EMBEDDING_DIM
+
+# k-means 训练的迭代次数和每个簇的采样行数
+IVF_TRAIN_ITERATIONS = 8
+IVF_SAMPLES_PER_LIST = 64
+# 分批计算簇分配，限制临时矩阵的大小
+IVF_ASSIGN_BATCH = 4096
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class UserVectorIndex:
+    """单个用户的向量索引；读写都需在持有 lock 时进行"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.lock = threading.Lock()
+        # 已同步到的用户版本号（user_stats.version），None 表示尚未加载
+        self.seq: Optional[int] = None
+        self.dim = dim
+        self.reset()
+
+    def reset(self):
+        self.size = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self.df = np.zeros(self.dim, dtype=np.float64)
+        self._rows: Dict[int, int] = {}
+        self._norms: Optional[np.ndarray] = None
+        # IVF：簇中心和每行所属的簇；训练时的行数用于判断是否需要重新训练
+        self._centroids: Optional[np.ndarray] = None
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def uses_ivf(self) -> bool:
+        return self._centroids is not None
+
+    def _reserve(self, capacity: int):
+        if capacity <= len(self.ids):
+            return
+        capacity = max(capacity, 2 * len(self.ids), 64)
+        ids = np.zeros(capacity, dtype=np.int64)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        lists = np.zeros(capacity, dtype=np.int32)
+        ids[:self.size] = self.ids[:self.size]
+        vectors[:self.size] = self.vectors[:self.size]
+        lists[:self.size] = self._lists[:self.size]
+        self.ids, self.vectors, self._lists = ids, vectors, lists
+
+    def upsert(self, ids: List[int], vectors: np.ndarray):
+        """新增或替换笔记向量"""
+        if not ids:
+            return
+        self._reserve(self.size + len(ids))
+        rows = []
+        for note_id, vector in zip(ids, vectors):
+            row = self._rows.get(note_id)
+            if row is None:
+                row = self._rows[note_id] = self.size
+                self.ids[row] = note_id
+                self.size += 1
+            else:
+                self.df -= self.vectors[row] != 0
+            self.vectors[row] = vector
+            self.df += vector != 0
+            rows.append(row)
+        if self._centroids is not None:
+            self._lists[rows] = self._assign(self.vectors[rows])
+        self._changed()
+
+    def remove(self, ids: Iterable[int]):
+        """删除笔记向量：用最后一行填补空位，保持数组连续"""
+        for note_id in ids:
+            row = self._rows.pop(note_id, None)
+            if row is None:
+                continue
+            self.df -= self.vectors[row] != 0
+            last = self.size - 1
+            if row != last:
+                moved = int(self.ids[last])
+                self.ids[row] = moved
+                self.vectors[row] = self.vectors[last]
+                self._lists[row] = self._lists[last]
+                self._rows[moved] = row
+            self.size = last
+        self._changed()
+
+    def _changed(self):
+        # 文档频率变化后加权范数全部失效；行数变化较大时重新训练或停用 IVF
+        self._norms = None
+        if self.size < settings.SEMANTIC_IVF_MIN_SIZE:
+            self._centroids = None
+        elif (self._centroids is None or self.size > 2 * self._trained_size
+              or self.size < self._trained_size // 2):
+            self._train()
+
+    def _idf_weights(self) -> np.ndarray:
+        # 平滑 IDF 的平方：对两个向量同时加权后再做点积
+        idf = np.log((1 + self.size) / (1 + self.df)) + 1
+        return (idf * idf).astype(np.float32)
+
+    def _train(self):
+        vectors = _normalize(self.vectors[:self.size])
+        nlist = max(int(np.sqrt(self.size)), 1)
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(self.size,
+                                    min(self.size,
+                                        nlist * IVF_SAMPLES_PER_LIST),
+                                    replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(nlist):
+                members = sample[labels == i]
+                if len(members):
+                    centroids[i] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+        self._centroids = centroids
+        self._trained_size = self.size
+        self._lists[:self.size] = self._assign(self.vectors[:self.size])
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        labels = [
+            np.argmax(_normalize(vectors[start:start + IVF_ASSIGN_BATCH])
+                      @ self._centroids.T,
+                      axis=1)
+            for start in range(0, len(vectors), IVF_ASSIGN_BATCH)
+        ]
+        return np.concatenate(labels) if labels else np.zeros(0, np.int32)
+
+    def _candidate_rows(self, query: np.ndarray,
+                        k: int) -> Optional[np.ndarray]:
+        """IVF 启用时返回最近几个簇内的行号，否则返回 None（全量计算）"""
+        if self._centroids is None:
+            return None
+        nprobe = min(settings.SEMANTIC_IVF_NPROBE, len(self._centroids))
+        probes = np.argsort(self._centroids @ _normalize(query))[-nprobe:]
+        rows = np.nonzero(np.isin(self._lists[:self.size], probes))[0]
+        # 候选太少时退回全量，保证能返回足够的结果
+        return rows if len(rows) >= k else None
+
+    def _weighted(self, query: np.ndarray) -> Tuple[np.ndarray, float]:
+        """返回 IDF 加权后的查询向量及其范数，并按需重算各行的加权范数"""
+        weights = self._idf_weights()
+        if self._norms is None:
+            vectors = self.vectors[:self.size]
+            self._norms = np.sqrt((vectors * vectors) @ weights)
+        return weights * query, float(np.sqrt((query * query) @ weights))
+
+    def vector(self, note_id: int) -> Optional[np.ndarray]:
+        row = self._rows.get(note_id)
+        return None if row is None else self.vectors[row].copy()
+
+    def similarity(self, query: np.ndarray,
+                   note_ids: List[int]) -> List[float]:
+        """查询向量与指定笔记的相似度，不在索引中的笔记为 0"""
+        rows = [self._rows.get(note_id) for note_id in note_ids]
+        present = [row for row in rows if row is not None]
+        if not present or not query.any():
+            return [0.0] * len(note_ids)
+        weighted, query_norm = self._weighted(query)
+        scores = (self.vectors[present] @ weighted) / np.maximum(
+            self._norms[present] * query_norm, 1e-12)
+        found = dict(zip(present, scores.tolist()))
+        return [found.get(row, 0.0) for row in rows]
+
+    def search(self,
+               query: np.ndarray,
+               k: int,
+               min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """返回相似度最高的 k 个 (笔记 id, 分数)，分数低于 min_score 的不返回"""
+        if self.size == 0 or k <= 0 or not query.any():
+            return []
+        weighted, query_norm = self._weighted(query)
+        vectors = self.vectors[:self.size]
+        rows = self._candidate_rows(query, k)
+        if rows is None:
+            scores = vectors @ weighted
+            norms = self._norms
+        else:
+            scores = vectors[rows] @ weighted
+            norms = self._norms[rows]
+        scores = scores / np.maximum(norms * query_norm, 1e-12)
+
+        top = np.argpartition(-scores, k -
+                              1)[:k] if k < len(scores) else (np.arange(
+                                  len(scores)))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if rows is not None:
+            hits = zip(rows[top], scores[top])
+        else:
+            hits = zip(top, scores[top])
+        return [(int(self.ids[row]), float(score)) for row, score in hits
+                if score >= min_score]
+
+
+class VectorIndexRegistry:
+    """按用户缓存索引，超过 max_users 时淘汰最久未使用的用户"""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[int, UserVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> UserVectorIndex:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = self._indexes[user_id] = UserVectorIndex()
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+            return index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            indexes = list(self._indexes.values())
+        return {
+            "users": len(indexes),
+            "vectors": sum(len(index) for index in indexes),
+            "ivf_users": sum(index.uses_ivf for index in indexes),
+        }
+
+
+vector_index = VectorIndexRegistry(settings.SEMANTIC_INDEX_MAX_USERS)
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+# @File        : run.py
+# @Description : REST 接口压测：播种数据 -> 并发请求热点接口 -> 输出 JSON 报告
+#
+# 用法（在 backend 目录下，需已执行 alembic upgrade head）：
+#   python -m benchmarks.run --users 10 --notes 500 --requests 1000 \
+#       --concurrency 32 --output bench.json
+#   DB_STACK=async python -m benchmarks.run ...   # 对比异步数据库栈
+#
+# 默认在本进程内用 uvicorn 启动应用（独立线程），这样可以统计每个请求的
+# SQL 语句数；传 --base-url 则压测外部已启动的服务，此时不统计语句数。
+# 摘要接口用到的 LLM 由 tests.llm_stub 替代，不会访问 DeepSeek。
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+from sqlalchemy import event
+
+from app.config import settings
+from app.db import async_engine, engine
+from benchmarks.seed import BenchUser, cleanup_dataset, seed_dataset
+from tests.llm_stub import LLMStub
+
+SEARCH_TERMS = ("planner", "index vector", "cache latency", "knowledge",
+                "summary search", "postgres")
+
+# 场景名 -> 根据 (用户, 随机数) 生成 (method, path, json)
+Scenario = Callable[[BenchUser, random.Random], Tuple[str, str,
+                                                      Optional[dict]]]
+SCENARIOS: Dict[str, Scenario] = {
+    "notes_list":
+    lambda u, r: ("GET", "/api/notes?limit=20", None),
+    "notes_list_by_tag":
+    lambda u, r:
+    ("GET", f"/api/notes?limit=20&tag_id_list={r.choice(u.tag_ids)}", None),
+    "notes_search":
+    lambda u, r: ("GET", f"/api/notes/search?q={r.choice(SEARCH_TERMS)}"
+                  "&limit=20", None),
+    "favorites_list":
+    lambda u, r: ("GET", "/api/favorites?limit=20", None),
+    "tags_list":
+    lambda u, r: ("GET", "/api/tags", None),
+    "notes_create":
+    lambda u, r: ("POST", "/api/notes", {
+        "title": "bench note",
+        "content": "benchmark body",
+        "tags": r.sample(u.tag_ids, min(2, len(u.tag_ids)))
+    }),
+}
+
+
+class QueryCounter:
+    """统计应用执行的 SQL 语句数（忽略后台摘要 worker 的轮询；关联笔记 worker 在 main 中关闭）"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self.target = (async_engine.sync_engine
+                       if async_engine is not None else engine)
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        if "summary_jobs" not in statement:
+            with self._lock:
+                self.count += 1
+
+    def __enter__(self):
+        event.listen(self.target, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.target, "before_cursor_execute", self._on_execute)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    # 最近秩法，样本少时也不会越界
+    if not sorted_values:
+        return 0.0
+    index = max(
+        0,
+        min(len(sorted_values) - 1,
+            round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, users: List[BenchUser],
+                       scenario: Scenario, requests: int, concurrency: int,
+                       rnd: random.Random):
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            user = rnd.choice(users)
+            method, path, body = scenario(user, rnd)
+            start = time.perf_counter()
+            try:
+                resp = await client.request(
+                    method,
+                    path,
+                    json=body,
+                    headers={"Authorization": f"Bearer {user.token}"})
+                ok = resp.status_code == 200 and resp.json().get("code") == 0
+            except httpx.HTTPError:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float,
+              queries: Optional[int]):
+    values = sorted(latencies)
+    return {
+        "requests":
+        len(values),
+        "errors":
+        errors,
+        "duration_s":
+        round(elapsed, 3),
+        "throughput_rps":
+        round(len(values) / elapsed, 1) if elapsed else 0,
+        "latency_ms": {
+            "p50": round(percentile(values, 50), 2),
+            "p95": round(percentile(values, 95), 2),
+            "p99": round(percentile(values, 99), 2),
+            "mean": round(statistics.fmean(values), 2) if values else 0,
+            "max": round(values[-1], 2) if values else 0,
+        },
+        "queries_per_request":
+        round(queries /
+              len(values), 2) if queries is not None and values else None,
+    }
+
+
+def start_server() -> Tuple[uvicorn.Server, threading.Thread, str]:
+    """在独立线程中启动 uvicorn，返回 (server, thread, base_url)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config("app.main:app",
+                       host="127.0.0.1",
+                       port=port,
+                       log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def bench(args, users: List[BenchUser], base_url: str,
+                count_queries: bool):
+    rnd = random.Random(args.seed)
+    names = args.scenario or list(SCENARIOS)
+    limits = httpx.Limits(max_connections=args.concurrency,
+                          max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url,
+                                 limits=limits,
+                                 timeout=args.timeout) as client:
+        for name in names:
+            scenario = SCENARIOS[name]
+            # 预热：填充连接池、认证缓存等，不计入结果
+            await run_scenario(client, users, scenario, args.warmup,
+                               args.concurrency, rnd)
+            counter = QueryCounter() if count_queries else None
+            if counter:
+                with counter:
+                    latencies, errors, elapsed = await run_scenario(
+                        client, users, scenario, args.requests,
+                        args.concurrency, rnd)
+            else:
+                latencies, errors, elapsed = await run_scenario(
+                    client, users, scenario, args.requests, args.concurrency,
+                    rnd)
+            results[name] = summarize(latencies, errors, elapsed,
+                                      counter.count if counter else None)
+            print(
+                f"{name}: {results[name]['throughput_rps']} req/s, "
+                f"p95 {results[name]['latency_ms']['p95']} ms",
+                file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="REST 接口压测")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--notes", type=int, default=500, help="每个用户的笔记数")
+    parser.add_argument("--tags", type=int, default=20, help="每个用户的标签数")
+    parser.add_argument("--favorite-ratio", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=500, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenario",
+                        action="append",
+                        choices=list(SCENARIOS),
+                        help="只运行指定场景，可重复")
+    parser.add_argument("--base-url", help="压测外部服务（需连接同一个数据库）")
+    parser.add_argument("--keep-data", action="store_true", help="结束后保留种子数据")
+    parser.add_argument("--output", help="JSON 报告写入的文件，默认输出到 stdout")
+    args = parser.parse_args()
+
+    # LLM 打桩，并关闭后台摘要 / 关联笔记 worker，避免干扰计时和语句统计
+    stub = LLMStub().start()
+    settings.DEEPSEEK_API_URL = stub.url
+    settings.SUMMARY_WORKER_ENABLED = False
+    settings.RELATED_WORKER_ENABLED = False
+
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    started = time.perf_counter()
+    users = seed_dataset(prefix, args.users, args.notes, args.tags,
+                         args.favorite_ratio, args.seed)
+    print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+
+    server = None
+    try:
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            server, thread, base_url = start_server()
+        results = asyncio.run(
+            bench(args, users, base_url, count_queries=server is not None))
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+        stub.stop()
+        if not args.keep_data:
+            cleanup_dataset(prefix)
+
+    report = json.dumps(
+        {
+            "config": {
+                "db_stack": settings.DB_STACK,
+                "base_url": args.base_url,
+                "users": args.users,
+                "notes_per_user": args.notes,
+                "tags_per_user": args.tags,
+                "favorite_ratio": args.favorite_ratio,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+            },
+            "results": results,
+        },
+        indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
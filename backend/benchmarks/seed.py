@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# @File        : seed.py
+# @Description : 为压测批量生成用户 / 笔记 / 标签 / 收藏数据
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import delete, insert, select
+
+from app import models
+from app.auth import create_access_token
+from app.db import SessionLocal, engine
+from app.models.note_tags import note_tags
+
+WORDS = ("alpha beta gamma delta epsilon zeta theta lambda sigma omega "
+         "postgres index vector planner cache tuple buffer latency "
+         "throughput knowledge summary search").split()
+
+
+@dataclass
+class BenchUser:
+    id: int
+    token: str
+    tag_ids: List[int] = field(default_factory=list)
+
+
+def seed_dataset(prefix: str,
+                 users: int,
+                 notes: int,
+                 tags: int,
+                 favorite_ratio: float,
+                 seed: int = 42) -> List[BenchUser]:
+    """按固定随机种子批量写入数据，notes / tags 均为每个用户的数量"""
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    result = []
+    with SessionLocal() as db:
+        for u in range(users):
+            user_id = db.scalar(
+                insert(models.User).returning(models.User.id).values(
+                    username=f"{prefix}-{u}",
+                    email=f"{prefix}-{u}@example.com",
+                    hashed_password="!"))  # 不走登录接口，直接签发 token
+            tag_ids = db.scalars(
+                insert(models.Tag).returning(models.Tag.id),
+                [{
+                    "user_id": user_id,
+                    "name": f"{prefix}-{u}-{i}"
+                } for i in range(tags)]).all()
+            note_ids = db.scalars(
+                insert(models.Note).returning(models.Note.id),
+                [{
+                    "user_id": user_id,
+                    "title": " ".join(rnd.choices(WORDS, k=4)),
+                    "content": " ".join(rnd.choices(WORDS, k=120)),
+                    "updated_at": now - timedelta(minutes=i),
+                } for i in range(notes)]).all()
+            if tag_ids and note_ids:
+                db.execute(insert(note_tags),
+                           [{
+                               "note_id": note_id,
+                               "tag_id": tag_id
+                           } for note_id in note_ids
+                            for tag_id in rnd.sample(tag_ids, min(2, tags))])
+            favorites = rnd.sample(note_ids,
+                                   int(len(note_ids) * favorite_ratio))
+            if favorites:
+                db.execute(insert(models.Favorite), [{
+                    "user_id": user_id,
+                    "note_id": note_id
+                } for note_id in favorites])
+            db.commit()
+            result.append(
+                BenchUser(
+                    id=user_id,
+                    token=create_access_token(data={"sub": str(user_id)}),
+                    tag_ids=list(tag_ids)))
+
+    # 让规划器拿到新数据的统计信息
+    with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT") as conn:
+        for table in ("notes", "note_tags", "favorites", "tags"):
+            conn.exec_driver_sql(f"ANALYZE {table}")
+    return result
+
+
+def cleanup_dataset(prefix: str):
+    """删除某次压测写入的全部数据（notes 没有级联删除，需按依赖顺序清理）"""
+    with SessionLocal() as db:
+        user_ids = select(models.User.id).where(
+            models.User.email.like(f"{prefix}-%@example.com"))
+        note_ids = select(models.Note.id).where(
+            models.Note.user_id.in_(user_ids))
+        db.execute(delete(note_tags).where(note_tags.c.note_id.in_(note_ids)))
+        db.execute(
+            delete(models.Favorite).where(
+                models.Favorite.user_id.in_(user_ids)))
+        db.execute(
+            delete(models.SummaryJob).where(
+                models.SummaryJob.user_id.in_(user_ids)))
+        db.execute(delete(models.Note).where(models.Note.id.in_(note_ids)))
+        db.execute(delete(models.Tag).where(models.Tag.user_id.in_(user_ids)))
+        db.execute(delete(models.User).where(models.User.id.in_(user_ids)))
+        db.commit()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# @File        : gunicorn.conf.py
+# @Description : 生产环境进程配置：gunicorn master + 多个 uvicorn worker
+#
+# 启动：gunicorn -c gunicorn.conf.py app.main:app
+# 平滑重启：kill -HUP <master pid>，逐个替换 worker，处理中的请求在
+#   SERVER_GRACEFUL_TIMEOUT 内完成；SERVER_PRELOAD=true 时应用代码在 master
+#   中加载，HUP 不会重新导入代码，发布新版本需重启 master（或 USR2 + WINCH）
+
+# here put the import lib
+import glob
+import multiprocessing
+import os
+
+from app.config import settings
+
+bind = settings.SERVER_BIND
+# uvicorn worker 是异步的，每个核一个进程即可
+workers = settings.SERVER_WORKERS or multiprocessing.cpu_count()
+worker_class = "app.server.UvicornWorker"
+preload_app = settings.SERVER_PRELOAD
+timeout = settings.SERVER_TIMEOUT
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+keepalive = settings.SERVER_KEEPALIVE
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS // 10
+accesslog = "-"
+errorlog = "-"
+
+# 多进程指标目录：必须在预加载应用（导入 prometheus_client）之前准备好，
+# 所以放在配置文件顶层而不是 on_starting 钩子里；清掉上次运行残留的文件，
+# 否则计数会从旧值累加
+_metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if _metrics_dir:
+    os.makedirs(_metrics_dir, exist_ok=True)
+    for _path in glob.glob(os.path.join(_metrics_dir, "*.db")):
+        os.remove(_path)
+
+
+def post_fork(server, worker):
+    # 预加载时引擎在 master 中创建，连接池必须在每个 worker 里重新建立
+    from app.db import reset_pools_after_fork
+    reset_pools_after_fork()
+
+
+def child_exit(server, worker):
+    # worker 退出后，它的 livesum 类 gauge（处理中请求数、连接池）不再计入
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# @File        : explain_queries.py
+# @Description : 在种子数据上对每个 CRUD 查询执行 EXPLAIN ANALYZE 并输出执行计划
+#
+# 用法（在 backend 目录下）：
+#   python -m scripts.explain_queries --notes 5000 --tags 50
+#   python -m scripts.explain_queries --only list_notes --only search_fts
+#
+# 写操作在外层事务中执行，结束后整体回滚，不会改动种子数据
+
+import argparse
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.db import SessionLocal, engine
+from app.models.note_tags import note_tags
+from app.schemas import NoteCreate, NoteUpdate
+
+SEED_EMAIL = "explain@example.com"
+WORDS = ("alpha beta gamma delta epsilon zeta theta lambda sigma omega "
+         "postgres index vector planner cache tuple buffer").split()
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+def seed(db: Session, notes: int, tags: int, seed_value: int) -> int:
+    """按固定随机种子生成一个用户的数据，已存在则直接复用"""
+    user = crud.get_user_by_email(db, SEED_EMAIL)
+    if user:
+        return user.id
+
+    rnd = random.Random(seed_value)
+    user = models.User(username="explain",
+                       email=SEED_EMAIL,
+                       hashed_password="!")
+    db.add(user)
+    db.flush()
+
+    tag_ids = db.scalars(
+        insert(models.Tag).returning(models.Tag.id),
+        [{
+            "user_id": user.id,
+            "name": f"explain-{user.id}-{i}"
+        } for i in range(tags)]).all()
+
+    now = datetime.now(timezone.utc)
+    note_ids = db.scalars(
+        insert(models.Note).returning(models.Note.id),
+        [{
+            "user_id": user.id,
+            "title": " ".join(rnd.choices(WORDS, k=4)),
+            "content": " ".join(rnd.choices(WORDS, k=80)),
+            "updated_at": now - timedelta(minutes=i),
+        } for i in range(notes)]).all()
+
+    db.execute(insert(note_tags), [{
+        "note_id": note_id,
+        "tag_id": tag_id
+    } for note_id in note_ids for tag_id in rnd.sample(tag_ids, 2)])
+    db.execute(insert(models.Favorite), [{
+        "user_id": user.id,
+        "note_id": note_id
+    } for note_id in note_ids[::5]])
+    db.commit()
+
+    # 让规划器拿到新数据的统计信息
+    with engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT") as conn:
+        for table in ("notes", "note_tags", "favorites", "tags"):
+            conn.exec_driver_sql(f"ANALYZE {table}")
+    return user.id
+
+
+@contextmanager
+def explain_each(conn):
+    """在每条语句真正执行前，用保存点包住一次 EXPLAIN ANALYZE 并回滚"""
+    plans = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        if executemany or not statement.lstrip().upper().startswith(
+                EXPLAINABLE):
+            return
+        cursor.execute("SAVEPOINT explain_probe")
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        cursor.execute("ROLLBACK TO SAVEPOINT explain_probe")
+        plans.append((statement, plan))
+
+    event.listen(conn, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield plans
+    finally:
+        event.remove(conn, "before_cursor_execute", before_cursor_execute)
+
+
+def build_cases(db: Session, user_id: int):
+    note_id = db.query(
+        models.Note.id).filter(models.Note.user_id == user_id).order_by(
+            models.Note.updated_at.desc()).limit(1).scalar()
+    tag_ids = [t.id for t in crud.get_tags(db, user_id)[:3]]
+    first_page = crud.list_notes_with_favorites(db, user_id, limit=20)
+    page_ids = [n.id for n in first_page["notes"]]
+    new_note = NoteCreate(title="explain new",
+                          content="explain body",
+                          tags=tag_ids[:2])
+
+    def create_and_delete(db):
+        note = crud.create_note(db, user_id, new_note)
+        crud.update_note(db, note.id, user_id,
+                         NoteUpdate(title="explain updated", tags=tag_ids))
+        crud.delete_note(db, note.id, user_id)
+
+    # (名称, 调用) —— 每个调用拿到的是绑定在外层事务上的 Session
+    return [
+        ("list_notes", lambda db: crud.list_notes_with_favorites(
+            db, user_id, limit=20, include_total=True)),
+        ("list_notes_cursor", lambda db: crud.list_notes_with_favorites(
+            db, user_id, limit=20, cursor=first_page["next_cursor"])),
+        ("notes_by_tags",
+         lambda db: crud.get_notes_by_tags(db, user_id, tag_ids[:2], limit=20)
+         ),
+        ("search_fts",
+         lambda db: crud.search_notes(db, user_id, "planner index", 0, 20)),
+        ("search_like",
+         lambda db: crud.search_notes(db, user_id, "ta", 0, 20, mode="like")),
+        ("get_note", lambda db: crud.get_note(db, note_id, user_id)),
+        ("list_favorites", lambda db: crud.get_user_favorite_notes(
+            db, user_id, limit=20, include_total=True)),
+        ("favorite_status",
+         lambda db: crud.is_note_favorited(db, user_id, note_id)),
+        ("list_tags", lambda db: crud.get_tags(db, user_id)),
+        ("create_update_delete_note", create_and_delete),
+        ("toggle_favorite", lambda db:
+         (crud.add_favorite(db, user_id, page_ids[1]),
+          crud.remove_favorite(db, user_id, page_ids[1]))),
+        ("bulk_attach_tags",
+         lambda db: crud.bulk_add_tags_to_notes(db, user_id, page_ids, tag_ids)
+         ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="对每个 CRUD 查询输出 EXPLAIN ANALYZE 执行计划")
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", action="append", help="只输出指定名称的查询，可重复")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        user_id = seed(db, args.notes, args.tags, args.seed)
+        cases = build_cases(db, user_id)
+
+    for name, run in cases:
+        if args.only and name not in args.only:
+            continue
+        with engine.connect() as conn:
+            outer = conn.begin()
+            db = Session(bind=conn, join_transaction_mode="create_savepoint")
+            try:
+                with explain_each(conn) as plans:
+                    run(db)
+            finally:
+                db.close()
+                outer.rollback()
+
+        print(f"=== {name} ({len(plans)} statements) ===")
+        for statement, plan in plans:
+            print(statement.strip())
+            print(plan)
+            print()
+
+
+if __name__ == "__main__":
+    main()
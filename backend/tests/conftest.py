@@ -1,7 +1,17 @@
+import uuid
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
 from fastapi.testclient import TestClient
 
+from app.config import settings
+from app.db import async_engine, engine
 from app.main import app
+from tests.llm_stub import LLMStub
+
+# 关联笔记在用例中显式计算；关闭后台 worker，避免它的语句混入 count_queries
+settings.RELATED_WORKER_ENABLED = False
 
 
 @pytest.fixture(scope="module")
@@ -25,3 +35,78 @@ def test_user(client):
                        })
     token = resp.json()["data"]["access_token"]
     return {"token": token, "user": user_data}
+
+
+@pytest.fixture
+def make_user(client):
+    """注册并登录一个独立用户，返回 {"headers", "id"}
+
+    用于向量索引、变更记录等会受其他用例数据影响的测试
+    """
+
+    def make(prefix: str = "user"):
+        suffix = uuid.uuid4().hex[:8]
+        user = {
+            "username": f"{prefix}{suffix}",
+            "email": f"{prefix}{suffix}@example.com",
+            "password": "testpass"
+        }
+        client.post("/api/users/register", json=user)
+        token = client.post("/api/users/login",
+                            json={
+                                "email": user["email"],
+                                "password": user["password"]
+                            }).json()["data"]["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        user_id = client.get("/api/users/me",
+                             headers=headers).json()["data"]["id"]
+        return {"headers": headers, "id": user_id}
+
+    return make
+
+
+@pytest.fixture
+def create_note(client):
+    """创建笔记并返回 id"""
+
+    def create(headers, title, content, tags=()):
+        return client.post("/api/notes",
+                           json={
+                               "title": title,
+                               "content": content,
+                               "tags": list(tags)
+                           },
+                           headers=headers).json()["data"]["id"]
+
+    return create
+
+
+@pytest.fixture
+def llm_stub(monkeypatch):
+    stub = LLMStub().start()
+    monkeypatch.setattr(settings, "DEEPSEEK_API_URL", stub.url)
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def count_queries():
+    """统计代码块内执行的 SQL 语句（忽略后台摘要 worker 的轮询）"""
+    target = async_engine.sync_engine if async_engine is not None else engine
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if "summary_jobs" not in statement:
+                statements.append(statement)
+
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(target, "before_cursor_execute",
+                         before_cursor_execute)
+
+    return counter
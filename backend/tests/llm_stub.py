@@ -0,0 +1,75 @@
+"""本地 LLM 桩服务：模拟 DeepSeek chat/completions 接口，供测试和压测使用
+
+独立运行：python -m tests.llm_stub --port 9100 --delay 0.5
+然后设置 DEEPSEEK_API_URL=http://127.0.0.1:9100/v1/chat/completions
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LLMStub:
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 delay: float = 0):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                stub.calls += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if stub.fail:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                prompt = json.loads(body)["messages"][-1]["content"]
+                title = re.search(r"笔记标题：(.*)", prompt).group(1)
+                payload = json.dumps({
+                    "choices": [{
+                        "message": {
+                            "content": f"摘要：{title}"
+                        }
+                    }]
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = (f"http://{host}:{self.server.server_port}"
+                    "/v1/chat/completions")
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--delay", type=float, default=0)
+    args = parser.parse_args()
+    stub = LLMStub(args.host, args.port, args.delay)
+    print(f"LLM stub listening on {stub.url}")
+    stub.server.serve_forever()
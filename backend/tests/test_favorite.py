@@ -31,3 +31,32 @@ def test_get_user_favorite_notes(client, test_user):
     resp = client.get("/api/favorites", headers=headers)
     assert resp.status_code == 200
     assert "data" in resp.json()
+    # 分页参数与笔记列表相同的范围校验
+    for params in ({"limit": -1}, {"limit": 0}, {"limit": 101}, {"skip": -1}):
+        resp = client.get("/api/favorites", params=params, headers=headers)
+        assert resp.status_code == 422
+
+
+def test_favorite_notes_cursor_pagination(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    note_ids = []
+    for i in range(3):
+        resp = client.post("/api/notes",
+                           json={
+                               "title": f"FavCursor {i}",
+                               "content": "FavContent"
+                           },
+                           headers=headers)
+        note_id = resp.json()["data"]["id"]
+        client.post(f"/api/favorites/{note_id}", headers=headers)
+        note_ids.append(note_id)
+
+    # 收藏时间降序：最后收藏的在最前
+    body = client.get("/api/favorites?limit=2", headers=headers).json()
+    assert [n["id"] for n in body["data"]] == note_ids[:0:-1]
+    body = client.get(f"/api/favorites?limit=2&cursor={body['next_cursor']}",
+                      headers=headers).json()
+    assert body["data"][0]["id"] == note_ids[0]
+
+    for note_id in note_ids:
+        client.delete(f"/api/favorites/{note_id}", headers=headers)
@@ -0,0 +1,7 @@
+def test_health_reports_pool_status(client):
+    resp = client.get("/api/health")
+    assert resp.status_code == 200
+    assert resp.json()["code"] == 0
+    pool = resp.json()["data"]["db_pool"]
+    assert "checkouts" in pool
+    assert "wait_seconds_max" in pool
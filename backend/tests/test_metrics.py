@@ -0,0 +1,74 @@
+import uuid
+
+from prometheus_client import REGISTRY
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_request_latency_by_route_template(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    note_id = client.post("/api/notes",
+                          json={
+                              "title": "metrics note",
+                              "content": "metrics body"
+                          },
+                          headers=headers).json()["data"]["id"]
+    labels = {"method": "GET", "route": "/api/notes/{note_id}"}
+    before = sample("http_request_duration_seconds_count",
+                    status="200",
+                    **labels)
+    db_before = sample("http_request_db_statements_sum", route=labels["route"])
+    client.get(f"/api/notes/{note_id}", headers=headers)
+    # 按路由模板聚合，不会按具体 id 产生新的标签
+    assert sample("http_request_duration_seconds_count",
+                  status="200",
+                  **labels) == before + 1
+    assert sample("http_request_db_statements_sum",
+                  route=labels["route"]) > db_before
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'db_pool_connections{state="checked_out"}' in resp.text
+    assert f"/api/notes/{note_id}" not in resp.text
+    client.delete(f"/api/notes/{note_id}", headers=headers)
+
+
+def test_unmatched_routes_share_one_label(client):
+    before = sample("http_request_duration_seconds_count",
+                    method="GET",
+                    route="<unmatched>",
+                    status="404")
+    client.get(f"/no-such-path-{uuid.uuid4().hex}")
+    assert sample("http_request_duration_seconds_count",
+                  method="GET",
+                  route="<unmatched>",
+                  status="404") == before + 1
+
+
+def test_deepseek_latency_and_errors(client, llm_stub):
+    body = {"title": f"Metrics {uuid.uuid4().hex[:8]}", "content": "text"}
+    ok_before = sample("deepseek_request_duration_seconds_count", outcome="ok")
+    client.post("/api/notes/generate_summary", json=body)
+    assert sample("deepseek_request_duration_seconds_count",
+                  outcome="ok") == ok_before + 1
+
+    llm_stub.fail = True
+    err_before = sample("deepseek_request_errors_total", reason="http_500")
+    body["content"] = "failing text"
+    client.post("/api/notes/generate_summary", json=body)
+    assert sample("deepseek_request_errors_total",
+                  reason="http_500") == err_before + 1
+
+
+def test_password_hash_duration(client, test_user):
+    before = sample("password_hash_duration_seconds_count", operation="verify")
+    client.post("/api/users/login",
+                json={
+                    "email": test_user["user"]["email"],
+                    "password": test_user["user"]["password"]
+                })
+    assert sample("password_hash_duration_seconds_count",
+                  operation="verify") == before + 1
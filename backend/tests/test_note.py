@@ -1,3 +1,22 @@
+import asyncio
+import io
+import json
+import tempfile
+import uuid
+import zipfile
+
+from sqlalchemy import delete, select
+
+from app import crud, models
+from app.api.note import _export_body, _import_events
+from app.config import settings
+from app.db import SessionLocal, engine
+from app.models.note_tags import note_tags
+from app.schemas import NoteOut
+from app.utils.note_archive import encode_ndjson, iter_ndjson_records
+from app.utils.related_worker import related_worker
+
+
 def test_create_note(client, test_user):
     headers = {"Authorization": f"Bearer {test_user['token']}"}
     resp = client.post("/api/notes",
@@ -57,3 +76,517 @@ def test_search_notes(client, test_user):
     resp = client.get("/api/notes/search?q=Test", headers=headers)
     assert resp.status_code == 200
     assert resp.json()["code"] == 0
+
+
+def test_search_notes_fulltext_ranking(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    word = f"zephyr{uuid.uuid4().hex[:8]}"
+    # 关键词出现次数更多的笔记应排在前面
+    client.post("/api/notes",
+                json={
+                    "title": "Weak match",
+                    "content": f"mentions {word} once among other words"
+                },
+                headers=headers)
+    resp = client.post("/api/notes",
+                       json={
+                           "title": f"{word} guide",
+                           "content": f"{word} {word} appears everywhere"
+                       },
+                       headers=headers)
+    best_id = resp.json()["data"]["id"]
+
+    resp = client.get(f"/api/notes/search?q={word}", headers=headers)
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert len(data) == 2
+    assert data[0]["id"] == best_id
+    assert "<mark>" in data[0]["headline"]
+
+
+def test_search_notes_short_query_fallback(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    client.post("/api/notes",
+                json={
+                    "title": "Short query",
+                    "content": "contains qz inside"
+                },
+                headers=headers)
+    # 过短的关键词走 ILIKE 模糊匹配，不返回高亮片段
+    resp = client.get("/api/notes/search?q=qz", headers=headers)
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert any(n["title"] == "Short query" for n in data)
+    assert all(n.get("headline") is None for n in data)
+
+
+def test_list_notes_cursor_pagination(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    resp = client.post("/api/tags",
+                       json={"name": f"Cursor-{uuid.uuid4().hex[:8]}"},
+                       headers=headers)
+    tag_id = resp.json()["data"]["id"]
+    created = []
+    for i in range(5):
+        resp = client.post("/api/notes",
+                           json={
+                               "title": f"Cursor note {i}",
+                               "content": "paging",
+                               "tags": [tag_id]
+                           },
+                           headers=headers)
+        created.append(resp.json()["data"]["id"])
+
+    # 按标签过滤 + 游标分页，逐页遍历不重复不遗漏
+    seen, cursor = [], None
+    for _ in range(5):
+        url = f"/api/notes?tag_id_list={tag_id}&limit=2"
+        if cursor:
+            url += f"&cursor={cursor}"
+        body = client.get(url, headers=headers).json()
+        assert body["code"] == 0
+        assert body["total"] == 5
+        seen.extend(n["id"] for n in body["data"])
+        cursor = body.get("next_cursor")
+        if not cursor:
+            break
+    assert seen == list(reversed(created))
+
+    # 不带标签的列表同样返回 next_cursor
+    body = client.get("/api/notes?limit=1", headers=headers).json()
+    assert body["next_cursor"]
+    body = client.get(f"/api/notes?limit=1&cursor={body['next_cursor']}",
+                      headers=headers).json()
+    assert body["code"] == 0
+    assert body["data"][0]["id"] == created[-2]
+
+
+def test_list_notes_invalid_cursor(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    resp = client.get("/api/notes?cursor=not-a-cursor", headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["code"] == 2005
+
+
+def test_list_notes_total_from_counter(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    before = client.get("/api/notes?limit=1", headers=headers).json()["total"]
+    resp = client.post("/api/notes",
+                       json={
+                           "title": "Counted",
+                           "content": "counter"
+                       },
+                       headers=headers)
+    note_id = resp.json()["data"]["id"]
+    assert client.get("/api/notes?limit=1",
+                      headers=headers).json()["total"] == before + 1
+    client.delete(f"/api/notes/{note_id}", headers=headers)
+    assert client.get("/api/notes?limit=1",
+                      headers=headers).json()["total"] == before
+
+
+def test_list_notes_without_total(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    body = client.get("/api/notes?limit=1&include_total=false",
+                      headers=headers).json()
+    assert body["code"] == 0
+    assert body["total"] is None
+    assert body["has_more"] is True
+    body = client.get("/api/notes?limit=100&include_total=false",
+                      headers=headers).json()
+    assert body["has_more"] is (body["next_cursor"] is not None)
+
+
+def test_list_notes_fast_serialization(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    client.post("/api/notes",
+                json={
+                    "title": "serialize me",
+                    "content": "body"
+                },
+                headers=headers)
+    resp = client.get("/api/notes?limit=5", headers=headers)
+    assert resp.headers["content-type"] == "application/json"
+    body = resp.json()
+    assert set(body) == {
+        "code", "msg", "data", "total", "next_cursor", "has_more"
+    }
+    # 快速路径与 response_model 输出的字段一致
+    assert set(body["data"][0]) == set(NoteOut.model_fields)
+    assert isinstance(body["data"][0]["created_at"], str)
+
+
+def test_list_notes_compact_view(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    long_content = "compactview " * 100
+    note_id = client.post("/api/notes",
+                          json={
+                              "title": "compact view note",
+                              "content": long_content
+                          },
+                          headers=headers).json()["data"]["id"]
+
+    resp = client.get("/api/notes?limit=1&view=compact", headers=headers)
+    item = resp.json()["data"][0]
+    assert item["id"] == note_id
+    assert "content" not in item
+    assert item["content_preview"] == long_content[:200]
+    assert "tags" in item and "is_favorited" in item
+
+    # preview_length=0 时不截取预览
+    resp = client.get("/api/notes?limit=1&view=compact&preview_length=0",
+                      headers=headers)
+    assert resp.json()["data"][0]["content_preview"] is None
+
+    resp = client.get("/api/notes/search?q=compactview&view=compact",
+                      headers=headers)
+    item = resp.json()["data"][0]
+    assert "content" not in item and item["headline"]
+
+    resp = client.get("/api/notes?view=bogus", headers=headers)
+    assert resp.status_code == 422
+    client.delete(f"/api/notes/{note_id}", headers=headers)
+
+
+def test_conditional_get_notes(client, test_user, count_queries):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    note_id = client.post("/api/notes",
+                          json={
+                              "title": "etag note",
+                              "content": "etag body"
+                          },
+                          headers=headers).json()["data"]["id"]
+
+    for url in ("/api/notes?limit=5", f"/api/notes/{note_id}",
+                "/api/notes/search?q=etag"):
+        resp = client.get(url, headers=headers)
+        etag = resp.headers["ETag"]
+        assert etag.startswith('W/"')
+        assert resp.headers["Cache-Control"] == "private, no-cache"
+
+        # 未变化：304，且只执行版本号查询
+        with count_queries() as statements:
+            resp = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert len(statements) == 1, "\n".join(statements)
+
+    list_etag = client.get("/api/notes?limit=5",
+                           headers=headers).headers["ETag"]
+    note_etag = client.get(f"/api/notes/{note_id}",
+                           headers=headers).headers["ETag"]
+    # 不同查询参数的 ETag 不同
+    assert client.get("/api/notes?limit=6",
+                      headers=headers).headers["ETag"] != list_etag
+
+    # 收藏会改变 is_favorited，笔记及列表的 ETag 都要变化
+    client.post(f"/api/favorites/{note_id}", headers=headers)
+    resp = client.get(f"/api/notes/{note_id}",
+                      headers={
+                          **headers, "If-None-Match": note_etag
+                      })
+    assert resp.status_code == 200
+    assert resp.json()["data"]["is_favorited"] is True
+    resp = client.get("/api/notes?limit=5",
+                      headers={
+                          **headers, "If-None-Match": list_etag
+                      })
+    assert resp.status_code == 200
+
+    # 更新笔记后旧 ETag 失效
+    note_etag = client.get(f"/api/notes/{note_id}",
+                           headers=headers).headers["ETag"]
+    client.put(f"/api/notes/{note_id}",
+               json={"title": "etag note updated"},
+               headers=headers)
+    resp = client.get(f"/api/notes/{note_id}",
+                      headers={
+                          **headers, "If-None-Match": note_etag
+                      })
+    assert resp.status_code == 200
+    assert resp.json()["data"]["title"] == "etag note updated"
+    client.delete(f"/api/notes/{note_id}", headers=headers)
+
+
+def test_export_notes(client, test_user, monkeypatch):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    tag_name = f"Export-{uuid.uuid4().hex[:8]}"
+    tag_id = client.post("/api/tags", json={
+        "name": tag_name
+    }, headers=headers).json()["data"]["id"]
+    note_ids = [
+        client.post("/api/notes",
+                    json={
+                        "title": f"导出 note/{i}",
+                        "content": f"export body {i}",
+                        "tags": [tag_id]
+                    },
+                    headers=headers).json()["data"]["id"] for i in range(3)
+    ]
+    client.post(f"/api/favorites/{note_ids[0]}", headers=headers)
+    # 每块一行，验证跨块的标签加载
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_SIZE", 1)
+
+    resp = client.get("/api/notes/export", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert "attachment" in resp.headers["content-disposition"]
+    exported = {
+        note["id"]: note
+        for note in map(json.loads, resp.text.splitlines())
+    }
+    assert set(note_ids) <= set(exported)
+    assert exported[note_ids[0]]["tags"] == [tag_name]
+    assert exported[note_ids[0]]["is_favorited"] is True
+    assert exported[note_ids[1]]["is_favorited"] is False
+    assert exported[note_ids[2]]["content"] == "export body 2"
+
+    resp = client.get("/api/notes/export?format=markdown", headers=headers)
+    assert resp.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(resp.content))
+    assert archive.testzip() is None
+    name = next(n for n in archive.namelist()
+                if n.startswith(f"notes/{note_ids[1]}-"))
+    assert name == f"notes/{note_ids[1]}-导出-note-1.md"
+    text = archive.read(name).decode()
+    assert text.startswith("---\n")
+    assert f'tags: ["{tag_name}"]' in text
+    assert text.endswith("\n---\n\nexport body 1")
+
+    resp = client.get("/api/notes/export?format=pdf", headers=headers)
+    assert resp.status_code == 422
+    for note_id in note_ids:
+        client.delete(f"/api/notes/{note_id}", headers=headers)
+
+
+def test_export_closes_session_on_disconnect(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["data"]["id"]
+    for i in range(2):
+        client.post("/api/notes",
+                    json={
+                        "title": f"disconnect {i}",
+                        "content": "body"
+                    },
+                    headers=headers)
+
+    async def read_first_chunk():
+        body = _export_body(encode_ndjson, user_id)
+        first = await body.__anext__()
+        assert engine.pool.checkedout() == 1
+        # 客户端断开：StreamingResponse 不再迭代，响应体被关闭
+        await body.aclose()
+        return first
+
+    assert json.loads(asyncio.run(read_first_chunk()).splitlines()[0])
+    assert engine.pool.checkedout() == 0
+
+
+def test_import_notes_ndjson(client, test_user, monkeypatch):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    suffix = uuid.uuid4().hex[:8]
+    # 其他用户占用的标签名（标签名全局唯一）
+    other = {
+        "username": f"importer{suffix}",
+        "email": f"importer{suffix}@example.com",
+        "password": "testpass"
+    }
+    client.post("/api/users/register", json=other)
+    other_token = client.post("/api/users/login",
+                              json={
+                                  "email": other["email"],
+                                  "password": other["password"]
+                              }).json()["data"]["access_token"]
+    client.post("/api/tags",
+                json={"name": f"Taken-{suffix}"},
+                headers={"Authorization": f"Bearer {other_token}"})
+    existing = client.post("/api/tags",
+                           json={
+                               "name": f"Mine-{suffix}"
+                           },
+                           headers=headers).json()["data"]
+
+    lines = [
+        json.dumps({
+            "title": f"Imported {suffix} 1",
+            "content": "first",
+            "tags": [f"Mine-{suffix}", f"New-{suffix}"],
+            "is_favorited": True,
+            "created_at": "2020-01-02T03:04:05+00:00"
+        }), "{not json",
+        json.dumps({"content": "no title"}), "",
+        json.dumps({
+            "title": f"Imported {suffix} 2",
+            "content": "taken",
+            "tags": [f"Taken-{suffix}"]
+        }),
+        json.dumps({
+            "title": f"Imported {suffix} 3",
+            "content": "third",
+            "tags": [f"New-{suffix}"]
+        })
+    ]
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 3)
+    resp = client.post("/api/notes/import",
+                       content="\n".join(lines).encode(),
+                       headers=headers)
+    assert resp.status_code == 200
+    events = [json.loads(line) for line in resp.text.splitlines()]
+    errors = {e["record"]: e["error"] for e in events if e["event"] == "error"}
+    assert set(errors) == {"line 2", "line 3", "line 5"}
+    assert errors["line 2"].startswith("Invalid JSON")
+    assert errors["line 3"].startswith("title")
+    assert errors["line 5"] == f"Tag 'Taken-{suffix}' is not available"
+    assert [e["event"] for e in events].count("progress") == 2
+    assert events[-1] == {
+        "event": "done",
+        "imported": 2,
+        "failed": 3,
+        "tags_created": 1
+    }
+
+    notes = client.get(f"/api/notes/search?mode=like&q=Imported {suffix}",
+                       headers=headers).json()["data"]
+    by_title = {note["title"]: note for note in notes}
+    first = by_title[f"Imported {suffix} 1"]
+    assert first["is_favorited"] is True
+    assert first["created_at"].startswith("2020-01-02T03:04:05")
+    assert {tag["name"]
+            for tag in first["tags"]} == {f"Mine-{suffix}", f"New-{suffix}"}
+    assert existing["id"] in {tag["id"] for tag in first["tags"]}
+    third = by_title[f"Imported {suffix} 3"]
+    # 同一个新标签跨块复用，只创建一次
+    assert [tag["name"] for tag in third["tags"]] == [f"New-{suffix}"]
+    for note in notes:
+        client.delete(f"/api/notes/{note['id']}", headers=headers)
+
+
+def test_import_closes_resources_on_disconnect(client, test_user, monkeypatch):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["data"]["id"]
+    suffix = uuid.uuid4().hex[:8]
+    notified = []
+    monkeypatch.setattr(related_worker, "notify", lambda: notified.append(1))
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 1)
+    upload = tempfile.SpooledTemporaryFile()
+    upload.write(b"\n".join(
+        json.dumps({
+            "title": f"Disconnect {suffix} {i}",
+            "content": "x"
+        }).encode() for i in range(3)))
+    upload.seek(0)
+
+    async def read_first_chunk():
+        body = _import_events(iter_ndjson_records(upload), upload, user_id)
+        await body.__anext__()  # 第一块的 progress 事件，已提交
+        # 客户端断开：StreamingResponse 不再迭代，响应体被关闭
+        await body.aclose()
+
+    asyncio.run(read_first_chunk())
+    assert upload.closed and notified == [1]
+    assert engine.pool.checkedout() == 0
+    notes = client.get(f"/api/notes/search?mode=like&q=Disconnect {suffix}",
+                       headers=headers).json()["data"]
+    assert len(notes) == 1
+    client.delete(f"/api/notes/{notes[0]['id']}", headers=headers)
+
+
+def test_import_notes_rejects_nul_and_reports_failed_chunks(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    user_id = client.get("/api/users/me", headers=headers).json()["data"]["id"]
+    suffix = uuid.uuid4().hex[:8]
+    tag = f"Gone-{suffix}"
+    records = [("line 1", {
+        "title": f"Nul {suffix}",
+        "content": "a\x00b"
+    }, None),
+               ("line 2", {
+                   "title": f"Chunk {suffix} 1",
+                   "content": "ok",
+                   "tags": [tag]
+               }, None),
+               ("line 3", {
+                   "title": f"Chunk {suffix} 2",
+                   "content": "ok",
+                   "tags": [tag]
+               }, None),
+               ("line 4", {
+                   "title": f"Chunk {suffix} 3",
+                   "content": "ok"
+               }, None)]
+    with SessionLocal() as db:
+        events = crud.import_note_records(db, user_id, records, 2)
+        first = [next(events), next(events)]
+        assert first[0]["record"] == "line 1"
+        assert "NUL" in first[0]["error"]
+        assert first[1] == {
+            "event": "progress",
+            "imported": 1,
+            "failed": 1,
+            "tags_created": 1
+        }
+        # 块之间标签被删除：下一块 COPY 违反外键，整块回滚，之后的块继续
+        tag_id = db.scalar(select(models.Tag.id).where(models.Tag.name == tag))
+        db.execute(delete(note_tags).where(note_tags.c.tag_id == tag_id))
+        db.execute(delete(models.Tag).where(models.Tag.id == tag_id))
+        db.commit()
+        rest = list(events)
+    assert rest[0] == {
+        "event": "error",
+        "records": ["line 3", "line 4"],
+        "error": "Failed to save notes"
+    }
+    assert rest[-1] == {
+        "event": "done",
+        "imported": 1,
+        "failed": 3,
+        "tags_created": 1
+    }
+    notes = client.get(f"/api/notes/search?mode=like&q={suffix}",
+                       headers=headers).json()["data"]
+    assert [note["title"] for note in notes] == [f"Chunk {suffix} 1"]
+    assert notes[0]["tags"] == []
+    client.delete(f"/api/notes/{notes[0]['id']}", headers=headers)
+
+
+def test_import_notes_markdown_round_trip(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    suffix = uuid.uuid4().hex[:8]
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(
+            "notes/1-a.md", "---\n"
+            f'title: "Round {suffix}"\n'
+            f'tags: ["Md-{suffix}"]\n'
+            "is_favorited: true\n"
+            "---\n\n# heading\n\nbody")
+        zf.writestr(f"Plain {suffix}.md", "no front matter")
+        zf.writestr("README.txt", "ignored")
+    resp = client.post("/api/notes/import?format=markdown",
+                       content=archive.getvalue(),
+                       headers=headers)
+    events = [json.loads(line) for line in resp.text.splitlines()]
+    assert events[-1]["imported"] == 2
+    assert events[-1]["failed"] == 0
+
+    # 导出再导入得到相同的笔记
+    exported = client.get("/api/notes/export?format=markdown", headers=headers)
+    names = [
+        name
+        for name in zipfile.ZipFile(io.BytesIO(exported.content)).namelist()
+        if suffix in name
+    ]
+    assert len(names) == 2
+    notes = client.get(f"/api/notes/search?mode=like&q={suffix}",
+                       headers=headers).json()["data"]
+    by_title = {note["title"]: note for note in notes}
+    assert by_title[f"Round {suffix}"]["content"] == "# heading\n\nbody"
+    assert by_title[f"Round {suffix}"]["is_favorited"] is True
+    assert by_title[f"Plain {suffix}"]["content"] == "no front matter"
+    for note in notes:
+        client.delete(f"/api/notes/{note['id']}", headers=headers)
+
+    resp = client.post("/api/notes/import?format=markdown",
+                       content=b"not a zip",
+                       headers=headers)
+    assert resp.json()["code"] == 2006
@@ -0,0 +1,86 @@
+import uuid
+
+import pytest
+
+# 笔记 / 收藏接口单次请求允许的最多 SQL 语句数，与返回的笔记数量无关
+MAX_STATEMENTS = 6
+# 写接口额外包含校验、写入和提交后的回读
+MAX_WRITE_STATEMENTS = 8
+
+
+@pytest.fixture(scope="module")
+def seeded(client, test_user):
+    """准备若干带标签、已收藏的笔记，让 N+1 问题能暴露出来"""
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    tag_ids = [
+        client.post("/api/tags",
+                    json={
+                        "name": f"QC-{uuid.uuid4().hex[:8]}"
+                    },
+                    headers=headers).json()["data"]["id"] for _ in range(3)
+    ]
+    note_ids = []
+    for i in range(8):
+        note_id = client.post("/api/notes",
+                              json={
+                                  "title": f"querycount note {i}",
+                                  "content": "querycount body",
+                                  "tags": tag_ids
+                              },
+                              headers=headers).json()["data"]["id"]
+        client.post(f"/api/favorites/{note_id}", headers=headers)
+        note_ids.append(note_id)
+    return {"headers": headers, "tag_ids": tag_ids, "note_ids": note_ids}
+
+
+@pytest.mark.parametrize("method,url", [
+    ("get", "/api/notes?limit=100"),
+    ("get", "/api/notes?limit=100&view=compact"),
+    ("get", "/api/notes?limit=100&tag_id_list={tag}"),
+    ("get", "/api/notes/search?q=querycount&limit=100"),
+    ("get", "/api/notes/search?q=qc&limit=100"),
+    ("get", "/api/notes/{note}"),
+    ("get", "/api/favorites?limit=100"),
+    ("get", "/api/favorites?limit=100&view=compact"),
+    ("get", "/api/favorites/{note}/status"),
+])
+def test_read_endpoints_query_count(client, seeded, count_queries, method,
+                                    url):
+    url = url.format(tag=seeded["tag_ids"][0], note=seeded["note_ids"][0])
+    with count_queries() as statements:
+        resp = getattr(client, method)(url, headers=seeded["headers"])
+    assert resp.json()["code"] == 0
+    assert len(statements) <= MAX_STATEMENTS, "\n".join(statements)
+
+
+def test_write_endpoints_query_count(client, seeded, count_queries):
+    headers = seeded["headers"]
+    tag_ids = seeded["tag_ids"]
+    with count_queries() as statements:
+        resp = client.post("/api/notes",
+                           json={
+                               "title": "querycount new",
+                               "content": "body",
+                               "tags": tag_ids
+                           },
+                           headers=headers)
+    assert len(statements) <= MAX_WRITE_STATEMENTS, "\n".join(statements)
+    note_id = resp.json()["data"]["id"]
+
+    with count_queries() as statements:
+        client.put(f"/api/notes/{note_id}",
+                   json={
+                       "title": "querycount updated",
+                       "tags": tag_ids
+                   },
+                   headers=headers)
+    assert len(statements) <= MAX_WRITE_STATEMENTS, "\n".join(statements)
+
+    with count_queries() as statements:
+        client.post(f"/api/favorites/{note_id}", headers=headers)
+        client.delete(f"/api/favorites/{note_id}", headers=headers)
+    assert len(statements) <= 2 * MAX_WRITE_STATEMENTS, "\n".join(statements)
+
+    with count_queries() as statements:
+        client.delete(f"/api/notes/{note_id}", headers=headers)
+    assert len(statements) <= MAX_WRITE_STATEMENTS, "\n".join(statements)
@@ -0,0 +1,226 @@
+import asyncio
+
+import pytest
+
+from app.utils.read_cache import ReadThroughCache
+
+try:
+    import fakeredis
+except ImportError:  # 可选依赖，缺失时只跳过 Redis 层的用例
+    fakeredis = None
+
+needs_fakeredis = pytest.mark.skipif(fakeredis is None,
+                                     reason="fakeredis not installed")
+
+
+def make_loader(calls, value=b"payload", delay=0.0):
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+
+    return loader
+
+
+def test_memory_tier_hit_and_version_invalidation():
+
+    async def scenario():
+        cache = ReadThroughCache(memory_size=16, ttl=60)
+        calls = []
+        key = cache.key(1, 7, "notes", "limit=20")
+        assert await cache.get_or_load(key, make_loader(calls)) == b"payload"
+        assert await cache.get_or_load(key, make_loader(calls)) == b"payload"
+        assert len(calls) == 1
+        # 版本号变化后落到新 key，重新加载
+        await cache.get_or_load(cache.key(1, 8, "notes", "limit=20"),
+                                make_loader(calls))
+        assert len(calls) == 2
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_single_flight_coalesces_concurrent_misses():
+
+    async def scenario():
+        cache = ReadThroughCache(memory_size=16, ttl=60)
+        calls = []
+        key = cache.key(1, 1, "tags")
+        results = await asyncio.gather(
+            *(cache.get_or_load(key, make_loader(calls, delay=0.05))
+              for _ in range(10)))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    assert results == [b"payload"] * 10
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 9
+
+
+def test_loader_error_is_shared_and_not_cached():
+
+    async def scenario():
+        cache = ReadThroughCache(memory_size=16, ttl=60)
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("Invalid cursor")
+
+        key = cache.key(1, 1, "notes", "cursor=bad")
+        results = await asyncio.gather(cache.get_or_load(key, failing),
+                                       cache.get_or_load(key, failing),
+                                       return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert len(calls) == 1
+        await cache.get_or_load(key, make_loader(calls))
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_memory_tier_is_bounded_by_bytes():
+
+    async def scenario():
+        cache = ReadThroughCache(memory_size=16,
+                                 ttl=60,
+                                 memory_bytes=250,
+                                 max_entry_bytes=150)
+        calls = []
+        for i in range(3):
+            await cache.get_or_load(cache.key(1, 1, "page", i),
+                                    make_loader(calls, value=b"x" * 100))
+        # 超过单条上限的响应体不进内存，每次都重新加载
+        big = cache.key(1, 1, "page", "big")
+        for _ in range(2):
+            await cache.get_or_load(big, make_loader(calls, value=b"x" * 200))
+        return cache.stats(), len(calls)
+
+    stats, calls = asyncio.run(scenario())
+    assert stats["memory_size"] == 2 and stats["memory_bytes"] == 200
+    assert calls == 5
+
+
+def test_cancelled_loader_does_not_cancel_waiters():
+
+    async def scenario():
+        cache = ReadThroughCache(memory_size=16, ttl=60)
+        calls = []
+        key = cache.key(1, 1, "notes")
+        leader = asyncio.create_task(
+            cache.get_or_load(key, make_loader(calls, delay=0.05)))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(
+                cache.get_or_load(key, make_loader(calls, delay=0.01)))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        # 加载者的客户端断开：等待者由其中一个重新加载
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        assert leader.cancelled()
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == [b"payload"] * 3
+    assert len(calls) == 2
+
+
+@needs_fakeredis
+def test_redis_tier_shared_between_processes():
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        # 两个实例模拟两个 worker 进程：各自的进程内缓存 + 同一个 Redis
+        a = ReadThroughCache(memory_size=16,
+                             ttl=60,
+                             redis=fakeredis.FakeAsyncRedis(server=server))
+        b = ReadThroughCache(memory_size=16,
+                             ttl=60,
+                             redis=fakeredis.FakeAsyncRedis(server=server))
+        calls = []
+        key = a.key(1, 3, "notes", "")
+        await a.get_or_load(key, make_loader(calls))
+        assert await b.get_or_load(key, make_loader(calls)) == b"payload"
+        assert len(calls) == 1
+        assert b.stats()["redis_hits"] == 1
+        # b 的进程内缓存已回填
+        await b.get_or_load(key, make_loader(calls))
+        assert b.stats()["memory_hits"] == 1
+        assert await a.redis.ttl(key) > 0
+
+    asyncio.run(scenario())
+
+
+@needs_fakeredis
+def test_redis_lock_makes_other_process_wait():
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        a = ReadThroughCache(memory_size=16,
+                             ttl=60,
+                             redis=fakeredis.FakeAsyncRedis(server=server))
+        b = ReadThroughCache(memory_size=16,
+                             ttl=60,
+                             redis=fakeredis.FakeAsyncRedis(server=server))
+        calls = []
+        key = a.key(2, 1, "tags")
+        results = await asyncio.gather(
+            a.get_or_load(key, make_loader(calls, delay=0.1)),
+            b.get_or_load(key, make_loader(calls, delay=0.1)))
+        assert results == [b"payload", b"payload"]
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+@needs_fakeredis
+def test_redis_errors_fall_back_to_loader():
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        server.connected = False
+        cache = ReadThroughCache(memory_size=16,
+                                 ttl=60,
+                                 redis=fakeredis.FakeAsyncRedis(server=server))
+        calls = []
+        key = cache.key(3, 1, "tags")
+        assert await cache.get_or_load(key, make_loader(calls)) == b"payload"
+        assert await cache.get_or_load(key, make_loader(calls)) == b"payload"
+        assert len(calls) == 1
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["redis_errors"] > 0
+    assert stats["memory_hits"] == 1
+
+
+def test_cached_list_skips_query(client, test_user, count_queries):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    client.post("/api/notes",
+                json={
+                    "title": "read cache note",
+                    "content": "read cache body"
+                },
+                headers=headers)
+    first = client.get("/api/notes?limit=7", headers=headers)
+    with count_queries() as statements:
+        second = client.get("/api/notes?limit=7", headers=headers)
+    # 只剩取版本号的一次主键查询
+    assert len(statements) == 1, "\n".join(statements)
+    assert second.json() == first.json()
+
+    # 写入后版本号变化，重新查询
+    client.post("/api/notes",
+                json={
+                    "title": "read cache note 2",
+                    "content": "read cache body"
+                },
+                headers=headers)
+    third = client.get("/api/notes?limit=7", headers=headers)
+    assert third.json()["data"][0]["title"] == "read cache note 2"
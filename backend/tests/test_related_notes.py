@@ -0,0 +1,134 @@
+import json
+import uuid
+
+import pytest
+
+from app import crud, models
+from app.db import SessionLocal
+from app.utils.related_worker import RelatedWorker
+
+
+@pytest.fixture
+def related_user(make_user):
+    return make_user("rel")
+
+
+def process(user_id, batch_size=100):
+    """代替后台 worker：处理该用户的全部待处理变更"""
+    with SessionLocal() as db:
+        while crud.update_related_notes(db, user_id, batch_size):
+            pass
+
+
+def related(client, headers, note_id):
+    resp = client.get(f"/api/notes/{note_id}/related", headers=headers)
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def related_ids(client, headers, note_id):
+    return [note["id"] for note in related(client, headers, note_id)["data"]]
+
+
+def test_related_notes_combine_text_and_tags(client, related_user,
+                                             create_note):
+    headers, user_id = related_user["headers"], related_user["id"]
+    tag = client.post("/api/tags",
+                      json={
+                          "name": f"Rel-{uuid.uuid4().hex[:8]}"
+                      },
+                      headers=headers).json()["data"]["id"]
+    sourdough = create_note(headers, "Sourdough starter",
+                            "Feed the sourdough starter with flour and water")
+    bread = create_note(headers, "Sourdough bread",
+                        "Bake the sourdough loaf with the starter", [tag])
+    tagged = create_note(headers, "Oven temperatures",
+                         "Preheat to 250 degrees", [tag])
+    unrelated = create_note(headers, "Car insurance",
+                            "Renew the policy before March")
+
+    # worker 处理之前没有近邻
+    assert related_ids(client, headers, bread) == []
+    process(user_id)
+
+    result = related(client, headers, bread)["data"]
+    assert [note["id"] for note in result[:2]] == [sourdough, tagged]
+    assert result[1]["shared_tags"] == 1 and result[0]["shared_tags"] == 0
+    assert unrelated not in related_ids(client, headers, bread)
+    # 分数对称：反向也能找到
+    assert bread in related_ids(client, headers, tagged)
+
+
+def test_related_notes_follow_updates_and_deletes(client, related_user,
+                                                  create_note):
+    headers, user_id = related_user["headers"], related_user["id"]
+    first = create_note(headers, "Kubernetes ingress",
+                        "Configure the kubernetes ingress controller")
+    second = create_note(headers, "Kubernetes pods",
+                         "Debug crashing kubernetes pods")
+    third = create_note(headers, "Watercolor painting",
+                        "Mixing watercolor pigments")
+    process(user_id)
+    assert related_ids(client, headers, first) == [second]
+
+    # 修改后与另一篇变得相似：两边的列表都要更新
+    client.put(f"/api/notes/{third}",
+               json={
+                   "title": "Kubernetes ingress TLS",
+                   "content": "Terminate TLS at the kubernetes ingress"
+               },
+               headers=headers)
+    process(user_id)
+    assert related_ids(client, headers, first)[0] == third
+    assert first in related_ids(client, headers, third)
+
+    client.delete(f"/api/notes/{third}", headers=headers)
+    process(user_id)
+    assert related_ids(client, headers, first) == [second]
+    assert related(client, headers, third)["code"] == 2004
+
+
+def test_related_notes_batches_resume_within_one_import(client, related_user):
+    headers, user_id = related_user["headers"], related_user["id"]
+    # 一次导入共享同一个 seq，按批处理时需在 seq 内部继续
+    body = "\n".join(
+        json.dumps({
+            "title": f"Astronomy log {i}",
+            "content": "telescope observation of jupiter moons"
+        }) for i in range(5))
+    client.post("/api/notes/import", content=body.encode(), headers=headers)
+    with SessionLocal() as db:
+        assert [crud.update_related_notes(db, user_id, 2)
+                for _ in range(4)] == [2, 2, 1, 0]
+    ids = [
+        note["id"]
+        for note in client.get("/api/notes", headers=headers).json()["data"]
+    ]
+    for note_id in ids:
+        assert sorted(related_ids(client, headers,
+                                  note_id)) == sorted(set(ids) - {note_id})
+
+
+def test_related_worker_run_once(client, related_user, create_note):
+    headers, user_id = related_user["headers"], related_user["id"]
+    first = create_note(headers, "Sourdough starter",
+                        "Feed the sourdough starter with flour")
+    second = create_note(headers, "Sourdough loaf",
+                         "Bake the sourdough loaf with the starter")
+    worker = RelatedWorker(poll_interval=1, batch_size=100)
+    # 其他用例留下的待处理用户也在队列中，直到一轮没有进展为止
+    while worker.run_once():
+        pass
+    assert related_ids(client, headers, first) == [second]
+    assert related_ids(client, headers, second) == [first]
+
+    # 失败的用户退避期内不再被选中，成功处理后清零
+    create_note(headers, "Sourdough crumb", "Open crumb sourdough")
+    with SessionLocal() as db:
+        assert user_id in crud.pending_related_users(db, 1000)
+        crud.defer_related_user(db, user_id, 60)
+        assert user_id not in crud.pending_related_users(db, 1000)
+    process(user_id)
+    with SessionLocal() as db:
+        state = db.get(models.RelatedNoteState, user_id)
+        assert state.failures == 0 and state.retry_at is None
@@ -0,0 +1,130 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.crud import note_semantic
+from app.utils.embedding import embed_note
+
+
+@pytest.fixture
+def semantic_user(make_user):
+    # 独立用户，索引和 IDF 不受其他用例的笔记影响
+    return make_user("sem")["headers"]
+
+
+def search(client, headers, q, mode="semantic", **params):
+    resp = client.get("/api/notes/search",
+                      params={
+                          "q": q,
+                          "mode": mode,
+                          **params
+                      },
+                      headers=headers)
+    assert resp.status_code == 200
+    return [note["id"] for note in resp.json()["data"]]
+
+
+def test_semantic_search_matches_word_variants(client, semantic_user,
+                                               create_note):
+    headers = semantic_user
+    cooking = create_note(headers, "Baking bread",
+                          "Knead the dough and let the loaves rise overnight")
+    create_note(headers, "Server deployment",
+                "Configure gunicorn workers behind nginx")
+    create_note(headers, "Trip planning", "Book trains and hotels")
+
+    # 全文检索要求所有词干都命中，语义模式通过子词特征匹配 "baker" / "baking"
+    assert search(client, headers, "baker breads", mode="fts") == []
+    assert search(client, headers, "baker breads")[0] == cooking
+    assert search(client, headers, "the and of") == []
+
+
+def test_semantic_index_follows_updates_and_deletes(client, semantic_user,
+                                                    create_note):
+    headers = semantic_user
+    note = create_note(headers, "Garden", "Tomatoes and cucumbers")
+    other = create_note(headers, "Budget", "Monthly expenses spreadsheet")
+    assert search(client, headers, "tomatoes") == [note]
+
+    client.put(f"/api/notes/{note}",
+               json={
+                   "title": "Garden",
+                   "content": "Roses and tulips"
+               },
+               headers=headers)
+    assert search(client, headers, "tomatoes") == []
+    assert search(client, headers, "tulips") == [note]
+
+    client.delete(f"/api/notes/{note}", headers=headers)
+    assert search(client, headers, "tulips") == []
+    assert search(client, headers, "expenses") == [other]
+
+
+def test_semantic_search_embeds_imported_notes(client, semantic_user,
+                                               create_note, monkeypatch):
+    headers = semantic_user
+    create_note(headers, "Warm up", "load the index before the import")
+    assert search(client, headers, "astronomy") == []
+    client.post("/api/notes/import",
+                content=b'{"title": "Telescopes", "content": "astronomy"}',
+                headers=headers)
+
+    embedded = []
+
+    def spy(title, content):
+        try:
+            asyncio.get_running_loop()
+            on_loop = True
+        except RuntimeError:
+            on_loop = False
+        embedded.append((title, on_loop))
+        return embed_note(title, content)
+
+    monkeypatch.setattr(note_semantic, "embed_note", spy)
+    # 导入不逐条计算向量，索引追赶时只为缺失的笔记补齐，且不在事件循环上计算
+    assert len(search(client, headers, "astronomy telescope")) == 1
+    assert embedded == [("Telescopes", False)]
+
+
+def test_hybrid_search_fuses_lexical_and_semantic(client, semantic_user,
+                                                  create_note):
+    headers = semantic_user
+    exact = create_note(headers, "Python packaging",
+                        "Publishing wheels with poetry")
+    # 不含 python，全文检索不命中，只由语义相似召回
+    related = create_note(headers, "Packages",
+                          "Packaged modules and wheel files")
+    create_note(headers, "Groceries", "Milk eggs and flour")
+
+    results = search(client, headers, "python packaging", mode="hybrid")
+    assert results[:2] == [exact, related]
+    assert search(client, headers, "python packaging", mode="hybrid",
+                  skip=1) == [related]
+
+
+def test_vector_index_ivf_matches_brute_force(monkeypatch):
+    from app.config import settings
+    from app.utils.vector_index import UserVectorIndex
+
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((400, 32)).astype(np.float32)
+    ids = list(range(1, 401))
+
+    exact = UserVectorIndex(dim=32)
+    exact.upsert(ids, vectors)
+    monkeypatch.setattr(settings, "SEMANTIC_IVF_MIN_SIZE", 100)
+    monkeypatch.setattr(settings, "SEMANTIC_IVF_NPROBE", 20)
+    approx = UserVectorIndex(dim=32)
+    approx.upsert(ids, vectors)
+    assert approx.uses_ivf and not exact.uses_ivf
+
+    # 查询向量本身一定在它所属的簇内，近似检索也应排第一
+    for note_id in (1, 57, 400):
+        query = vectors[note_id - 1]
+        assert exact.search(query, 5)[0][0] == note_id
+        assert approx.search(query, 5)[0][0] == note_id
+
+    approx.remove(range(1, 351))
+    assert len(approx) == 50 and not approx.uses_ivf
+    assert [note_id for note_id, _ in approx.search(vectors[-1], 1)] == [400]
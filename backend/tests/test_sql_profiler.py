@@ -0,0 +1,117 @@
+import logging
+import uuid
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import engine
+from app.main import explain_sampler
+from app.utils.sql_profiler import (ExplainSampler, RequestProfile,
+                                    fingerprint, normalize_statement,
+                                    slow_reasons)
+
+
+def test_normalize_statement_groups_same_shape():
+    a = ("SELECT * FROM notes WHERE notes.id IN (%(id_1_1)s, %(id_1_2)s) "
+         "AND title = 'x' LIMIT 20")
+    b = ("SELECT *  FROM notes\nWHERE notes.id IN (%(id_1_1)s, %(id_1_2)s, "
+         "%(id_1_3)s) AND title = 'it''s' LIMIT 50")
+    assert normalize_statement(a) == (
+        "SELECT * FROM notes WHERE notes.id IN (?...) AND title = ? LIMIT ?")
+    assert fingerprint(a) == fingerprint(b)
+    # asyncpg 的 $n 占位符与 psycopg2 得到相同的指纹
+    assert fingerprint("SELECT * FROM tags WHERE tags.user_id = $1") == (
+        fingerprint("SELECT * FROM tags WHERE tags.user_id = %(user_id_1)s"))
+    assert normalize_statement("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)"
+                               ) == ("INSERT INTO t (a, b) VALUES (?...)")
+    assert fingerprint("SELECT 1 FROM notes") != fingerprint(
+        "SELECT 1 FROM tags")
+
+
+def test_server_timing_header(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    resp = client.get("/api/notes/search?q=timing", headers=headers)
+    timing = resp.headers["Server-Timing"]
+    assert timing.startswith("db;dur=")
+    assert 'queries"' in timing
+
+
+def test_slow_request_logs_statements(client, test_user, monkeypatch, caplog):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    monkeypatch.setattr(settings, "SQL_PROFILE_MAX_STATEMENTS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.utils.sql_profiler"):
+        client.get("/api/notes/search?q=slowlog", headers=headers)
+    record = next(r for r in caplog.records if "slow request" in r.message)
+    assert "GET /api/notes/search" in record.message
+    assert "over 0 statements" in record.message
+    # 按指纹列出语句
+    assert "FROM user_stats WHERE user_stats.user_id = ?" in record.message
+
+
+def test_repeated_fingerprint_is_reported(client, test_user, caplog):
+    # 默认阈值下，同一形状的语句执行 10 次（N+1）才报告
+    profile = RequestProfile()
+    for note_id in range(settings.SQL_PROFILE_REPEAT_THRESHOLD):
+        profile.record(f"SELECT * FROM tags WHERE tags.note_id = {note_id}",
+                       None, 0.001, "pyformat")
+    reasons = slow_reasons(profile, 0.01)
+    assert len(reasons) == 1 and reasons[0].startswith("repeated ")
+    assert f"x{settings.SQL_PROFILE_REPEAT_THRESHOLD}" in reasons[0]
+    assert profile.statements == settings.SQL_PROFILE_REPEAT_THRESHOLD
+    profile.groups.clear()
+    assert slow_reasons(profile, 0.01) == []
+
+    # 普通的列表请求不应被当作 N+1
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    with caplog.at_level(logging.WARNING, logger="app.utils.sql_profiler"):
+        client.get("/api/tags", headers=headers)
+    assert not any("repeated" in r.message for r in caplog.records)
+
+
+def test_explain_sampling(client, test_user, monkeypatch, caplog):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    q = f"explain{uuid.uuid4().hex[:8]}"
+    monkeypatch.setattr(settings, "SQL_PROFILE_EXPLAIN_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "SQL_PROFILE_EXPLAIN_MIN_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.utils.sql_profiler"):
+        client.get(f"/api/notes/search?q={q}", headers=headers)
+        # EXPLAIN 在响应之后由后台线程执行
+        explain_sampler.wait(timeout=10)
+    plans = [r.message for r in caplog.records if "EXPLAIN" in r.message]
+    assert plans and "Execution Time" in plans[0], caplog.text
+
+    # 同一指纹在间隔内不再重复 EXPLAIN
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="app.utils.sql_profiler"):
+        client.get(f"/api/notes/search?q={q}", headers=headers)
+        explain_sampler.wait(timeout=10)
+    assert not [
+        r for r in caplog.records if "EXPLAIN fingerprint" in r.message
+    ]
+
+
+def test_explain_never_analyzes_volatile_statements(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_PROFILE_EXPLAIN_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "SQL_PROFILE_EXPLAIN_MIN_MS", 0)
+    sequence = "SELECT last_value FROM notes_id_seq"
+    with engine.connect() as conn:
+        before = conn.execute(text(sequence)).scalar()
+
+    profile = RequestProfile()
+    profile.record("SELECT nextval(pg_get_serial_sequence('notes', 'id'))",
+                   None, 0.5, "pyformat")
+    profile.record(
+        "SELECT user_id FROM related_note_state WHERE user_id = %(id)s "
+        "FOR UPDATE SKIP LOCKED", {"id": 0}, 0.5, "pyformat")
+    sampler = ExplainSampler(engine)
+    with caplog.at_level(logging.WARNING, logger="app.utils.sql_profiler"):
+        sampler.submit(profile)
+        sampler.wait(timeout=10)
+    sampler.shutdown()
+
+    plans = [r.message for r in caplog.records if "EXPLAIN" in r.message]
+    # 只取执行计划，不真正执行：序列不前进，也不加行锁
+    assert len(plans) == 2, caplog.text
+    assert not any("Execution Time" in plan for plan in plans)
+    with engine.connect() as conn:
+        assert conn.execute(text(sequence)).scalar() == before
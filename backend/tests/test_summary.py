@@ -0,0 +1,92 @@
+import time
+
+
+def _wait_for_job(client, headers, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/summary_jobs/{job_id}",
+                         headers=headers).json()["data"]
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("summary job did not finish in time")
+
+
+def test_summary_job_writes_note_summary(client, test_user, llm_stub):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    resp = client.post("/api/notes",
+                       json={
+                           "title": "Job note",
+                           "content": "Some content to summarize"
+                       },
+                       headers=headers)
+    note_id = resp.json()["data"]["id"]
+
+    resp = client.post("/api/summary_jobs",
+                       json={"note_id": note_id},
+                       headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["code"] == 0
+    job_id = resp.json()["data"]["id"]
+
+    job = _wait_for_job(client, headers, job_id)
+    assert job["status"] == "succeeded"
+    assert job["summary"] == "摘要：Job note"
+    note = client.get(f"/api/notes/{note_id}", headers=headers).json()["data"]
+    assert note["summary"] == "摘要：Job note"
+
+
+def test_summary_job_failure_is_reported(client, test_user, llm_stub):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    llm_stub.fail = True
+    resp = client.post("/api/notes",
+                       json={
+                           "title": "Failing job",
+                           "content": "content"
+                       },
+                       headers=headers)
+    note_id = resp.json()["data"]["id"]
+    job_id = client.post("/api/summary_jobs",
+                         json={
+                             "note_id": note_id
+                         },
+                         headers=headers).json()["data"]["id"]
+    job = _wait_for_job(client, headers, job_id)
+    assert job["status"] == "failed"
+    assert job["error"]
+
+
+def test_summary_job_for_unknown_note(client, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    resp = client.post("/api/summary_jobs",
+                       json={"note_id": 0},
+                       headers=headers)
+    assert resp.json()["code"] == 5002
+
+
+def test_generate_summary_uses_cache(client, test_user, llm_stub):
+    import uuid
+    body = {"title": f"Cached {uuid.uuid4().hex[:8]}", "content": "same text"}
+    first = client.post("/api/notes/generate_summary", json=body).json()
+    second = client.post("/api/notes/generate_summary", json=body).json()
+    assert first["code"] == 0
+    assert second["data"] == first["data"]
+    assert llm_stub.calls == 1
+    # 内容变化后缓存不命中
+    body["content"] = "changed text"
+    client.post("/api/notes/generate_summary", json=body)
+    assert llm_stub.calls == 2
+
+
+def test_summary_cache_persistent_tier(client, test_user, llm_stub):
+    import uuid
+    from app.utils.summary_cache import summary_cache
+    body = {"title": f"Persisted {uuid.uuid4().hex[:8]}", "content": "text"}
+    client.post("/api/notes/generate_summary", json=body)
+    # 清空进程内缓存后仍从 Postgres 命中
+    summary_cache._memory.clear()
+    db_hits = summary_cache.stats()["db_hits"]
+    resp = client.post("/api/notes/generate_summary", json=body).json()
+    assert resp["data"] == f"摘要：{body['title']}"
+    assert llm_stub.calls == 1
+    assert summary_cache.stats()["db_hits"] == db_hits + 1
@@ -0,0 +1,172 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app import models
+from app.crud import encode_sync_token
+from app.db import SessionLocal
+from app.utils.sync_pruner import SyncPruner
+
+
+@pytest.fixture
+def sync_user(make_user):
+    # 独立用户，变更记录不受其他用例影响
+    return make_user("sync")
+
+
+def sync(client, headers, since=None, **params):
+    if since:
+        params["since"] = since
+    resp = client.get("/api/sync", params=params, headers=headers)
+    assert resp.status_code == 200
+    return resp.json()["data"]
+
+
+def test_sync_returns_only_changes_since_token(client, sync_user):
+    headers = sync_user["headers"]
+    first = sync(client, headers)
+    assert first["notes"] == [] and first["has_more"] is False
+
+    tag = client.post("/api/tags",
+                      json={
+                          "name": f"Sync-{uuid.uuid4().hex[:8]}"
+                      },
+                      headers=headers).json()["data"]
+    keep, drop = [
+        client.post("/api/notes",
+                    json={
+                        "title": title,
+                        "content": "sync body",
+                        "tags": [tag["id"]]
+                    },
+                    headers=headers).json()["data"]["id"]
+        for title in ("keep", "drop")
+    ]
+    client.post(f"/api/favorites/{keep}", headers=headers)
+
+    created = sync(client, headers, first["token"])
+    assert {note["id"] for note in created["notes"]} == {keep, drop}
+    assert [t["id"] for t in created["tags"]] == [tag["id"]]
+    assert created["favorites"] == [keep]
+    note = next(n for n in created["notes"] if n["id"] == keep)
+    assert note["is_favorited"] is True
+    assert [t["name"] for t in note["tags"]] == [tag["name"]]
+
+    # 没有新变更：空结果，带 ETag 时直接 304
+    resp = client.get("/api/sync",
+                      params={"since": created["token"]},
+                      headers=headers)
+    assert resp.json()["data"]["notes"] == []
+    resp = client.get("/api/sync",
+                      params={"since": created["token"]},
+                      headers={
+                          **headers, "If-None-Match": resp.headers["ETag"]
+                      })
+    assert resp.status_code == 304
+
+    client.put(f"/api/notes/{keep}",
+               json={
+                   "title": "kept",
+                   "tags": [tag["id"]]
+               },
+               headers=headers)
+    client.delete(f"/api/notes/{drop}", headers=headers)
+    client.delete(f"/api/favorites/{keep}", headers=headers)
+    changed = sync(client, headers, created["token"])
+    assert [n["title"] for n in changed["notes"]] == ["kept"]
+    assert changed["notes"][0]["is_favorited"] is False
+    assert changed["deleted"] == {
+        "notes": [drop],
+        "tags": [],
+        "favorites": [keep]
+    }
+
+    # 重命名标签：标签和内嵌该标签的笔记都下发
+    client.put(f"/api/tags/{tag['id']}",
+               json={"name": tag["name"] + "-x"},
+               headers=headers)
+    renamed = sync(client, headers, changed["token"])
+    assert [t["name"] for t in renamed["tags"]] == [tag["name"] + "-x"]
+    assert [n["tags"][0]["name"]
+            for n in renamed["notes"]] == [tag["name"] + "-x"]
+
+    client.delete(f"/api/tags/{tag['id']}", headers=headers)
+    removed = sync(client, headers, renamed["token"])
+    assert removed["deleted"]["tags"] == [tag["id"]]
+    assert [n["tags"] for n in removed["notes"]] == [[]]
+
+
+def test_sync_pagination_within_one_statement(client, sync_user):
+    headers = sync_user["headers"]
+    # 一次导入的所有笔记共享同一个 seq，分页需在 seq 内部继续
+    body = "\n".join(
+        json.dumps({
+            "title": f"page {i}",
+            "content": "x"
+        }) for i in range(5))
+    client.post("/api/notes/import", content=body.encode(), headers=headers)
+
+    seen, since, pages = [], None, 0
+    while True:
+        page = sync(client, headers, since, limit=2)
+        seen += [note["title"] for note in page["notes"]]
+        since, pages = page["token"], pages + 1
+        if not page["has_more"]:
+            break
+    assert sorted(seen) == [f"page {i}" for i in range(5)]
+    assert pages == 3
+
+
+def test_sync_rejects_invalid_token(client, sync_user):
+    for since in ("not-a-token", encode_sync_token((10**9, ))):
+        resp = client.get("/api/sync",
+                          params={"since": since},
+                          headers=sync_user["headers"])
+        assert resp.json()["code"] == 6001
+
+
+def test_sync_prunes_old_tombstones(client, sync_user):
+    headers = sync_user["headers"]
+    user_id = sync_user["id"]
+    keep, drop = [
+        client.post("/api/notes",
+                    json={
+                        "title": title,
+                        "content": "tombstone"
+                    },
+                    headers=headers).json()["data"]["id"]
+        for title in ("keep", "drop")
+    ]
+    before_delete = sync(client, headers)["token"]
+    client.delete(f"/api/notes/{drop}", headers=headers)
+
+    # 首次同步不下发墓碑
+    first = sync(client, headers)
+    assert [note["id"] for note in first["notes"]] == [keep]
+    assert first["deleted"]["notes"] == []
+    assert sync(client, headers, before_delete)["deleted"]["notes"] == [drop]
+
+    # 墓碑超过保留期后被清理，早于它的令牌失效
+    with SessionLocal() as db:
+        db.execute(
+            update(models.SyncChange).where(
+                models.SyncChange.user_id == user_id,
+                models.SyncChange.deleted).values(
+                    changed_at=datetime.now(timezone.utc) -
+                    timedelta(days=40)))
+        db.commit()
+    assert SyncPruner(interval=0, retention_days=30,
+                      batch_size=1).run_once() >= 1
+    resp = client.get("/api/sync",
+                      params={"since": before_delete},
+                      headers=headers)
+    assert resp.json()["code"] == 6001
+    assert resp.json()["msg"] == "Sync token expired"
+
+    # 清理之后取得的令牌仍然有效
+    assert sync(client, headers, first["token"])["notes"] == []
+    client.delete(f"/api/notes/{keep}", headers=headers)
+    assert sync(client, headers, first["token"])["deleted"]["notes"] == [keep]
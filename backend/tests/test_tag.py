@@ -52,3 +52,121 @@ def test_delete_tag(client, test_user):
     del_resp = client.delete(f"/api/tags/{tag_id}", headers=headers)
     assert del_resp.status_code == 200
     assert del_resp.json()["code"] == 0
+
+
+def test_bulk_attach_and_detach_tags(client, test_user):
+    import uuid
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    tag_ids = [
+        client.post("/api/tags",
+                    json={
+                        "name": f"Bulk-{uuid.uuid4().hex[:8]}"
+                    },
+                    headers=headers).json()["data"]["id"] for _ in range(2)
+    ]
+    note_ids = [
+        client.post("/api/notes",
+                    json={
+                        "title": f"bulk note {i}",
+                        "content": "bulk",
+                        "tags": tag_ids[:1]
+                    },
+                    headers=headers).json()["data"]["id"] for i in range(3)
+    ]
+    payload = {"note_ids": note_ids, "tag_ids": tag_ids}
+
+    # 已存在的 (note, tag) 组合被跳过，只新增 3 条
+    resp = client.post("/api/tags/bulk/attach", json=payload, headers=headers)
+    assert resp.json()["code"] == 0
+    assert resp.json()["data"]["attached"] == 3
+    note = client.get(f"/api/notes/{note_ids[0]}", headers=headers).json()
+    assert {t["id"] for t in note["data"]["tags"]} == set(tag_ids)
+
+    resp = client.post("/api/tags/bulk/detach", json=payload, headers=headers)
+    assert resp.json()["data"]["detached"] == 6
+    note = client.get(f"/api/notes/{note_ids[0]}", headers=headers).json()
+    assert note["data"]["tags"] == []
+
+    # 含有不存在的标签时整体拒绝
+    resp = client.post("/api/tags/bulk/attach",
+                       json={
+                           "note_ids": note_ids,
+                           "tag_ids": tag_ids + [999999]
+                       },
+                       headers=headers)
+    assert resp.status_code == 404
+
+    for note_id in note_ids:
+        client.delete(f"/api/notes/{note_id}", headers=headers)
+    for tag_id in tag_ids:
+        client.delete(f"/api/tags/{tag_id}", headers=headers)
+
+
+def test_note_rejects_other_users_tag(client, test_user):
+    import uuid
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    other = {
+        "username": f"other-{uuid.uuid4().hex[:8]}",
+        "email": f"other-{uuid.uuid4().hex[:8]}@example.com",
+        "password": "otherpass"
+    }
+    client.post("/api/users/register", json=other)
+    token = client.post("/api/users/login",
+                        json={
+                            "email": other["email"],
+                            "password": other["password"]
+                        }).json()["data"]["access_token"]
+    other_headers = {"Authorization": f"Bearer {token}"}
+    foreign_tag = client.post("/api/tags",
+                              json={
+                                  "name": f"Foreign-{uuid.uuid4().hex[:8]}"
+                              },
+                              headers=other_headers).json()["data"]["id"]
+
+    resp = client.post("/api/notes",
+                       json={
+                           "title": "foreign tag",
+                           "content": "x",
+                           "tags": [foreign_tag]
+                       },
+                       headers=headers)
+    assert resp.json()["code"] == 2001
+
+    note_id = client.post("/api/notes",
+                          json={
+                              "title": "foreign tag",
+                              "content": "x"
+                          },
+                          headers=headers).json()["data"]["id"]
+    resp = client.put(f"/api/notes/{note_id}",
+                      json={"tags": [foreign_tag]},
+                      headers=headers)
+    assert resp.json()["code"] == 2002
+    client.delete(f"/api/notes/{note_id}", headers=headers)
+    client.delete(f"/api/tags/{foreign_tag}", headers=other_headers)
+
+
+def test_get_tags_conditional(client, test_user):
+    import uuid
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    resp = client.get("/api/tags", headers=headers)
+    etag = resp.headers["ETag"]
+    assert resp.headers["Vary"] == "Authorization"
+    resp = client.get("/api/tags", headers={**headers, "If-None-Match": etag})
+    assert resp.status_code == 304
+
+    # 新建 / 改名标签后旧 ETag 失效
+    tag_id = client.post("/api/tags",
+                         json={
+                             "name": f"ETag-{uuid.uuid4().hex[:8]}"
+                         },
+                         headers=headers).json()["data"]["id"]
+    resp = client.get("/api/tags", headers={**headers, "If-None-Match": etag})
+    assert resp.status_code == 200
+    etag = resp.headers["ETag"]
+    client.put(f"/api/tags/{tag_id}",
+               json={"name": f"ETag-{uuid.uuid4().hex[:8]}"},
+               headers=headers)
+    resp = client.get("/api/tags", headers={**headers, "If-None-Match": etag})
+    assert resp.status_code == 200
+    client.delete(f"/api/tags/{tag_id}", headers=headers)
@@ -49,3 +49,54 @@ def test_login_fail(client):
                        })
     assert resp.status_code == 200
     assert resp.json()["code"] != 0
+
+
+def test_invalid_token_rejected(client):
+    resp = client.get("/api/notes", headers={"Authorization": "Bearer bad"})
+    assert resp.status_code == 401
+
+
+def test_user_cache_invalidated_on_update(client, test_user):
+    from app.auth.auth import _user_cache
+    from app.db import SessionLocal
+    from app.models import User
+
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    resp = client.get("/api/users/me", headers=headers)
+    assert resp.status_code == 200
+    user_id = resp.json()["data"]["id"]
+    # 鉴权后用户已进入缓存，后续请求不再查库
+    assert _user_cache.get(str(user_id)) is not None
+
+    # 通过 ORM 修改用户后缓存失效
+    with SessionLocal() as db:
+        user = db.get(User, user_id)
+        username = user.username
+        user.username = f"{username}-renamed"
+        db.commit()
+        assert _user_cache.get(str(user_id)) is None
+        user.username = username
+        db.commit()
+
+
+def test_login_rehashes_outdated_password(client, monkeypatch):
+    from app.db import SessionLocal
+    from app.models import User
+    from app.utils.password_hasher import password_hasher
+
+    credentials = {"email": "testuser2@example.com", "password": "testpass2"}
+    # 模拟调整了 rounds：旧哈希在下次登录时按新参数重新计算并写回
+    monkeypatch.setattr(password_hasher, "rounds", 5)
+    resp = client.post("/api/users/login", json=credentials)
+    assert resp.json()["code"] == 0
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == credentials["email"]).one()
+        assert user.hashed_password.startswith("$2b$05$")
+
+    resp = client.post("/api/token",
+                       data={
+                           "username": credentials["email"],
+                           "password": credentials["password"]
+                       })
+    assert resp.status_code == 200
+    assert "access_token" in resp.json()
@@ -62,4 +62,17 @@ export const getFavoriteNotes = (params?: { skip?: number; limit?: number }) =>
 // 生成 AI 摘要
 export const generateSummary = (data: { title: string; content: string }) => {
     return api.post("/notes/generate_summary", data);
-};
\ No newline at end of file
+};
+
+// -------------------- 增量同步 --------------------
+
+// 拉取 since 之后的变更（笔记 / 标签 / 收藏及删除的 id），返回的 token 作为下次的 since；
+// has_more 为 true 时继续拉取，code=6001 时清空本地数据后不带 since 重新同步
+export const syncChanges = (since?: string, limit?: number) => {
+    return api.get("/sync", { params: { since, limit } });
+};
+
+// 相似笔记（后台预先计算，笔记修改后稍有延迟）
+export const getRelatedNotes = (noteId: number, limit?: number) => {
+    return api.get(`/notes/${noteId}/related`, { params: { limit } });
+};
@@ -16,8 +16,11 @@ until alembic upgrade head; do
 	sleep 3
 done
 
-# 启动后端服务（使用 python -m 方式更稳健）
-python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 &
+# 启动后端服务：gunicorn master + 多个 uvicorn worker（配置见 backend/gunicorn.conf.py）
+# worker 数、事件循环等通过 SERVER_* 环境变量调整；本地开发仍可直接用 uvicorn --reload
+# 多个 worker 的 Prometheus 指标写入同一目录，由 /metrics 汇总（启动时清空）
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-multiproc}"
+python -m gunicorn -c gunicorn.conf.py app.main:app &
 
 # 启动 nginx（前端静态和 /api 反代）
 nginx -g 'daemon off;'